@@ -0,0 +1,406 @@
+"""
+Benchmark do conversor JSON para SQL com dados sintéticos de unidades de saúde (CNES).
+
+Gera registros no mesmo formato de run_example (com nulos, aspas, datas em vários
+formatos e coordenadas variadas) e mede, para cada modo de conversão e tamanho de lote,
+registros/s, MB/s, pico de memória (RSS) e o tempo gasto em cada etapa
+(leitura do JSON, renderização do SQL e gravação).
+
+Cada medição roda em um subprocesso separado, de modo que o pico de memória de um
+modo não contamina os demais.
+
+Uso:
+    python benchmark.py --registros 300000
+    python benchmark.py --modos lista,streaming --lotes 500,1000,5000 --repeticoes 3
+    python benchmark.py --salvar base.json
+    python benchmark.py --comparar base.json --tolerancia 0.10   # código 1 se houver regressão
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import resource  # Indisponível no Windows: pico de memória não é medido
+except ImportError:
+    resource = None
+
+from sql_script_automator import (DEFAULT_WRITE_BUFFER_SIZE, DIALECTS, JSONRecordStream, JSONToSQLConverter,
+                                  open_input_stream)
+
+# Modos de conversão medidos: opções do conversor e da leitura
+MODES = {
+    'lista': {'streaming': False},
+    'streaming': {'streaming': True},
+    'tipado': {'streaming': False, 'column_types': 'infer'},
+    'estrito': {'streaming': False, 'column_types': 'infer', 'strict_dates': True},
+    'cache': {'streaming': False, 'column_types': 'infer', 'value_cache_size': 1024},
+    'colunar': {'streaming': False, 'column_types': 'infer', 'engine': 'columnar'},
+    'paralelo': {'streaming': True, 'workers': max(2, os.cpu_count() or 1)},
+}
+
+DEFAULT_MODES = ('lista', 'streaming', 'tipado')
+
+# Valores usados pelo gerador de dados sintéticos
+_NOMES = ('SANTA CASA', 'HOSPITAL', 'CLINICA', 'LABORATORIO', 'UNIDADE BASICA', 'POSTO DE SAUDE',
+          'CENTRO DE SAUDE', 'POLICLINICA', 'FARMACIA', 'CONSULTORIO')
+_COMPLEMENTOS = ('SAO JOSE', 'VIDA', 'BOA ESPERANCA', "D'AVILA", 'SANTA MARIA', "SANT'ANA", 'DO POVO',
+                 'CENTRAL', 'NOSSA SENHORA', "JOANA D'ARC", 'SAO LUCAS', 'FILIAL THEOBROMA')
+_LOGRADOUROS = ('RUA', 'AVENIDA', 'TRAVESSA', 'ALAMEDA', 'RODOVIA')
+_BAIRROS = ('CENTRO', 'SETOR 01', 'JARDIM AMERICA', 'VILA NOVA', "BAIRRO D'OESTE", 'ZONA RURAL')
+_TURNOS = ('ATENDIMENTOS NOS TURNOS DA MANHA E A TARDE', 'ATENDIMENTO CONTINUO DE 24 HORAS/DIA',
+           'ATENDIMENTO SOMENTE PELA MANHA', 'ATENDIMENTO SOMENTE A TARDE')
+_UFS = (11, 12, 13, 15, 21, 23, 26, 29, 31, 33, 35, 41, 42, 43, 50, 51, 52, 53)
+
+def _maybe(rng: random.Random, probability: float, value: Any) -> Any:
+    """
+    Retorna o valor com a probabilidade indicada, ou None.
+    """
+    return value if rng.random() < probability else None
+
+def _digits(rng: random.Random, length: int) -> str:
+    """
+    Gera uma string de dígitos com o tamanho indicado.
+    """
+    return ''.join(rng.choice('0123456789') for _ in range(length))
+
+def _date(rng: random.Random) -> str:
+    """
+    Gera uma data de atualização, majoritariamente ISO, mas também nos formatos
+    DD/MM/YYYY, YYYY/MM/DD e DD-MM-YYYY (este último passa pelo caminho lento de datas).
+    """
+    year, month, day = rng.randint(2015, 2025), rng.randint(1, 12), rng.randint(1, 28)
+    choice = rng.random()
+    if choice < 0.80:
+        return f"{year}-{month:02d}-{day:02d}"
+    if choice < 0.90:
+        return f"{day:02d}/{month:02d}/{year}"
+    if choice < 0.95:
+        return f"{year}/{month:02d}/{day:02d}"
+    return f"{day:02d}-{month:02d}-{year}"
+
+def generate_records(count: int, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    """
+    Gera registros sintéticos de unidade_saude no formato do CNES.
+
+    Args:
+        count: Quantidade de registros
+        seed: Semente do gerador, para conjuntos de dados reproduzíveis
+
+    Yields:
+        Dicionários com as mesmas colunas de JSONToSQLConverter.required_fields
+    """
+    rng = random.Random(seed)
+    for index in range(count):
+        codigo_uf = rng.choice(_UFS)
+        codigo_municipio = codigo_uf * 10000 + rng.randint(0, 9999)
+        codigo_cnes = 2000000 + index
+        nome = f"{rng.choice(_NOMES)} {rng.choice(_COMPLEMENTOS)}"
+        yield {
+            "codigo_cnes": codigo_cnes,
+            "numero_cnpj_entidade": _maybe(rng, 0.3, _digits(rng, 14)),
+            "nome_razao_social": f"{nome} LTDA",
+            "nome_fantasia": nome,
+            "natureza_organizacao_entidade": _maybe(rng, 0.1, "ADMINISTRACAO DIRETA DA SAUDE"),
+            "tipo_gestao": rng.choice(('M', 'E', 'D', None)),
+            "descricao_nivel_hierarquia": _maybe(rng, 0.2, "NIVEL 1"),
+            "descricao_esfera_administrativa": _maybe(rng, 0.2, rng.choice(('MUNICIPAL', 'ESTADUAL', 'PRIVADA'))),
+            "codigo_tipo_unidade": rng.choice((1, 2, 4, 5, 22, 36, 39, 43, 70)),
+            "codigo_cep_estabelecimento": _digits(rng, 8),
+            "endereco_estabelecimento": f"{rng.choice(_LOGRADOUROS)} {rng.choice(_COMPLEMENTOS)}",
+            "numero_estabelecimento": rng.choice((str(rng.randint(1, 9999)), 'S/N')),
+            "bairro_estabelecimento": rng.choice(_BAIRROS),
+            "numero_telefone_estabelecimento": _maybe(rng, 0.7, f"{rng.randint(11, 99)} {_digits(rng, 8)}"),
+            "latitude_estabelecimento_decimo_grau": _maybe(rng, 0.9, rng.uniform(-33.7, 5.2)),
+            "longitude_estabelecimento_decimo_grau": _maybe(rng, 0.9, rng.uniform(-73.9, -34.8)),
+            "endereco_email_estabelecimento": _maybe(rng, 0.5, f"contato{index}@saude.gov.br"),
+            "numero_cnpj": _maybe(rng, 0.6, _digits(rng, 14)),
+            "codigo_identificador_turno_atendimento": f"{rng.randint(1, 6):02d}",
+            "descricao_turno_atendimento": rng.choice(_TURNOS),
+            "estabelecimento_faz_atendimento_ambulatorial_sus": rng.choice(('SIM', 'NAO')),
+            "codigo_estabelecimento_saude": f"{codigo_municipio}{codigo_cnes}",
+            "codigo_uf": codigo_uf,
+            "codigo_municipio": codigo_municipio,
+            "descricao_natureza_juridica_estabelecimento": rng.choice(('1023', '1244', '2305', '3999')),
+            "codigo_motivo_desabilitacao_estabelecimento": _maybe(rng, 0.1, "10"),
+            "estabelecimento_possui_centro_cirurgico": rng.randint(0, 1),
+            "estabelecimento_possui_centro_obstetrico": rng.randint(0, 1),
+            "estabelecimento_possui_centro_neonatal": rng.randint(0, 1),
+            "estabelecimento_possui_atendimento_hospitalar": rng.randint(0, 1),
+            "estabelecimento_possui_servico_apoio": rng.randint(0, 1),
+            "estabelecimento_possui_atendimento_ambulatorial": rng.randint(0, 1),
+            "codigo_atividade_ensino_unidade": f"{rng.randint(1, 4):02d}",
+            "codigo_natureza_organizacao_unidade": _maybe(rng, 0.1, "01"),
+            "codigo_nivel_hierarquia_unidade": _maybe(rng, 0.1, "02"),
+            "codigo_esfera_administrativa_unidade": _maybe(rng, 0.1, "03"),
+            "data_atualizacao": _date(rng),
+        }
+
+def write_dataset(path: str, count: int, seed: int = 42):
+    """
+    Grava o conjunto de dados sintético: JSON Lines para .jsonl/.ndjson, array JSON nos demais casos.
+    """
+    json_lines = path.lower().endswith(('.jsonl', '.ndjson'))
+    with open(path, 'w', encoding='utf-8') as f:
+        if json_lines:
+            for record in generate_records(count, seed):
+                f.write(json.dumps(record, ensure_ascii=False))
+                f.write('\n')
+        else:
+            f.write('[\n')
+            for index, record in enumerate(generate_records(count, seed)):
+                if index:
+                    f.write(',\n')
+                f.write(json.dumps(record, ensure_ascii=False))
+            f.write('\n]\n')
+
+class _TimedIterator:
+    """
+    Iterador que acumula o tempo gasto obtendo cada registro (leitura incremental do JSON).
+    """
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+        self.elapsed = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self._iterator)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+class _TimedWriter:
+    """
+    Arquivo de saída que acumula o tempo gasto nas gravações.
+    """
+    def __init__(self, output):
+        self._output = output
+        self.elapsed = 0.0
+
+    def write(self, data: bytes) -> int:
+        start = time.perf_counter()
+        try:
+            return self._output.write(data)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+def _peak_rss_mb() -> Optional[float]:
+    """
+    Pico de memória residente do processo atual, em MB (None se indisponível).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _children_cpu_time() -> float:
+    """
+    Tempo de CPU dos processos filhos já encerrados (renderização paralela).
+    """
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def run_mode(mode: str, input_file: str, batch_size: int, dialect: str = 'standard',
+             output_file: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Executa uma conversão no processo atual e mede tempos por etapa.
+
+    Args:
+        mode: Nome do modo (ver MODES)
+        input_file: Arquivo JSON de entrada (comprimido ou não)
+        batch_size: Tamanho do lote
+        dialect: Dialeto de saída
+        output_file: Arquivo SQL de saída (padrão: descartado em os.devnull)
+
+    Returns:
+        Dicionário com as métricas da execução
+    """
+    options = dict(MODES[mode])
+    streaming = options.pop('streaming')
+    workers = options.pop('workers', 1)
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    converter = JSONToSQLConverter("unidade_saude", dialect=dialect, **options)
+
+    with open(input_file, 'rb') as raw, \
+            open(output_file or os.devnull, 'wb', buffering=DEFAULT_WRITE_BUFFER_SIZE) as out:
+        input_stream, _ = open_input_stream(raw)
+        if streaming:
+            records = _TimedIterator(JSONRecordStream(input_stream))
+            parse_time = None
+        else:
+            parse_start = time.perf_counter()
+            if input_file.lower().endswith(('.jsonl', '.ndjson')):
+                records = list(JSONRecordStream(input_stream))
+            else:
+                records = json.load(input_stream)
+            parse_time = time.perf_counter() - parse_start
+
+        writer = _TimedWriter(out)
+        summary = converter.write_sql(records, writer, batch_size, show_progress=False, workers=workers)
+
+    wall_time = time.perf_counter() - wall_start
+    cpu_time = time.process_time() - cpu_start + _children_cpu_time()
+    if parse_time is None:
+        parse_time = records.elapsed
+    input_mb = os.path.getsize(input_file) / (1024 * 1024)
+
+    return {
+        'modo': mode,
+        'lote': batch_size,
+        'dialeto': dialect,
+        'registros': summary.records,
+        'tempo_s': round(wall_time, 4),
+        'cpu_s': round(cpu_time, 4),
+        'registros_por_s': round(summary.records / wall_time, 1) if wall_time > 0 else None,
+        'mb_entrada_por_s': round(input_mb / wall_time, 2) if wall_time > 0 else None,
+        'mb_saida': round(summary.bytes_written / (1024 * 1024), 2),
+        'pico_rss_mb': _peak_rss_mb(),
+        'etapas_s': {
+            'leitura': round(parse_time, 4),
+            'renderizacao': round(wall_time - parse_time - writer.elapsed, 4),
+            'gravacao': round(writer.elapsed, 4),
+        },
+    }
+
+def run_isolated(mode: str, input_file: str, batch_size: int, dialect: str) -> Dict[str, Any]:
+    """
+    Executa run_mode em um subprocesso, para medir o pico de memória de forma isolada.
+    """
+    command = [sys.executable, os.path.abspath(__file__), '--executar-modo', mode,
+               '--entrada', input_file, '--lotes', str(batch_size), '--dialeto', dialect]
+    completed = subprocess.run(command, capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        raise RuntimeError(f"Falha no modo {mode} (lote {batch_size}): {completed.stderr.strip()}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def compare_results(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+                    tolerance: float) -> List[str]:
+    """
+    Compara a vazão com uma execução de referência.
+
+    Returns:
+        Mensagens das combinações modo/lote/dialeto que ficaram mais lentas que a tolerância
+    """
+    reference = {(r['modo'], r['lote'], r['dialeto']): r for r in baseline}
+    regressions = []
+    for result in results:
+        previous = reference.get((result['modo'], result['lote'], result['dialeto']))
+        if not previous or not previous.get('registros_por_s'):
+            continue
+        ratio = result['registros_por_s'] / previous['registros_por_s']
+        if ratio < 1 - tolerance:
+            regressions.append(f"{result['modo']} (lote {result['lote']}, {result['dialeto']}): "
+                               f"{previous['registros_por_s']:.0f} -> {result['registros_por_s']:.0f} "
+                               f"registros/s ({(ratio - 1) * 100:+.1f}%)")
+    return regressions
+
+def print_table(results: List[Dict[str, Any]]):
+    """
+    Exibe os resultados em forma de tabela.
+    """
+    header = (f"{'modo':<10} {'lote':>6} {'registros/s':>12} {'MB/s':>7} {'RSS MB':>8} "
+              f"{'leitura':>8} {'render':>8} {'gravação':>9} {'CPU s':>7}")
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        rss = f"{r['pico_rss_mb']:.1f}" if r['pico_rss_mb'] is not None else '-'
+        stages = r['etapas_s']
+        print(f"{r['modo']:<10} {r['lote']:>6} {r['registros_por_s']:>12.0f} {r['mb_entrada_por_s']:>7.2f} "
+              f"{rss:>8} {stages['leitura']:>8.3f} {stages['renderizacao']:>8.3f} "
+              f"{stages['gravacao']:>9.3f} {r['cpu_s']:>7.2f}")
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """
+    Cria o parser de argumentos do benchmark.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark do conversor JSON para SQL com dados sintéticos.')
+    parser.add_argument('--registros', type=int, default=100000,
+                        help='quantidade de registros sintéticos (padrão: 100000)')
+    parser.add_argument('--entrada', help='usa um arquivo JSON existente em vez de gerar dados')
+    parser.add_argument('--formato', choices=('json', 'jsonl'), default='json',
+                        help='formato dos dados gerados (padrão: json)')
+    parser.add_argument('--semente', type=int, default=42, help='semente do gerador (padrão: 42)')
+    parser.add_argument('--modos', default=','.join(DEFAULT_MODES),
+                        help=f"modos separados por vírgula: {', '.join(MODES)} (padrão: {','.join(DEFAULT_MODES)})")
+    parser.add_argument('--lotes', default='1000', help='tamanhos de lote separados por vírgula (padrão: 1000)')
+    parser.add_argument('--dialeto', default='standard', choices=sorted(DIALECTS), help='dialeto de saída')
+    parser.add_argument('--repeticoes', type=int, default=1,
+                        help='execuções por combinação; vale a mais rápida (padrão: 1)')
+    parser.add_argument('--salvar', metavar='ARQUIVO', help='grava os resultados em JSON')
+    parser.add_argument('--comparar', metavar='ARQUIVO', help='compara com resultados salvos anteriormente')
+    parser.add_argument('--tolerancia', type=float, default=0.10,
+                        help='queda de vazão tolerada na comparação (padrão: 0.10 = 10%%)')
+    parser.add_argument('--executar-modo', help=argparse.SUPPRESS)
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Ponto de entrada do benchmark.
+
+    Returns:
+        Código de saída: 0 em caso de sucesso, 1 se a comparação encontrar regressões
+    """
+    args = build_arg_parser().parse_args(argv)
+
+    # Execução interna de um único modo (subprocesso)
+    if args.executar_modo:
+        print(json.dumps(run_mode(args.executar_modo, args.entrada, int(args.lotes), args.dialeto)))
+        return 0
+
+    modes = [mode.strip() for mode in args.modos.split(',') if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        print(f"❌ Modos desconhecidos: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    batch_sizes = [int(size) for size in args.lotes.split(',')]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_file = os.path.abspath(args.entrada) if args.entrada else None
+        if not input_file:
+            input_file = os.path.join(temp_dir, f"cnes_sintetico.{args.formato}")
+            print(f"🔄 Gerando {args.registros} registros sintéticos...")
+            write_dataset(input_file, args.registros, args.semente)
+        print(f"📄 Entrada: {input_file} ({os.path.getsize(input_file) / (1024 * 1024):.2f} MB)\n")
+
+        results = []
+        for mode in modes:
+            for batch_size in batch_sizes:
+                runs = [run_isolated(mode, input_file, batch_size, args.dialeto) for _ in range(args.repeticoes)]
+                results.append(min(runs, key=lambda r: r['tempo_s']))
+
+    print_table(results)
+
+    if args.salvar:
+        with open(args.salvar, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'resultados': results}, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ Resultados salvos em: {args.salvar}")
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['resultados']
+        regressions = compare_results(results, baseline, args.tolerancia)
+        if regressions:
+            print("\n❌ Regressões de desempenho:")
+            for message in regressions:
+                print(f"   • {message}")
+            return 1
+        print("\n✅ Nenhuma regressão acima da tolerância")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
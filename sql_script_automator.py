@@ -1,10 +1,96 @@
+import argparse
+import asyncio
+import bz2
+import codecs
+import contextlib
+import functools
+import gzip
+import hashlib
 import json
+import lzma
+import marshal
+import os
+import queue
 import re
+import shutil
+import sqlite3
+import tempfile
 import time
 import sys
+import threading
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, List, Dict, Optional
 from io import StringIO
+from itertools import chain, islice
+from typing import Any, Callable, List, Dict, Iterable, Iterator, Optional, Tuple, Union, BinaryIO
+
+try:
+    import zstandard  # Opcional: leitura/gravação de arquivos .zst
+except ImportError:
+    zstandard = None
+
+try:
+    import tomllib  # Python 3.11+: arquivos de mapeamento em TOML
+except ImportError:
+    tomllib = None
+
+try:
+    import yaml  # Opcional: arquivos de mapeamento em YAML
+except ImportError:
+    yaml = None
+
+__version__ = '2.0.0'
+
+# Extensões tratadas como JSON Lines (um objeto JSON por linha)
+JSON_LINES_EXTENSIONS = ('.jsonl', '.ndjson')
+
+# Buffer de escrita padrão do arquivo SQL de saída (1 MB)
+DEFAULT_WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Tamanho máximo padrão do cache de conversões em disco (1 GB; ver ConversionCache)
+DEFAULT_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Chaves mantidas em memória pela remoção de duplicados antes de passar para um SQLite
+# temporário (ver DedupOptions)
+DEDUP_MAX_MEMORY_KEYS = 1_000_000
+
+# Pipeline (leitura, renderização e gravação simultâneas): itens em trânsito entre os
+# estágios e registros por bloco entregue pelo estágio de leitura
+PIPELINE_QUEUE_SIZE = 8
+PIPELINE_READ_BLOCK = 256
+
+# Compressões suportadas, detectadas pela extensão (saída) ou pelos bytes mágicos (entrada)
+COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.xz': 'xz', '.bz2': 'bz2', '.zst': 'zstd'}
+COMPRESSION_MAGIC = ((b'\x1f\x8b', 'gzip'), (b'\xfd7zXZ\x00', 'xz'), (b'BZh', 'bz2'),
+                     (b'\x28\xb5\x2f\xfd', 'zstd'))
+COMPRESSIONS = ('gzip', 'xz', 'bz2', 'zstd')
+
+# Critérios de divisão da saída em partes (ver ShardingOptions) e tamanho padrão das
+# partes por registros e por bytes
+SHARD_MODES = ('rows', 'bytes', 'hash')
+DEFAULT_SHARD_ROWS = 100000
+DEFAULT_SHARD_BYTES = 500 * 1024 * 1024
+
+# Tipos de coluna aceitos pelos formatadores especializados:
+#   int   - inteiros (str direto)
+#   float - números (int ou float)
+#   flag  - inteiros 0/1 (tabela de consulta)
+#   bool  - booleanos (TRUE/FALSE)
+#   text  - strings (apenas escape de aspas)
+#   date  - datas (normalização para YYYY-MM-DD)
+#   auto  - formatador genérico (format_sql_value)
+COLUMN_TYPES = ('int', 'float', 'flag', 'bool', 'text', 'date', 'auto')
+
+# Motores de formatação dos lotes:
+#   rows     - registro a registro (padrão)
+#   columnar - coluna a coluna, formatando uma única vez cada valor distinto da coluna
+ENGINES = ('rows', 'columnar')
+
+# Quantidade de registros usada para inferir os tipos das colunas
+TYPE_INFERENCE_SAMPLE_SIZE = 1000
 
 class ProgressBar:
     """
@@ -35,9 +121,13 @@ class ProgressBar:
         self.last_update = current_time
         self._draw()
     
-    def _draw(self):
+    def _draw(self, eta_seconds: Optional[float] = None, detail: str = ""):
         """
         Desenha a barra de progresso no terminal.
+        
+        Args:
+            eta_seconds: Tempo restante já estimado (padrão: pela taxa média desde o início)
+            detail: Texto adicional ao final da linha (ex: contadores e vazão)
         """
         if self.total == 0:
             return
@@ -52,7 +142,9 @@ class ProgressBar:
         # Calcular tempo decorrido e estimativa
         elapsed_time = time.time() - self.start_time
         
-        if self.current > 0:
+        if eta_seconds is not None:
+            eta_formatted = self._format_time(eta_seconds)
+        elif self.current > 0:
             # Estimar tempo restante
             rate = self.current / elapsed_time
             remaining_items = self.total - self.current
@@ -66,17 +158,22 @@ class ProgressBar:
         # Formatar linha de progresso
         progress_line = (f"\r{self.description}: |{bar}| "
                         f"{self.current}/{self.total} ({percent:.1f}%) "
-                        f"⏱️ {elapsed_formatted} | ETA: {eta_formatted}")
-        
-        # Limpar linha anterior e escrever nova
-        sys.stdout.write('\r' + ' ' * 120)  # Limpar linha
-        sys.stdout.write(progress_line)
-        sys.stdout.flush()
+                        f"⏱️ {elapsed_formatted} | ETA: {eta_formatted}{detail}")
+        self._write_line(progress_line)
         
         # Nova linha quando completo
         if self.current >= self.total:
             print()  # Nova linha ao final
     
+    def _write_line(self, line: str):
+        """
+        Reescreve a linha atual do terminal, apagando com espaços só o que sobrar da anterior.
+        """
+        padding = max(0, getattr(self, '_last_length', 0) - len(line))
+        self._last_length = len(line)
+        sys.stdout.write(line + ' ' * padding)
+        sys.stdout.flush()
+    
     def _format_time(self, seconds: float) -> str:
         """
         Formata tempo em segundos para formato legível.
@@ -105,351 +202,5253 @@ class ProgressBar:
         self.current = self.total
         self._draw()
 
-class JSONToSQLConverter:
-    def __init__(self, table_name: str = "unidade_saude"):
-        self.table_name = table_name
-        # Campos específicos que devem ser incluídos no SQL
-        self.required_fields = [
-            "codigo_cnes",
-            "numero_cnpj_entidade",
-            "nome_razao_social",
-            "nome_fantasia",
-            "natureza_organizacao_entidade",
-            "tipo_gestao",
-            "descricao_nivel_hierarquia",
-            "descricao_esfera_administrativa",
-            "codigo_tipo_unidade",
-            "codigo_cep_estabelecimento",
-            "endereco_estabelecimento",
-            "numero_estabelecimento",
-            "bairro_estabelecimento",
-            "numero_telefone_estabelecimento",
-            "latitude_estabelecimento_decimo_grau",
-            "longitude_estabelecimento_decimo_grau",
-            "endereco_email_estabelecimento",
-            "numero_cnpj",
-            "codigo_identificador_turno_atendimento",
-            "descricao_turno_atendimento",
-            "estabelecimento_faz_atendimento_ambulatorial_sus",
-            "codigo_estabelecimento_saude",
-            "codigo_uf",
-            "codigo_municipio",
-            "descricao_natureza_juridica_estabelecimento",
-            "codigo_motivo_desabilitacao_estabelecimento",
-            "estabelecimento_possui_centro_cirurgico",
-            "estabelecimento_possui_centro_obstetrico",
-            "estabelecimento_possui_centro_neonatal",
-            "estabelecimento_possui_atendimento_hospitalar",
-            "estabelecimento_possui_servico_apoio",
-            "estabelecimento_possui_atendimento_ambulatorial",
-            "codigo_atividade_ensino_unidade",
-            "codigo_natureza_organizacao_unidade",
-            "codigo_nivel_hierarquia_unidade",
-            "codigo_esfera_administrativa_unidade",
-            "data_atualizacao"
-        ]
+def _isatty(stream: Any) -> bool:
+    """
+    Se o fluxo é um terminal interativo.
+    """
+    isatty = getattr(stream, 'isatty', None)
+    try:
+        return bool(isatty and isatty())
+    except ValueError:
+        return False
+
+class ProgressReporter:
+    """
+    Progresso da conversão amostrado por uma thread (ticker), fora do laço de conversão.
+    
+    O laço só incrementa contadores (advance); a cada intervalo a thread lê os contadores e os
+    bytes lidos da entrada, calcula a vazão recente (janela deslizante) e o tempo restante, e
+    exibe a barra no terminal ou, com output, grava uma linha JSON por amostra. Fora de um
+    terminal e sem output, nada é exibido (a saída padrão pode ser de quem chamou).
+    """
+    def __init__(self, description: str = "Processando", total_records: Optional[int] = None,
+                 total_bytes: Optional[int] = None, bytes_source: Optional[Callable[[], int]] = None,
+                 output: Optional[Any] = None, interval: Optional[float] = None, window: float = 10.0):
+        """
+        Args:
+            description: Descrição exibida na barra
+            total_records: Total de registros, se conhecido
+            total_bytes: Tamanho da entrada, se conhecido (tem prioridade no percentual e no ETA)
+            bytes_source: Função que retorna os bytes lidos da entrada até o momento
+            output: Arquivo de texto para o progresso em JSON Lines (padrão: barra em um terminal,
+                    nada fora de um terminal)
+            interval: Intervalo entre amostras em segundos (padrão: 0.2 na barra, 5 em JSON Lines)
+            window: Janela em segundos usada para a vazão e o ETA
+        """
+        self.description = description
+        self.total_records = total_records
+        self.total_bytes = total_bytes
+        self.bytes_source = bytes_source
+        self.records = 0
+        self.json_output = output
+        self.interval = interval or (5.0 if output is not None else 0.2)
+        self.window = window
+        self.start_time = time.monotonic()
+        self._samples = deque([(self.start_time, 0, 0)])
+        self._bar = None
+        self._stop = threading.Event()
+        # Sem terminal nem output não há o que exibir: nem a thread é criada
+        self._silent = output is None and not _isatty(sys.stdout)
+        self._thread = None
+        if not self._silent:
+            self._thread = threading.Thread(target=self._run, name='progresso', daemon=True)
+            self._thread.start()
+    
+    def advance(self, records: int = 1):
+        """
+        Registra registros processados (apenas um incremento: quem exibe é a thread).
+        """
+        self.records += records
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Amostra os contadores e calcula vazão e tempo restante na janela recente.
+        """
+        now = time.monotonic()
+        records = self.records
+        bytes_read = self.bytes_source() if self.bytes_source is not None else None
+        samples = self._samples
+        samples.append((now, records, bytes_read or 0))
+        while len(samples) > 2 and now - samples[1][0] >= self.window:
+            samples.popleft()
+        start, start_records, start_bytes = samples[0]
+        elapsed = now - start
+        records_per_s = (records - start_records) / elapsed if elapsed > 0 else 0.0
+        bytes_per_s = ((bytes_read or 0) - start_bytes) / elapsed if elapsed > 0 else 0.0
         
-    def format_sql_value(self, value: Any) -> str:
+        fraction = eta = None
+        if self.total_bytes and bytes_read is not None:
+            fraction = min(bytes_read / self.total_bytes, 1.0)
+            if bytes_per_s > 0:
+                eta = max(self.total_bytes - bytes_read, 0) / bytes_per_s
+        elif self.total_records:
+            fraction = min(records / self.total_records, 1.0)
+            if records_per_s > 0:
+                eta = max(self.total_records - records, 0) / records_per_s
+        return {
+            'evento': 'progresso',
+            'descricao': self.description,
+            'registros': records,
+            'total_registros': self.total_records,
+            'bytes': bytes_read,
+            'total_bytes': self.total_bytes,
+            'percentual': round(fraction * 100, 1) if fraction is not None else None,
+            'registros_por_s': round(records_per_s, 1),
+            'bytes_por_s': round(bytes_per_s, 1) if bytes_read is not None else None,
+            'eta_s': round(eta, 1) if eta is not None else None,
+            'decorrido_s': round(now - self.start_time, 3),
+        }
+    
+    def _emit(self, snapshot: Dict[str, Any]):
+        if self.json_output is not None:
+            self.json_output.write(json.dumps(snapshot, ensure_ascii=False) + '\n')
+            self.json_output.flush()
+            return
+        detail = f" | {snapshot['registros']} registros, {snapshot['registros_por_s']:.0f}/s"
+        if snapshot['bytes_por_s'] is not None:
+            detail += f", {snapshot['bytes_por_s'] / (1024 * 1024):.1f} MB/s"
+        total = self.total_bytes if self.total_bytes and snapshot['bytes'] is not None else self.total_records
+        if self._bar is None:
+            self._bar = ProgressBar(total or 0, self.description)
+            self._bar.start_time = time.time() - (time.monotonic() - self.start_time)
+        if not total:
+            # Total desconhecido (ex: stdin): só contadores e vazão
+            elapsed = self._bar._format_time(snapshot['decorrido_s'])
+            self._bar._write_line(f"\r{self.description}: ⏱️ {elapsed}{detail}")
+            return
+        done = snapshot['bytes'] if total == self.total_bytes else snapshot['registros']
+        self._bar.current = min(done, total)
+        if snapshot['evento'] != 'fim' and self._bar.current >= total:
+            # A linha final (com quebra de linha) fica para finish
+            self._bar.current = total - 1
+        self._bar._draw(snapshot['eta_s'], detail)
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._emit(self.snapshot())
+    
+    def finish(self):
+        """
+        Para a thread e exibe a amostra final (100% na barra; evento "fim" em JSON Lines).
+        """
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._silent:
+            return
+        self._thread.join()
+        snapshot = self.snapshot()
+        snapshot['evento'] = 'fim'
+        # Na amostra final, a vazão é a média da conversão inteira
+        elapsed = snapshot['decorrido_s']
+        if elapsed > 0:
+            snapshot['registros_por_s'] = round(self.records / elapsed, 1)
+            if snapshot['bytes'] is not None:
+                snapshot['bytes_por_s'] = round(snapshot['bytes'] / elapsed, 1)
+        if snapshot['percentual'] is not None:
+            snapshot['percentual'], snapshot['eta_s'] = 100.0, 0.0
+            if snapshot['bytes'] is not None and self.total_bytes:
+                snapshot['bytes'] = max(snapshot['bytes'], self.total_bytes)
+        self._emit(snapshot)
+        if self.json_output is None and not (self.total_bytes or self.total_records):
+            print()
+    
+    def close(self):
+        """
+        Para a thread sem a amostra final (conversão interrompida); sem efeito após finish.
+        """
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._silent:
+            return
+        self._thread.join()
+        if self.json_output is None and self._bar is not None:
+            print()
+
+# Caracteres finais do buffer em que um erro de decodificação ainda pode ser só um registro
+# cortado pela leitura em blocos (literal ou número incompleto); ver JSONRecordStream._incomplete
+_JSON_TOKEN_TAIL = 64
+
+class JSONRecordStream:
+    """
+    Lê registros de um arquivo JSON de forma incremental, um de cada vez.
+
+    Aceita tanto um array JSON no nível superior ([{...}, {...}]) quanto
+    JSON Lines (um objeto por linha). Apenas um bloco de leitura e o registro
+    atual ficam em memória, independentemente do tamanho do arquivo.
+
+    Com entrada comprimida, position_source é o arquivo comprimido subjacente: bytes_read
+    passa a acompanhar a posição nele, comparável a total_bytes (tamanho em disco).
+    """
+    def __init__(self, file_obj: BinaryIO, chunk_size: int = 1024 * 1024, total_bytes: Optional[int] = None,
+                 position_source: Optional[BinaryIO] = None, skip_records: int = 0):
+        self.file_obj = file_obj
+        self.chunk_size = chunk_size
+        self.total_bytes = total_bytes
+        self.position_source = position_source
+        # Registros iniciais decodificados mas não entregues (retomada de conversão)
+        self.skip_records = skip_records
+        self.bytes_read = 0
+        self.records_read = 0
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self._eof = False
+
+    def _read_chunk(self) -> str:
+        """
+        Lê o próximo bloco do arquivo e decodifica para texto.
+
+        Returns:
+            Texto decodificado (string vazia ao final do arquivo)
+        """
+        raw = self.file_obj.read(self.chunk_size)
+        if not raw:
+            self._eof = True
+            return self._text_decoder.decode(b'', final=True)
+        if self.position_source is not None:
+            self.bytes_read = self.position_source.tell()
+        else:
+            self.bytes_read += len(raw)
+        return self._text_decoder.decode(raw)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        buffer = ''
+        pos = 0
+        in_array = None
+        # Dentro do array: esperando um registro (após '[' ou ',') ou ',' / ']' (após um registro)
+        expect_value = True
+        
+        while True:
+            # Pular espaços em branco
+            while True:
+                while pos < len(buffer) and buffer[pos].isspace():
+                    pos += 1
+                if pos < len(buffer) or self._eof:
+                    break
+                buffer = buffer[pos:] + self._read_chunk()
+                pos = 0
+            
+            if pos >= len(buffer):
+                if in_array:
+                    raise json.JSONDecodeError("Array JSON não foi fechado", buffer, pos)
+                return
+            
+            # Detectar formato pelo primeiro caractere significativo
+            if in_array is None:
+                if buffer[pos] == '[':
+                    in_array = True
+                    pos += 1
+                    continue
+                if buffer[pos] != '{':
+                    raise json.JSONDecodeError("Esperado array JSON ou JSON Lines", buffer, pos)
+                in_array = False
+            
+            if in_array:
+                char = buffer[pos]
+                if char == ']':
+                    if expect_value and self.records_read:
+                        raise json.JSONDecodeError("Vírgula sobrando antes de ']'", buffer, pos)
+                    self._check_end(buffer, pos + 1)
+                    return
+                if not expect_value:
+                    if char != ',':
+                        raise json.JSONDecodeError(f"Esperado ',' ou ']' após o registro {self.records_read}",
+                                                   buffer, pos)
+                    expect_value = True
+                    pos += 1
+                    continue
+                if char == ',':
+                    raise json.JSONDecodeError(f"Vírgula sem registro antes do registro {self.records_read + 1}",
+                                               buffer, pos)
+            
+            # Decodificar o próximo registro, lendo mais dados apenas se ele terminar no fim do buffer
+            while True:
+                try:
+                    record, end = self._decoder.raw_decode(buffer, pos)
+                    break
+                except json.JSONDecodeError as e:
+                    if self._eof or not self._incomplete(e, buffer):
+                        raise json.JSONDecodeError(f"Registro {self.records_read + 1}: {e.msg}", e.doc, e.pos)
+                    buffer = buffer[pos:] + self._read_chunk()
+                    pos = 0
+            
+            pos = end
+            expect_value = False
+            self.records_read += 1
+            if self.records_read > self.skip_records:
+                yield record
+            
+            # Descartar a parte já consumida para manter o buffer pequeno
+            if pos > self.chunk_size:
+                buffer = buffer[pos:]
+                pos = 0
+    
+    @staticmethod
+    def _incomplete(error: json.JSONDecodeError, buffer: str) -> bool:
+        """
+        Indica se o erro de decodificação vem de um registro cortado no fim do buffer (e não de
+        um registro inválido): texto sem aspas de fechamento ou erro nos últimos caracteres,
+        como um literal (tru) ou número (1.) cortado. Um registro inválido no meio do buffer
+        é informado de imediato, sem ler o restante do arquivo.
+        """
+        return error.msg.startswith('Unterminated string') or error.pos >= len(buffer) - _JSON_TOKEN_TAIL
+    
+    def _check_end(self, buffer: str, pos: int):
+        """
+        Confere que só há espaços em branco depois do ']' que fecha o array (como json.load).
+        """
+        while True:
+            if buffer[pos:].strip():
+                raise json.JSONDecodeError("Dados após o fim do array JSON", buffer, pos)
+            if self._eof:
+                return
+            buffer = self._read_chunk()
+            pos = 0
+
+def detect_compression(path: Optional[str] = None, header: bytes = b'') -> Optional[str]:
+    """
+    Detecta a compressão pelos bytes mágicos do cabeçalho ou, na falta deles, pela extensão do arquivo.
+    
+    Returns:
+        'gzip', 'xz', 'bz2', 'zstd' ou None para dados sem compressão
+    """
+    for magic, compression in COMPRESSION_MAGIC:
+        if header.startswith(magic):
+            return compression
+    if path and not header:
+        return COMPRESSION_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    return None
+
+def strip_compression_extension(path: str) -> str:
+    """
+    Remove a extensão de compressão do caminho (dados.jsonl.gz -> dados.jsonl).
+    """
+    base, extension = os.path.splitext(path)
+    return base if extension.lower() in COMPRESSION_EXTENSIONS else path
+
+def check_compression(compression: Optional[str]):
+    """
+    Valida o nome da compressão e a disponibilidade do pacote opcional (zstd).
+    
+    Raises:
+        ValueError: Se a compressão for desconhecida ou o pacote zstandard não estiver instalado
+    """
+    if compression is None:
+        return
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Compressão desconhecida: {compression}. Use uma de: {', '.join(COMPRESSIONS)}")
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError("Compressão zstd requer o pacote 'zstandard' (pip install zstandard)")
+
+def wrap_compressed(fileobj: BinaryIO, compression: Optional[str], mode: str = 'rb') -> BinaryIO:
+    """
+    Envolve um fluxo binário com o (des)compressor indicado, sem arquivos temporários.
+    
+    O fluxo original não é fechado ao fechar o fluxo retornado.
+    
+    Args:
+        fileobj: Fluxo binário de leitura ou escrita
+        compression: 'gzip', 'xz', 'bz2', 'zstd' ou None (retorna o próprio fluxo)
+        mode: 'rb' para descompressão ou 'wb' para compressão
+    """
+    check_compression(compression)
+    if compression is None:
+        return fileobj
+    if compression == 'gzip':
+        # Nível 6 (padrão do gzip de linha de comando): bem mais rápido que o 9 com tamanho similar
+        return gzip.GzipFile(fileobj=fileobj, mode=mode, compresslevel=6)
+    if compression == 'xz':
+        return lzma.LZMAFile(fileobj, mode=mode)
+    if compression == 'bz2':
+        return bz2.BZ2File(fileobj, mode=mode)
+    if mode == 'wb':
+        return zstandard.ZstdCompressor().stream_writer(fileobj, closefd=False)
+    return zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True, closefd=False)
+
+def open_input_stream(fileobj: BinaryIO) -> Tuple[BinaryIO, Optional[str]]:
+    """
+    Detecta pelos bytes mágicos se a entrada está comprimida e retorna o fluxo já descomprimido.
+    
+    Requer um fluxo com peek (arquivos abertos em 'rb' e sys.stdin.buffer); os demais
+    são tratados como não comprimidos.
+    
+    Returns:
+        Tupla (fluxo de leitura, compressão detectada ou None)
+    """
+    header = fileobj.peek(6)[:6] if hasattr(fileobj, 'peek') else b''
+    compression = detect_compression(header=header)
+    return wrap_compressed(fileobj, compression, 'rb'), compression
+
+def shard_path(output_file: str, index: int) -> str:
+    """
+    Caminho da parte index (a partir de 0) de um arquivo de saída: carga.sql.gz -> carga.part0001.sql.gz.
+    """
+    base = strip_compression_extension(output_file)
+    root, extension = os.path.splitext(base)
+    return f"{root}.part{index + 1:04d}{extension}{output_file[len(base):]}"
+
+def _route_by_rows(records: Iterable[Dict[str, Any]], batch_size: int,
+                   shard_rows: int) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """
+    Distribui os lotes em partes de shard_rows registros, sem que um lote atravesse duas partes.
+    """
+    iterator = iter(records)
+    shard = 0
+    while True:
+        taken = 0
+        while taken < shard_rows:
+            batch = list(islice(iterator, min(batch_size, shard_rows - taken)))
+            if not batch:
+                return
+            yield shard, batch
+            taken += len(batch)
+        shard += 1
+
+def _route_by_hash(records: Iterable[Dict[str, Any]], batch_size: int, shard_count: int,
+                   key: str) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """
+    Distribui os registros entre shard_count partes pelo CRC32 do valor da chave, estável entre
+    execuções (123 e "123" caem na mesma parte). Cada parte acumula até um lote em memória.
+    """
+    buffers = [[] for _ in range(shard_count)]
+    for record in records:
+        shard = zlib.crc32(str(record.get(key)).encode('utf-8')) % shard_count
+        buffer = buffers[shard]
+        buffer.append(record)
+        if len(buffer) >= batch_size:
+            yield shard, buffer
+            buffers[shard] = []
+    for shard, buffer in enumerate(buffers):
+        if buffer:
+            yield shard, buffer
+
+def _sha256_file(path: str) -> str:
+    """
+    SHA-256 do conteúdo de um arquivo, lido em blocos.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _escape_copy_text(value: Any) -> str:
+    """
+    Formata um valor para o formato texto do COPY do PostgreSQL (colunas separadas por tabulação).
+    
+    Args:
+        value: Valor já convertido para parâmetro (None, bool, número ou string)
+        
+    Returns:
+        Valor escapado (\\N para nulo)
+    """
+    if value is None:
+        return "\\N"
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    text = value if type(value) is str else str(value)
+    if "\\" in text or "\t" in text or "\n" in text or "\r" in text:
+        text = text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return text
+
+def _driver_paramstyle(connection: Any) -> str:
+    """
+    Descobre o paramstyle DB-API do driver a partir do módulo da conexão.
+    
+    Args:
+        connection: Conexão DB-API
+        
+    Returns:
+        paramstyle do driver ('qmark' se não for possível descobrir)
+    """
+    module = sys.modules.get(type(connection).__module__.split('.')[0])
+    return getattr(module, 'paramstyle', 'qmark')
+
+# Marcadores de parâmetro por paramstyle DB-API
+_PARAM_PLACEHOLDERS = {
+    'qmark': lambda i, col: '?',
+    'format': lambda i, col: '%s',
+    'pyformat': lambda i, col: '%s',
+    'numeric': lambda i, col: f':{i + 1}',
+    'named': lambda i, col: f':{col}',
+}
+
+def _looks_like_date(value: str) -> bool:
+    """
+    Verifica se uma string passa pela detecção rápida de datas de format_sql_value.
+    
+    Strings só de dígitos (CEP, telefone) não têm os separadores exigidos por nenhum formato
+    de data e ficam de fora sem passar pelo caminho lento.
+    
+    Args:
+        value: String a verificar
+        
+    Returns:
+        True se a string tem o tamanho e os caracteres de uma data
+    """
+    return len(value) in (10, 8) and not value.isdigit() and value.replace('-', '').replace('/', '').isdigit()
+
+# Dias de cada mês (fevereiro com 29; anos não bissextos são tratados em _valid_date)
+_DAYS_IN_MONTH = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+def _valid_date(year: int, month: int, day: int) -> bool:
+    """
+    Verifica se dia, mês e ano formam uma data existente (mesmas regras de datetime).
+    """
+    if not (1 <= month <= 12 and 1 <= day <= _DAYS_IN_MONTH[month - 1]):
+        return False
+    return month != 2 or day < 29 or (year % 4 == 0 and (year % 100 != 0 or year % 400 == 0))
+
+def _parse_iso_date(value: str) -> Optional[str]:
+    """
+    YYYY-MM-DD já está no formato de saída.
+    """
+    if value[4] == '-' and value[7] == '-' and value[:4].isdigit() and value[5:7].isdigit() and value[8:].isdigit():
+        return value
+    return None
+
+def _parse_dmy_date(value: str) -> Optional[str]:
+    """
+    DD/MM/YYYY para YYYY-MM-DD, por fatias fixas.
+    """
+    if value[2] == '/' and value[5] == '/' and value[:2].isdigit() and value[3:5].isdigit() and value[6:].isdigit():
+        return f"{value[6:]}-{value[3:5]}-{value[:2]}"
+    return None
+
+def _parse_ymd_date(value: str) -> Optional[str]:
+    """
+    YYYY/MM/DD para YYYY-MM-DD, por fatias fixas.
+    """
+    if value[4] == '/' and value[7] == '/' and value[:4].isdigit() and value[5:7].isdigit() and value[8:].isdigit():
+        return f"{value[:4]}-{value[5:7]}-{value[8:]}"
+    return None
+
+def _parse_dmy_dash_date(value: str) -> Optional[str]:
+    """
+    DD-MM-YYYY para YYYY-MM-DD, validando a data como o strptime de _format_date faria
+    no caminho genérico. Anos abaixo de 1000 ficam com o caminho genérico, pois o strftime
+    não completa o ano com zeros.
+    """
+    if (value[2] == '-' and value[5] == '-' and value.isascii() and value[:2].isdigit()
+            and value[3:5].isdigit() and value[6:].isdigit() and value[6] != '0'
+            and _valid_date(int(value[6:]), int(value[3:5]), int(value[:2]))):
+        return f"{value[6:]}-{value[3:5]}-{value[:2]}"
+    return None
+
+# Formatos de data com rotina própria por coluna: nome -> conversão de uma string de
+# 10 caracteres para YYYY-MM-DD (None se a string não está exatamente nesse formato).
+# O resultado é o mesmo da detecção genérica de format_sql_value para o mesmo valor.
+#   iso      - YYYY-MM-DD
+#   dmy      - DD/MM/YYYY
+#   ymd      - YYYY/MM/DD
+#   dmy_dash - DD-MM-YYYY
+DATE_FORMATS = {
+    'iso': _parse_iso_date,
+    'dmy': _parse_dmy_date,
+    'ymd': _parse_ymd_date,
+    'dmy_dash': _parse_dmy_dash_date,
+}
+
+def detect_date_format(values: Iterable[Any]) -> Optional[str]:
+    """
+    Detecta o formato de data mais frequente entre os valores de uma coluna.
+    
+    Args:
+        values: Valores de amostra da coluna (não strings e nulos são ignorados)
+        
+    Returns:
+        Nome do formato em DATE_FORMATS, ou None se nenhum valor estiver em um deles
+    """
+    counts = dict.fromkeys(DATE_FORMATS, 0)
+    for value in values:
+        if type(value) is str and len(value) == 10:
+            for name, parse in DATE_FORMATS.items():
+                if parse(value) is not None:
+                    counts[name] += 1
+                    break
+    best = max(counts, key=counts.get)
+    return best if counts[best] else None
+
+# Formatos aceitos por _format_date, na ordem de tentativa, com as mesmas expressões que o
+# strptime compila para %Y, %m e %d, e a posição dos grupos de ano, mês e dia
+_STRPTIME_YEAR = r'(\d\d\d\d)'
+_STRPTIME_MONTH = r'(1[0-2]|0[1-9]|[1-9])'
+_STRPTIME_DAY = r'(3[01]|[12]\d|0[1-9]|[1-9]| [1-9])'
+_DATE_PATTERNS = (
+    (re.compile(f'{_STRPTIME_YEAR}-{_STRPTIME_MONTH}-{_STRPTIME_DAY}'), (1, 2, 3)),  # YYYY-MM-DD
+    (re.compile(f'{_STRPTIME_DAY}/{_STRPTIME_MONTH}/{_STRPTIME_YEAR}'), (3, 2, 1)),  # DD/MM/YYYY
+    (re.compile(f'{_STRPTIME_YEAR}/{_STRPTIME_MONTH}/{_STRPTIME_DAY}'), (1, 2, 3)),  # YYYY/MM/DD
+    (re.compile(f'{_STRPTIME_DAY}-{_STRPTIME_MONTH}-{_STRPTIME_YEAR}'), (3, 2, 1)),  # DD-MM-YYYY
+)
+
+def _iter_batches(records: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Agrupa um iterável de registros em lotes de até batch_size elementos.
+    
+    Args:
+        records: Iterável de registros (lista, gerador, stream)
+        batch_size: Tamanho máximo de cada lote
+        
+    Returns:
+        Iterador de listas de registros
+    """
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+# Conversor usado pelos processos de renderização (um por processo do pool)
+_worker_converter = None
+
+def _init_render_worker(converter: 'JSONToSQLConverter'):
+    """
+    Inicializa um processo do pool de renderização com uma cópia do conversor.
+    
+    Args:
+        converter: Conversor configurado no processo principal
+    """
+    global _worker_converter
+    _worker_converter = converter
+
+def _render_batch_in_worker(batch: List[Dict[str, Any]]) -> str:
+    """
+    Renderiza um lote em um processo do pool.
+    
+    Args:
+        batch: Lote de registros
+        
+    Returns:
+        Comando INSERT do lote
+    """
+    return _worker_converter.generate_bulk_insert_statement(batch, show_progress=False)
+
+@dataclass
+class ConversionSummary:
+    """
+    Resumo de uma conversão gravada em arquivo (em vez do script SQL completo).
+    """
+    records: int = 0
+    batches: int = 0
+    lines: int = 0
+    bytes_written: int = 0
+    output_file: Optional[str] = None
+    load_script_file: Optional[str] = None
+    # Compressão detectada na entrada e aplicada na saída (bytes_written conta bytes sem compressão)
+    input_compression: Optional[str] = None
+    output_compression: Optional[str] = None
+    # Contagens do modo delta
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    # Preenchido apenas quando não há arquivo de saída
+    sql: Optional[str] = None
+    # Saída dividida em partes (ver ShardingOptions)
+    shard_files: Optional[List[str]] = None
+    manifest_file: Optional[str] = None
+    # Registros desviados pela validação (ver RecordValidator)
+    rejected: int = 0
+    rejects_file: Optional[str] = None
+    # Tamanhos de lote usados com BatchSizing (ver BatchSizer.report)
+    batch_sizes: Optional[Dict[str, Any]] = None
+    # Uso do cache de conversões: saída copiada do cache e lotes reaproveitados
+    from_cache: bool = False
+    cached_batches: int = 0
+    # Registros descartados por chave repetida (ver RecordDeduplicator)
+    duplicates: int = 0
+    duplicates_file: Optional[str] = None
+
+@dataclass
+class ShardingOptions:
+    """
+    Divisão da saída em vários arquivos independentes, para carga paralela em várias sessões.
+    
+    Critérios (by):
+        rows  - size registros por parte
+        bytes - cerca de size bytes (sem compressão) por parte; a parte é fechada ao fim
+                do lote que atingir o limite
+        hash  - count partes, com cada registro na parte dada pelo hash estável da coluna key
+    
+    Sem size, o padrão depende do critério: DEFAULT_SHARD_ROWS registros ou DEFAULT_SHARD_BYTES bytes.
+    """
+    by: str = 'rows'
+    size: Optional[int] = None
+    count: int = 4
+    key: str = 'codigo_cnes'
+    
+    def __post_init__(self):
+        if self.size is None:
+            self.size = DEFAULT_SHARD_BYTES if self.by == 'bytes' else DEFAULT_SHARD_ROWS
+
+class _ShardWriter:
+    """
+    Uma parte da saída: arquivo (comprimido ou não) com contagens de registros, lotes e bytes.
+    """
+    def __init__(self, path: str, compression: Optional[str], buffer_size: int):
+        self.path = path
+        self.records = 0
+        self.batches = 0
+        self.lines = 0
+        self.bytes_written = 0
+        self._raw = open(path, 'wb', buffering=buffer_size)
+        self._output = wrap_compressed(self._raw, compression, 'wb')
+    
+    def write(self, text: str):
+        data = text.encode('utf-8')
+        self._output.write(data)
+        self.bytes_written += len(data)
+        self.lines += text.count('\n')
+    
+    def close(self):
+        if self._output is not self._raw:
+            self._output.close()
+        self._raw.close()
+        # A última linha do script não termina com quebra de linha
+        self.lines += 1
+
+@dataclass
+class BatchSizing:
+    """
+    Tamanho dos lotes por limites do servidor em vez de uma quantidade fixa de registros.
+    
+    Com max_bytes, os lotes são dimensionados pela largura medida dos registros para que cada
+    comando fique abaixo do limite (ex: max_allowed_packet do MySQL); um lote que ainda assim
+    passe do limite é dividido ao meio. max_params limita os valores por comando (registros x
+    colunas). Com adaptive, o tamanho é ajustado durante a execução pela vazão medida de
+    renderização (ou de carga, em load_to_database), sempre dentro dos limites.
+    """
+    max_bytes: Optional[int] = None
+    max_params: Optional[int] = None
+    adaptive: bool = False
+    min_size: int = 10
+    max_size: int = 100000
+    
+    def describe(self) -> str:
+        """
+        Descrição curta dos limites, usada no cabeçalho do script.
+        """
+        parts = []
+        if self.max_bytes:
+            parts.append(f"até {self.max_bytes} bytes por comando")
+        if self.max_params:
+            parts.append(f"até {self.max_params} valores por comando")
+        if self.adaptive:
+            parts.append("ajustado pela vazão")
+        return ", ".join(parts) or f"até {self.max_size} registros"
+
+class BatchSizer:
+    """
+    Escolhe o tamanho de cada lote de uma execução a partir de BatchSizing e das medições
+    dos lotes anteriores, e registra os tamanhos usados (ver report).
+    """
+    # Fração de max_bytes usada na estimativa, pois a largura dos registros varia entre lotes
+    BYTES_MARGIN = 0.9
+    # Peso da última medição na média móvel de bytes por registro
+    BYTES_SMOOTHING = 0.3
+    # Lotes medidos em cada tamanho antes de comparar a vazão (modo adaptativo)
+    PROBE_BATCHES = 3
+    
+    def __init__(self, sizing: BatchSizing, batch_size: int, columns: int):
+        """
+        Args:
+            sizing: Limites e modo de ajuste
+            batch_size: Tamanho inicial (e, fora do modo adaptativo e sem max_bytes, o tamanho alvo)
+            columns: Colunas por registro, para o limite de valores por comando
+        """
+        self.sizing = sizing
+        self.columns = max(1, columns)
+        self.target = max(1, min(batch_size, sizing.max_size))
+        self.bytes_per_record: Optional[float] = None
+        self.initial = self.size()
+        self.batches = 0
+        self.records = 0
+        self.min_batch: Optional[int] = None
+        self.max_batch = 0
+        self.largest_statement = 0
+        self.splits = 0
+        # Busca do modo adaptativo: fator e sentido do próximo passo, vazão do tamanho anterior
+        self._step = 2.0
+        self._direction = 1
+        self._last_rate: Optional[float] = None
+        self._window = [0, 0.0, 0]  # registros, segundos, lotes
+        self._warmed_up = False
+        self.settled = not sizing.adaptive
+    
+    def limit(self) -> int:
+        """
+        Maior lote permitido pelos limites de valores e de bytes (pela largura estimada dos registros).
+        """
+        sizing = self.sizing
+        limit = sizing.max_size
+        if sizing.max_params:
+            limit = min(limit, sizing.max_params // self.columns)
+        if sizing.max_bytes and self.bytes_per_record:
+            limit = min(limit, int(sizing.max_bytes * self.BYTES_MARGIN / self.bytes_per_record))
+        return max(1, limit)
+    
+    def size(self) -> int:
+        """
+        Tamanho do próximo lote: com max_bytes (e sem ajuste pela vazão), o maior que cabe no limite.
+        """
+        limit = self.limit()
+        if self.sizing.max_bytes and self.bytes_per_record and not self.sizing.adaptive:
+            return limit
+        return min(self.target, limit)
+    
+    def batches_of(self, records: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Agrupa os registros em lotes, consultando o tamanho atual antes de montar cada um.
+        """
+        iterator = iter(records)
+        while True:
+            batch = list(islice(iterator, self.size()))
+            if not batch:
+                return
+            yield batch
+    
+    def too_large(self, statement_bytes: int) -> bool:
+        """
+        Verifica se um comando passou do limite de bytes.
+        """
+        return bool(self.sizing.max_bytes) and statement_bytes > self.sizing.max_bytes
+    
+    def observe(self, records: int, statement_bytes: Optional[int] = None, seconds: Optional[float] = None):
+        """
+        Registra um lote concluído: tamanho, bytes do comando gerado e tempo gasto nele.
+        """
+        self.batches += 1
+        self.records += records
+        self.min_batch = records if self.min_batch is None else min(self.min_batch, records)
+        self.max_batch = max(self.max_batch, records)
+        if statement_bytes is not None:
+            self.largest_statement = max(self.largest_statement, statement_bytes)
+            per_record = statement_bytes / records
+            if self.bytes_per_record is None:
+                self.bytes_per_record = per_record
+            else:
+                self.bytes_per_record += self.BYTES_SMOOTHING * (per_record - self.bytes_per_record)
+        if seconds is not None and not self.settled:
+            self._adapt(records, seconds)
+    
+    def _adapt(self, records: int, seconds: float):
+        """
+        Busca simples pelo tamanho de maior vazão: a cada PROBE_BATCHES lotes, continua no mesmo
+        sentido enquanto a vazão melhora; quando piora, inverte o sentido com um passo menor.
+        """
+        if not self._warmed_up:
+            # O primeiro lote inclui a compilação dos formatadores e distorce a medição
+            self._warmed_up = True
+            return
+        window = self._window
+        window[0] += records
+        window[1] += seconds
+        window[2] += 1
+        if window[2] < self.PROBE_BATCHES:
+            return
+        rate = window[0] / window[1] if window[1] > 0 else float('inf')
+        self._window = [0, 0.0, 0]
+        if self._last_rate is not None and rate < self._last_rate:
+            self._direction = -self._direction
+            self._step **= 0.5
+            if self._step < 1.1:
+                self.settled = True
+                return
+        self._last_rate = rate
+        current = self.size()
+        target = int(current * self._step) if self._direction > 0 else int(current / self._step)
+        self.target = max(min(self.sizing.min_size, self.limit()), min(target, self.limit()))
+        if self.target == current:
+            # Preso em um dos limites: não há mais o que testar
+            self.settled = True
+    
+    def report(self) -> Dict[str, Any]:
+        """
+        Tamanhos usados na execução e o tamanho sugerido para fixar em execuções futuras.
+        """
+        return {
+            'inicial': self.initial,
+            'min': self.min_batch,
+            'max': self.max_batch,
+            'media': round(self.records / self.batches, 1) if self.batches else None,
+            'lotes': self.batches,
+            'bytes_por_registro': round(self.bytes_per_record, 1) if self.bytes_per_record else None,
+            'maior_comando_bytes': self.largest_statement or None,
+            'lotes_divididos': self.splits,
+            'sugerido': self.size(),
+        }
+
+class _PrefetchedRecords:
+    """
+    Estágio de leitura do pipeline: consome os registros em uma thread própria, entregando-os
+    em blocos por uma fila limitada (a leitura para quando a fila enche), com os atributos do
+    fluxo original acessíveis (total_bytes, bytes_read).
+    """
+    def __init__(self, records: Iterable[Dict[str, Any]], queue_size: int = PIPELINE_QUEUE_SIZE,
+                 block_size: int = PIPELINE_READ_BLOCK):
+        self._records = records
+        self._queue_size = queue_size
+        self._block_size = block_size
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._records, name)
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        blocks = queue.Queue(self._queue_size)
+        stop = threading.Event()
+        
+        def put(item):
+            # Com timeout, para desistir se o consumidor parar antes do fim
+            while not stop.is_set():
+                try:
+                    blocks.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+        
+        def read():
+            try:
+                iterator = iter(self._records)
+                while not stop.is_set():
+                    block = list(islice(iterator, self._block_size))
+                    if not block:
+                        break
+                    put(('dados', block))
+                put(('fim', None))
+            except BaseException as e:
+                put(('erro', e))
+        
+        reader = threading.Thread(target=read, name='pipeline-leitura', daemon=True)
+        reader.start()
+        try:
+            while True:
+                kind, item = blocks.get()
+                if kind == 'dados':
+                    yield from item
+                elif kind == 'erro':
+                    raise item
+                else:
+                    return
+        finally:
+            stop.set()
+            reader.join()
+
+class _BackgroundWriter:
+    """
+    Estágio de gravação do pipeline: grava (e comprime) os blocos em uma thread própria,
+    recebidos por uma fila limitada (quem escreve espera quando a fila enche).
+    
+    flush() aguarda a gravação de tudo o que foi enfileirado; os demais atributos (fileno)
+    são os do arquivo de destino.
+    """
+    def __init__(self, output: BinaryIO, queue_size: int = PIPELINE_QUEUE_SIZE):
+        self._output = output
+        self._blocks = queue.Queue(queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='pipeline-gravacao', daemon=True)
+        self._thread.start()
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._output, name)
+    
+    def _run(self):
+        while True:
+            data = self._blocks.get()
+            try:
+                if data is None:
+                    return
+                if self._error is None:
+                    self._output.write(data)
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._blocks.task_done()
+    
+    def _check(self):
+        if self._error is not None:
+            raise self._error
+    
+    def write(self, data: bytes):
+        self._check()
+        self._blocks.put(data)
+    
+    def flush(self):
+        self._blocks.join()
+        self._check()
+        self._output.flush()
+    
+    def close(self):
+        """
+        Aguarda a gravação pendente e encerra a thread (não fecha o arquivo de destino).
+        """
+        if self._thread.is_alive():
+            self._blocks.put(None)
+            self._thread.join()
+        self._check()
+
+class ConversionMetrics:
+    """
+    Métricas opcionais de uma conversão (JSONToSQLConverter(collect_metrics=True)).
+    
+    Registra tempo de relógio e de CPU por etapa, custo de formatação por coluna,
+    fallbacks de data para o caminho lento (_format_date), formato detectado e fallbacks de
+    cada coluna de data, tamanhos de lote e bytes gravados.
+    
+    Etapas:
+        leitura    - decodificação do JSON de entrada
+        formatacao - formatação das células e montagem das linhas
+        montagem   - montagem dos comandos do lote pelo dialeto
+        gravacao   - codificação e gravação no arquivo de saída
+        paralela   - espera pelos lotes renderizados em outros processos (workers > 1)
+    
+    Com workers > 1, a formatação acontece nos processos auxiliares e o custo por coluna
+    não é coletado.
+    """
+    def __init__(self):
+        self.stages: Dict[str, List[float]] = {}   # etapa -> [relógio, CPU]
+        self.columns: Dict[str, List[float]] = {}  # coluna -> [segundos, chamadas]
+        self.date_fallbacks = 0
+        self.date_fallback_failures = 0
+        self.date_columns: Dict[str, Dict[str, Any]] = {}  # coluna -> formato e fallbacks
+        self.batches = 0
+        self.batch_records = 0
+        self.batch_min: Optional[int] = None
+        self.batch_max = 0
+        self.bytes_emitted = 0
+    
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """
+        Mede o bloco (relógio e CPU) e acumula na etapa indicada.
+        """
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - wall, time.process_time() - cpu)
+    
+    def add_stage(self, name: str, wall_time: float, cpu_time: float):
+        """
+        Acumula tempos já medidos em uma etapa.
+        """
+        totals = self.stages.setdefault(name, [0.0, 0.0])
+        totals[0] += wall_time
+        totals[1] += cpu_time
+    
+    def timed_formatter(self, column: str, formatter: Callable[[Any], str]) -> Callable[[Any], str]:
+        """
+        Envolve o formatador de uma coluna, acumulando tempo e quantidade de chamadas.
+        """
+        totals = self.columns.setdefault(column, [0.0, 0])
+        clock = time.perf_counter
+        
+        def format_value(value):
+            start = clock()
+            result = formatter(value)
+            totals[0] += clock() - start
+            totals[1] += 1
+            return result
+        return format_value
+    
+    def timed_stage(self, name: str, function: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        Envolve uma função chamada a cada registro, acumulando na etapa indicada o tempo de cada chamada.
+        """
+        totals = self.stages.setdefault(name, [0.0, 0.0])
+        wall_clock, cpu_clock = time.perf_counter, time.process_time
+        
+        def timed(*args):
+            wall, cpu = wall_clock(), cpu_clock()
+            try:
+                return function(*args)
+            finally:
+                totals[0] += wall_clock() - wall
+                totals[1] += cpu_clock() - cpu
+        return timed
+    
+    def timed_records(self, records: Iterable[Dict[str, Any]]) -> '_TimedRecords':
+        """
+        Envolve os registros de entrada, acumulando na etapa 'leitura' o tempo gasto para obter cada um.
+        """
+        return _TimedRecords(records, self)
+    
+    def record_batch(self, size: int):
+        """
+        Registra o tamanho de um lote renderizado.
+        """
+        self.batches += 1
+        self.batch_records += size
+        self.batch_min = size if self.batch_min is None else min(self.batch_min, size)
+        self.batch_max = max(self.batch_max, size)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Retorna as métricas em um dicionário serializável em JSON.
+        """
+        columns = sorted((item for item in self.columns.items() if item[1][1]),
+                         key=lambda item: item[1][0], reverse=True)
+        return {
+            'etapas': {name: {'tempo_s': round(wall, 6), 'cpu_s': round(cpu, 6)}
+                       for name, (wall, cpu) in self.stages.items()},
+            'colunas': {col: {'tempo_s': round(elapsed, 6), 'chamadas': calls,
+                              'us_por_valor': round(elapsed / calls * 1e6, 3)}
+                        for col, (elapsed, calls) in columns},
+            'datas': {'fallbacks': self.date_fallbacks, 'fallbacks_sem_sucesso': self.date_fallback_failures,
+                      'colunas': {col: dict(stats) for col, stats in self.date_columns.items()}},
+            'lotes': {'quantidade': self.batches, 'registros': self.batch_records,
+                      'min': self.batch_min, 'max': self.batch_max,
+                      'media': round(self.batch_records / self.batches, 1) if self.batches else None},
+            'bytes_gravados': self.bytes_emitted,
+        }
+    
+    def to_json(self, path: Optional[str] = None) -> str:
+        """
+        Exporta as métricas em JSON, gravando em path quando informado.
+        """
+        text = json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return text
+
+class _TimedRecords:
+    """
+    Registros de entrada cuja leitura é medida na etapa 'leitura' das métricas.
+    
+    Atributos do fluxo original (total_bytes, bytes_read) continuam acessíveis, mantendo
+    a barra de progresso do modo streaming.
+    """
+    def __init__(self, records: Iterable[Dict[str, Any]], metrics: ConversionMetrics):
+        self._records = records
+        self._metrics = metrics
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._records, name)
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        iterator = iter(self._records)
+        wall_clock, cpu_clock = time.perf_counter, time.process_time
+        wall_time = cpu_time = 0.0
+        try:
+            while True:
+                wall, cpu = wall_clock(), cpu_clock()
+                try:
+                    record = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    wall_time += wall_clock() - wall
+                    cpu_time += cpu_clock() - cpu
+                yield record
+        finally:
+            self._metrics.add_stage('leitura', wall_time, cpu_time)
+
+@dataclass
+class TableMapping:
+    """
+    Tabela de destino de um arquivo de mapeamento (ver load_mapping).
+    
+    Cada coluna é lida de um caminho na origem: "campo", "endereco.cep" (objetos aninhados),
+    "telefones.0" (posição em listas) ou, em tabelas com rows, "$.codigo_cnes" (registro raiz).
+    Com rows, cada elemento da lista nesse caminho gera uma linha (ex.: leitos de um estabelecimento).
+    """
+    name: str
+    columns: List[str]
+    sources: Dict[str, str]
+    column_types: Optional[Union[Dict[str, str], str]] = None
+    rows: Optional[str] = None
+    upsert_key: str = 'codigo_cnes'
+    output: Optional[str] = None
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TableMapping':
+        """
+        Cria a tabela a partir da sua entrada no arquivo de mapeamento.
+        
+        "columns" é uma lista de campos (mesmo nome na origem) ou um objeto
+        {coluna: caminho} / {coluna: {"source": caminho, "type": tipo}}.
+        """
+        name = data.get('name')
+        columns = data.get('columns')
+        if not name or not columns:
+            raise ValueError("Cada tabela do mapeamento precisa de 'name' e 'columns'")
+        if isinstance(columns, list):
+            columns = {col: col for col in columns}
+        sources = {}
+        column_types = {}
+        for col, spec in columns.items():
+            if isinstance(spec, dict):
+                sources[col] = spec.get('source', col)
+                if 'type' in spec:
+                    if spec['type'] not in COLUMN_TYPES:
+                        raise ValueError(f"Tipo desconhecido na coluna {name}.{col}: {spec['type']}")
+                    column_types[col] = spec['type']
+            else:
+                sources[col] = spec
+        table_types = data.get('column_types')
+        if table_types == 'infer' and column_types:
+            raise ValueError(f"Tabela {name}: 'column_types': 'infer' não combina com tipos por coluna")
+        return cls(name=name, columns=list(sources), sources=sources,
+                   column_types=table_types or column_types or None, rows=data.get('rows'),
+                   upsert_key=data.get('upsert_key', 'codigo_cnes'), output=data.get('output'))
+    
+    def compile_projection(self) -> Callable[[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Compila a projeção registro de origem -> linhas da tabela.
+        
+        Quando as colunas são campos de mesmo nome na origem, o próprio registro é usado,
+        sem cópia (o conversor só lê as colunas da tabela).
+        """
+        if self.rows is None and all(source == col for col, source in self.sources.items()):
+            return lambda record: (record,)
+        getters = [(col, _compile_path(source)) for col, source in self.sources.items()]
+        
+        def project_item(item, root):
+            return {col: get(item, root) for col, get in getters}
+        
+        if self.rows is None:
+            return lambda record: (project_item(record, record),)
+        get_rows = _compile_path(self.rows)
+        
+        def project(record):
+            items = get_rows(record, record)
+            if type(items) is not list:
+                return ()
+            return [project_item(item, record) for item in items]
+        return project
+
+def _compile_path(path: str) -> Callable[[Any, Dict[str, Any]], Any]:
+    """
+    Compila um caminho de origem em uma função (elemento, registro raiz) -> valor.
+    
+    Caminhos ausentes ou que atravessam valores de outro tipo resultam em None.
+    """
+    from_root = path.startswith('$.')
+    if from_root:
+        path = path[2:]
+    parts = [int(part) if part.lstrip('-').isdigit() else part for part in path.split('.')]
+    
+    if len(parts) == 1 and isinstance(parts[0], str):
+        key = parts[0]
+        if from_root:
+            return lambda item, root: root.get(key)
+        return lambda item, root: item.get(key) if type(item) is dict else None
+    
+    def get(item, root):
+        value = root if from_root else item
+        for part in parts:
+            if type(part) is int:
+                if type(value) is not list or not -len(value) <= part < len(value):
+                    return None
+                value = value[part]
+            elif type(value) is dict:
+                value = value.get(part)
+            else:
+                return None
+        return value
+    return get
+
+def load_mapping(path: str) -> List[TableMapping]:
+    """
+    Lê um arquivo de mapeamento (.json, .toml ou .yaml/.yml) com as tabelas de destino.
+    
+    Formato: {"tables": [{"name": ..., "columns": ..., "rows": ..., "column_types": ...,
+    "upsert_key": ..., "output": ...}, ...]} (ver TableMapping.from_dict).
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.toml':
+        if tomllib is None:
+            raise ValueError("Arquivos de mapeamento TOML exigem Python 3.11 ou superior")
+        with open(path, 'rb') as f:
+            data = tomllib.load(f)
+    elif extension in ('.yaml', '.yml'):
+        if yaml is None:
+            raise ValueError("Arquivos de mapeamento YAML exigem o pacote PyYAML (pip install pyyaml)")
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    tables = [TableMapping.from_dict(table) for table in (data or {}).get('tables', [])]
+    if not tables:
+        raise ValueError(f"Nenhuma tabela declarada no mapeamento: {path}")
+    names = [table.name for table in tables]
+    if len(set(names)) != len(names):
+        raise ValueError("Tabelas repetidas no mapeamento")
+    return tables
+
+class SQLDialect:
+    """
+    Motor de saída padrão: INSERT com múltiplos VALUES e literais SQL padrão.
+    
+    Cada dialeto define suas regras de literais (nulo, booleanos, escape de texto e datas)
+    e o formato dos comandos de um lote. As subclasses sobrescrevem apenas o que muda.
+    """
+    name = 'standard'
+    description = 'INSERT com múltiplos VALUES (SQL padrão)'
+    script_title = 'Comandos SQL INSERT gerados automaticamente'
+    file_extension = '.sql'
+    
+    null_literal = 'NULL'
+    true_literal = 'TRUE'
+    false_literal = 'FALSE'
+    
+    # Montagem de cada linha: prefixo + células separadas + sufixo
+    row_prefix = '('
+    cell_separator = ', '
+    row_suffix = ')'
+    
+    # Formato do script
+    supports_comments = True
+    batch_separator = '\n\n'
+    # Limite de linhas por comando (None = sem limite)
+    max_rows_per_statement = None
+    # Se o formato aceita comandos UPDATE/DELETE (falso para COPY e TSV)
+    supports_dml = True
+    # Se o dialeto tem sintaxe de UPSERT/MERGE (ver upsert_clause)
+    supports_upsert = False
+    
+    def quote_text(self, value: str) -> str:
+        """
+        Gera o literal de uma string, escapando aspas simples.
+        
+        Args:
+            value: String a ser formatada
+            
+        Returns:
+            Literal SQL da string
+        """
+        if "'" in value:
+            return "'" + value.replace("'", "''") + "'"
+        return "'" + value + "'"
+    
+    def date_literal(self, iso_date: str) -> str:
+        """
+        Gera o literal de uma data já normalizada.
+        
+        Args:
+            iso_date: Data no formato YYYY-MM-DD
+            
+        Returns:
+            Literal da data
+        """
+        return "'" + iso_date + "'"
+    
+    def comment(self, text: str) -> str:
+        """
+        Gera uma linha de comentário (vazia se o formato não aceita comentários).
+        
+        Args:
+            text: Texto do comentário
+            
+        Returns:
+            Linha de comentário terminada em quebra de linha
+        """
+        return f"-- {text}\n" if self.supports_comments else ""
+    
+    def render_statement(self, table_name: str, columns: List[str], rows: List[str],
+                         upsert_key: Optional[str] = None) -> str:
+        """
+        Monta um comando com as linhas já formatadas.
+        
+        Args:
+            table_name: Nome da tabela
+            columns: Colunas na ordem das células
+            rows: Linhas já montadas (prefixo, células e sufixo)
+            upsert_key: Coluna chave para atualizar registros existentes (None = INSERT simples)
+            
+        Returns:
+            Comando completo
+        """
+        columns_str = ",\n  ".join(columns)
+        statement = f"INSERT INTO {table_name} (\n  {columns_str}\n)\nVALUES\n" + ",\n".join(rows)
+        if upsert_key:
+            statement += "\n" + self.upsert_clause(columns, upsert_key)
+        return statement + ";"
+    
+    def render_batch(self, table_name: str, columns: List[str], rows: List[str],
+                     upsert_key: Optional[str] = None) -> str:
+        """
+        Monta os comandos de um lote, respeitando max_rows_per_statement.
+        
+        Args:
+            table_name: Nome da tabela
+            columns: Colunas na ordem das células
+            rows: Linhas já montadas
+            upsert_key: Coluna chave para atualizar registros existentes (None = INSERT simples)
+            
+        Returns:
+            Comando(s) do lote
+        """
+        limit = self.max_rows_per_statement
+        if limit is None or len(rows) <= limit:
+            return self.render_statement(table_name, columns, rows, upsert_key)
+        return "\n\n".join([self.render_statement(table_name, columns, rows[i:i + limit], upsert_key)
+                            for i in range(0, len(rows), limit)])
+    
+    def upsert_clause(self, columns: List[str], key_column: str) -> str:
+        """
+        Gera a cláusula que transforma o INSERT em UPSERT (atualiza as demais colunas em caso de conflito).
+        
+        Args:
+            columns: Colunas do INSERT
+            key_column: Coluna chave do conflito
+            
+        Returns:
+            Cláusula a ser anexada após os VALUES
+        """
+        raise ValueError(f"O dialeto {self.name} não suporta UPSERT; use postgresql, mysql, sqlite ou sqlserver")
+    
+    def render_update(self, table_name: str, assignments: List[str], key_column: str, key_literal: str) -> str:
+        """
+        Monta um UPDATE de um registro identificado pela chave.
+        
+        Args:
+            table_name: Nome da tabela
+            assignments: Atribuições já formatadas ("coluna = literal")
+            key_column: Coluna chave
+            key_literal: Literal do valor da chave
+            
+        Returns:
+            Comando UPDATE
+        """
+        return f"UPDATE {table_name} SET {', '.join(assignments)} WHERE {key_column} = {key_literal};"
+    
+    def render_delete(self, table_name: str, key_column: str, key_literals: List[str]) -> str:
+        """
+        Monta um DELETE dos registros com as chaves informadas.
+        
+        Args:
+            table_name: Nome da tabela
+            key_column: Coluna chave
+            key_literals: Literais dos valores das chaves
+            
+        Returns:
+            Comando DELETE
+        """
+        return f"DELETE FROM {table_name} WHERE {key_column} IN ({', '.join(key_literals)});"
+    
+    def wrap_transaction(self, body: str) -> str:
+        """
+        Envolve um grupo de comandos em uma transação, se o dialeto fizer isso explicitamente.
+        
+        Args:
+            body: Comandos do grupo
+            
+        Returns:
+            Comandos (com ou sem transação explícita)
+        """
+        return body
+    
+    def load_script(self, table_name: str, columns: List[str], data_file: str) -> Optional[str]:
+        """
+        Gera um script auxiliar de carga para o arquivo de dados, quando o formato precisa de um.
+        
+        Args:
+            table_name: Nome da tabela
+            columns: Colunas na ordem das células
+            data_file: Caminho do arquivo de dados gerado
+            
+        Returns:
+            Conteúdo do script ou None
+        """
+        return None
+
+class PostgreSQLDialect(SQLDialect):
+    """
+    INSERT para PostgreSQL (standard_conforming_strings ativo: mesmas regras do SQL padrão).
+    """
+    name = 'postgresql'
+    description = 'INSERT para PostgreSQL'
+    supports_upsert = True
+    
+    def upsert_clause(self, columns: List[str], key_column: str) -> str:
+        assignments = ",\n  ".join([f"{col} = EXCLUDED.{col}" for col in columns if col != key_column])
+        return f"ON CONFLICT ({key_column}) DO UPDATE SET\n  {assignments}"
+
+class PostgreSQLCopyDialect(SQLDialect):
+    """
+    Blocos COPY ... FROM stdin no formato texto do PostgreSQL (para psql).
+    """
+    name = 'postgresql_copy'
+    description = 'Blocos COPY FROM stdin (PostgreSQL/psql)'
+    script_title = 'Blocos COPY gerados automaticamente'
+    
+    null_literal = '\\N'
+    true_literal = 't'
+    false_literal = 'f'
+    supports_dml = False
+    row_prefix = ''
+    cell_separator = '\t'
+    row_suffix = ''
+    
+    def quote_text(self, value: str) -> str:
+        if "\\" in value or "\t" in value or "\n" in value or "\r" in value:
+            return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+        return value
+    
+    def date_literal(self, iso_date: str) -> str:
+        return iso_date
+    
+    def render_statement(self, table_name: str, columns: List[str], rows: List[str],
+                         upsert_key: Optional[str] = None) -> str:
+        columns_str = ", ".join(columns)
+        return f"COPY {table_name} ({columns_str}) FROM stdin;\n" + "\n".join(rows) + "\n\\."
+
+class MySQLDialect(SQLDialect):
+    """
+    INSERT para MySQL/MariaDB (barra invertida também precisa de escape).
+    """
+    name = 'mysql'
+    description = 'INSERT para MySQL/MariaDB'
+    supports_upsert = True
+    
+    def quote_text(self, value: str) -> str:
+        if "'" in value or "\\" in value:
+            return "'" + value.replace("\\", "\\\\").replace("'", "''") + "'"
+        return "'" + value + "'"
+    
+    def upsert_clause(self, columns: List[str], key_column: str) -> str:
+        # A chave precisa ser PRIMARY KEY ou UNIQUE na tabela
+        assignments = ",\n  ".join([f"{col} = VALUES({col})" for col in columns if col != key_column])
+        return f"ON DUPLICATE KEY UPDATE\n  {assignments}"
+
+class MySQLLoadDataDialect(PostgreSQLCopyDialect):
+    """
+    Arquivo TSV pronto para LOAD DATA INFILE, acompanhado de um script de carga.
+    """
+    name = 'mysql_load_data'
+    description = 'TSV para LOAD DATA + script de carga (MySQL/MariaDB)'
+    script_title = 'Dados TSV para LOAD DATA'
+    file_extension = '.tsv'
+    
+    true_literal = '1'
+    false_literal = '0'
+    supports_comments = False
+    batch_separator = ''
+    
+    def render_statement(self, table_name: str, columns: List[str], rows: List[str],
+                         upsert_key: Optional[str] = None) -> str:
+        # Cada linha termina com quebra de linha para que os lotes possam ser concatenados
+        return "\n".join(rows) + "\n"
+    
+    def load_script(self, table_name: str, columns: List[str], data_file: str) -> Optional[str]:
+        columns_str = ",\n  ".join(columns)
+        escaped_path = data_file.replace("\\", "/").replace("'", "''")
+        return (f"LOAD DATA LOCAL INFILE '{escaped_path}'\n"
+                f"INTO TABLE {table_name}\n"
+                "CHARACTER SET utf8mb4\n"
+                "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'\n"
+                "LINES TERMINATED BY '\\n'\n"
+                f"(\n  {columns_str}\n);\n")
+
+class SQLiteDialect(SQLDialect):
+    """
+    INSERT para SQLite, com cada lote em uma transação explícita.
+    """
+    name = 'sqlite'
+    description = 'INSERT para SQLite (um lote por transação)'
+    
+    true_literal = '1'
+    false_literal = '0'
+    
+    supports_upsert = True
+    
+    def render_batch(self, table_name: str, columns: List[str], rows: List[str],
+                     upsert_key: Optional[str] = None) -> str:
+        return self.wrap_transaction(super().render_batch(table_name, columns, rows, upsert_key))
+    
+    def upsert_clause(self, columns: List[str], key_column: str) -> str:
+        # Requer SQLite 3.24+ e índice UNIQUE/PRIMARY KEY na chave
+        assignments = ",\n  ".join([f"{col} = excluded.{col}" for col in columns if col != key_column])
+        return f"ON CONFLICT ({key_column}) DO UPDATE SET\n  {assignments}"
+    
+    def wrap_transaction(self, body: str) -> str:
+        return "BEGIN TRANSACTION;\n" + body + "\nCOMMIT;"
+
+class SQLServerDialect(SQLDialect):
+    """
+    INSERT para SQL Server: strings Unicode (N'...'), booleanos como bit e no máximo
+    1000 linhas por VALUES.
+    """
+    name = 'sqlserver'
+    description = 'INSERT para SQL Server (até 1000 linhas por comando)'
+    
+    true_literal = '1'
+    false_literal = '0'
+    max_rows_per_statement = 1000
+    supports_upsert = True
+    
+    def quote_text(self, value: str) -> str:
+        if "'" in value:
+            return "N'" + value.replace("'", "''") + "'"
+        return "N'" + value + "'"
+    
+    def render_statement(self, table_name: str, columns: List[str], rows: List[str],
+                         upsert_key: Optional[str] = None) -> str:
+        if not upsert_key:
+            return super().render_statement(table_name, columns, rows)
+        # SQL Server não tem ON CONFLICT: usar MERGE com as linhas como tabela derivada
+        columns_str = ", ".join(columns)
+        assignments = ",\n    ".join([f"target.{col} = source.{col}" for col in columns if col != upsert_key])
+        source_columns = ", ".join([f"source.{col}" for col in columns])
+        return (f"MERGE INTO {table_name} AS target\n"
+                "USING (VALUES\n" + ",\n".join(rows) + f"\n) AS source ({columns_str})\n"
+                f"ON target.{upsert_key} = source.{upsert_key}\n"
+                f"WHEN MATCHED THEN UPDATE SET\n    {assignments}\n"
+                f"WHEN NOT MATCHED THEN INSERT ({columns_str}) VALUES ({source_columns});")
+
+# Dialetos/motores de saída disponíveis, por nome
+DIALECTS = {dialect.name: dialect for dialect in (
+    SQLDialect, PostgreSQLDialect, PostgreSQLCopyDialect, MySQLDialect,
+    MySQLLoadDataDialect, SQLiteDialect, SQLServerDialect,
+)}
+
+def get_dialect(dialect: Union[str, SQLDialect]) -> SQLDialect:
+    """
+    Obtém uma instância de dialeto a partir do nome (ou devolve a instância recebida).
+    
+    Args:
+        dialect: Nome registrado em DIALECTS ou instância de SQLDialect
+        
+    Returns:
+        Instância do dialeto
+    """
+    if isinstance(dialect, SQLDialect):
+        return dialect
+    try:
+        return DIALECTS[dialect]()
+    except KeyError:
+        raise ValueError(f"Dialeto desconhecido: {dialect} (use um de {', '.join(DIALECTS)})")
+
+class DeltaState:
+    """
+    Índice local entre execuções do modo delta: chave → (hash do conteúdo, data_atualizacao).
+    
+    Gravado em JSON compacto ([chave, hash, data] por registro), preservando o tipo da chave.
+    """
+    def __init__(self, key: str = 'codigo_cnes', records: Optional[Dict[Any, Tuple[str, Any]]] = None):
+        self.key = key
+        self.records = records if records is not None else {}
+    
+    @classmethod
+    def load(cls, path: str, key: str = 'codigo_cnes') -> 'DeltaState':
+        """
+        Carrega o índice de um arquivo (ou cria um vazio se o arquivo não existir).
+        
+        Args:
+            path: Caminho do arquivo de estado
+            key: Coluna chave usada se o arquivo ainda não existir
+            
+        Returns:
+            DeltaState carregado
+        """
+        if not os.path.exists(path):
+            return cls(key)
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('key') != key:
+            raise ValueError(f"Arquivo de estado {path} usa a chave {data.get('key')}, não {key}")
+        return cls(key, {entry[0]: (entry[1], entry[2]) for entry in data['entries']})
+    
+    def save(self, path: str):
+        """
+        Grava o índice de forma atômica (arquivo temporário + rename).
+        
+        Args:
+            path: Caminho do arquivo de estado
+        """
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': 1,
+                'key': self.key,
+                'entries': [[key, digest, updated_at] for key, (digest, updated_at) in self.records.items()],
+            }, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+class ConversionCheckpoint:
+    """
+    Ponto de retomada de uma conversão gravada em arquivo (<saida>.ckpt.json).
+    
+    A cada lote concluído, o arquivo de saída é sincronizado com o disco (fsync) e o
+    checkpoint é substituído de forma atômica com a quantidade de registros e lotes já
+    convertidos e a posição (em bytes) do fim do último lote completo. Na retomada, a saída
+    é truncada nessa posição, descartando um lote gravado pela metade, e os registros já
+    convertidos são pulados na entrada.
+    """
+    def __init__(self, path: str, settings: Dict[str, Any], records: int = 0, batches: int = 0,
+                 lines: int = 0, output_bytes: int = 0):
+        self.path = path
+        self.settings = settings
+        self.records = records
+        self.batches = batches
+        self.lines = lines
+        self.output_bytes = output_bytes
+    
+    @staticmethod
+    def path_for(output_file: str) -> str:
+        """
+        Caminho do checkpoint de um arquivo de saída.
+        """
+        return output_file + '.ckpt.json'
+    
+    @classmethod
+    def load(cls, path: str) -> Optional['ConversionCheckpoint']:
+        """
+        Carrega um checkpoint (ou None se o arquivo não existir).
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(path, data['settings'], data['records'], data['batches'], data['lines'], data['output_bytes'])
+    
+    def commit(self, output: BinaryIO, summary: 'ConversionSummary'):
+        """
+        Sincroniza a saída com o disco e registra o lote concluído de forma atômica.
+        
+        Args:
+            output: Arquivo de saída (com fileno)
+            summary: Resumo com as contagens até o último lote gravado
+        """
+        output.flush()
+        os.fsync(output.fileno())
+        self.records = summary.records
+        self.batches = summary.batches
+        self.lines = summary.lines
+        self.output_bytes = summary.bytes_written
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': 1,
+                'settings': self.settings,
+                'records': self.records,
+                'batches': self.batches,
+                'lines': self.lines,
+                'output_bytes': self.output_bytes,
+            }, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+    
+    def remove(self):
+        """
+        Remove o checkpoint ao final de uma conversão concluída.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class ConversionCache:
+    """
+    Cache em disco, endereçado pelo conteúdo, de saídas completas e de lotes renderizados.
+    
+    O nome de cada entrada é o SHA-256 do que a produziu: para uma saída, o hash do arquivo de
+    entrada com as configurações da conversão e a versão da ferramenta; para um lote, o hash
+    dos seus registros com as configurações que afetam o comando. Uma reexecução idêntica vira
+    uma cópia de arquivo, e uma entrada com alguns registros alterados só renderiza de novo os
+    lotes que mudaram. O último uso de cada entrada fica no horário de modificação do arquivo;
+    evict remove as menos usadas até o cache caber em max_bytes.
+    
+    Estrutura: <diretorio>/saidas/ab/<chave> (+ <chave>.json com o resumo) e <diretorio>/lotes/ab/<chave>.
+    """
+    # Idade mínima de uma saída sem resumo (ou vice-versa) para que evict a trate como órfã
+    ORPHAN_GRACE_SECONDS = 60
+    
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.batch_hits = 0
+        self.batch_misses = 0
+        os.makedirs(directory, exist_ok=True)
+    
+    @staticmethod
+    def key(*parts: Any) -> str:
+        """
+        Chave de uma entrada: SHA-256 das partes (serializadas em JSON) e da versão da ferramenta.
+        """
+        data = json.dumps([__version__, *parts], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def batch_key(prefix: str, batch: List[Dict[str, Any]]) -> str:
+        """
+        Chave de um lote: hash dos registros (serializados com marshal, bem mais rápido que JSON)
+        sob o prefixo das configurações.
+        """
+        try:
+            # Versão 2 do formato não usa referências, que variam com a identidade dos objetos
+            data = marshal.dumps(batch, 2)
+        except ValueError:
+            # Tipos que o marshal não serializa (ex: Decimal de um cursor de banco)
+            data = repr(batch).encode('utf-8')
+        digest = hashlib.sha256(prefix.encode('ascii'))
+        digest.update(data)
+        return digest.hexdigest()
+    
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.directory, kind, key[:2], key)
+    
+    def _store(self, path: str, write: Callable[[BinaryIO], None]):
+        """
+        Grava uma entrada de forma atômica (arquivo temporário substituído com os.replace).
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+    
+    def get_output(self, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Procura uma saída completa, registrando o uso.
+        
+        Returns:
+            Tupla (caminho do arquivo no cache, resumo da conversão) ou None
+        """
+        path = self._path('saidas', key)
+        try:
+            with open(path + '.json', 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            os.utime(path)
+            os.utime(path + '.json')
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path, meta
+    
+    def put_output(self, key: str, source_file: str, meta: Dict[str, Any]):
+        """
+        Guarda uma cópia de uma saída completa e o seu resumo.
+        """
+        path = self._path('saidas', key)
+        
+        def copy(f):
+            with open(source_file, 'rb') as source:
+                shutil.copyfileobj(source, f, 1024 * 1024)
+        self._store(path, copy)
+        self._store(path + '.json', lambda f: f.write(json.dumps(meta, ensure_ascii=False).encode('utf-8')))
+    
+    def get_batch(self, key: str) -> Optional[str]:
+        """
+        Procura o comando renderizado de um lote, registrando o uso.
+        """
+        path = self._path('lotes', key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            self.batch_misses += 1
+            return None
+        self.batch_hits += 1
+        return data.decode('utf-8')
+    
+    def put_batch(self, key: str, statement: str):
+        """
+        Guarda o comando renderizado de um lote.
+        """
+        self._store(self._path('lotes', key), lambda f: f.write(statement.encode('utf-8')))
+    
+    def evict(self) -> int:
+        """
+        Remove as entradas usadas há mais tempo até o total caber em max_bytes.
+        
+        Uma saída e o seu resumo (<chave> e <chave>.json) formam uma entrada só, removida
+        inteira; metades órfãs (de uma gravação interrompida ou de uma remoção parcial) são
+        apagadas, exceto as recentes, que podem ser uma gravação em andamento de outro processo.
+        
+        Returns:
+            Quantidade de entradas removidas (incluindo as órfãs)
+        """
+        groups: Dict[str, List[Tuple[int, int, str]]] = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.tmp'):
+                    # Gravação em andamento (ou interrompida) de outro processo
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                group = path[:-5] if name.endswith('.json') else path
+                groups.setdefault(group, []).append((stat.st_mtime_ns, stat.st_size, path))
+        
+        outputs = os.path.join(self.directory, 'saidas') + os.sep
+        orphan_deadline = time.time_ns() - self.ORPHAN_GRACE_SECONDS * 1_000_000_000
+        entries = []
+        removed = 0
+        for group, files in groups.items():
+            if group.startswith(outputs) and len(files) < 2:
+                if files[0][0] < orphan_deadline:
+                    with contextlib.suppress(OSError):
+                        os.remove(files[0][2])
+                        removed += 1
+                continue
+            # O resumo vem primeiro: sem ele, a saída deixa de ser encontrada antes de sumir
+            paths = sorted((path for _, _, path in files), key=lambda path: not path.endswith('.json'))
+            entries.append((max(mtime for mtime, _, _ in files), sum(size for _, size, _ in files), paths))
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, paths in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for path in paths:
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+            removed += 1
+            total -= size
+        return removed
+
+@dataclass
+class ColumnRule:
+    """
+    Regra de validação e coerção de uma coluna (ver RecordValidator).
+    
+    Tipos (type): int, float, flag (0/1), bool, text e date (normalizada para YYYY-MM-DD).
+    Valores convertíveis são corrigidos ("12" -> 12, "-10,5" -> -10.5, CNPJ com pontuação
+    -> só dígitos); os demais rejeitam o registro.
+    """
+    type: str = 'text'
+    nullable: bool = True
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+    max_length: Optional[int] = None
+    length: Optional[int] = None
+    digits: bool = False
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ColumnRule':
+        """
+        Cria a regra a partir de um dicionário ({"type": "float", "min": -35, "max": 6, ...}).
+        """
+        return cls(type=data.get('type', 'text'), nullable=data.get('nullable', True),
+                   min_value=data.get('min'), max_value=data.get('max'), max_length=data.get('max_length'),
+                   length=data.get('length'), digits=data.get('digits', False))
+
+_INT_PATTERN = re.compile(r'[+-]?\d+$')
+_NON_DIGITS = re.compile(r'\D')
+_BOOL_STRINGS = {'true': True, 'false': False, 's': True, 'n': False, 'sim': True, 'nao': False, 'não': False,
+                 '1': True, '0': False}
+
+def _compile_rule(rule: ColumnRule, parse_date: Callable[[str], Optional[str]]) -> Callable[[Any], Any]:
+    """
+    Compila a regra em uma função que retorna o valor (corrigido, se preciso) ou levanta ValueError.
+    
+    Valores já válidos são retornados como o mesmo objeto, sem cópia.
+    """
+    column_type = rule.type
+    if column_type not in ('int', 'float', 'flag', 'bool', 'text', 'date'):
+        raise ValueError(f"Tipo de regra desconhecido: {column_type}")
+    
+    def check_null():
+        if not rule.nullable:
+            raise ValueError("valor nulo não permitido")
+        return None
+    
+    def check_range(number):
+        if rule.min_value is not None and number < rule.min_value:
+            raise ValueError(f"{number} abaixo do mínimo {rule.min_value}")
+        if rule.max_value is not None and number > rule.max_value:
+            raise ValueError(f"{number} acima do máximo {rule.max_value}")
+        return number
+    
+    if column_type == 'int':
+        def check(value):
+            value_type = type(value)
+            if value_type is int:
+                return check_range(value)
+            if value is None:
+                return check_null()
+            if value_type is float and value.is_integer():
+                return check_range(int(value))
+            if value_type is str:
+                text = value.strip()
+                if not text:
+                    return check_null()
+                if _INT_PATTERN.match(text):
+                    return check_range(int(text))
+            raise ValueError(f"inteiro inválido: {value!r}")
+    elif column_type == 'float':
+        def check(value):
+            value_type = type(value)
+            if value_type is float or value_type is int:
+                if value != value or value in (float('inf'), float('-inf')):
+                    raise ValueError(f"número inválido: {value!r}")
+                return check_range(value)
+            if value is None:
+                return check_null()
+            if value_type is str:
+                text = value.strip().replace(',', '.')
+                if not text:
+                    return check_null()
+                try:
+                    number = float(text)
+                except ValueError:
+                    raise ValueError(f"número inválido: {value!r}")
+                if number != number or number in (float('inf'), float('-inf')):
+                    raise ValueError(f"número inválido: {value!r}")
+                return check_range(number)
+            raise ValueError(f"número inválido: {value!r}")
+    elif column_type == 'flag':
+        def check(value):
+            if type(value) is int and (value == 0 or value == 1):
+                return value
+            if value is None or value == '':
+                return check_null()
+            if type(value) is bool:
+                return int(value)
+            if type(value) is str and value.strip() in ('0', '1'):
+                return int(value.strip())
+            raise ValueError(f"flag deve ser 0 ou 1: {value!r}")
+    elif column_type == 'bool':
+        def check(value):
+            if type(value) is bool:
+                return value
+            if value is None or value == '':
+                return check_null()
+            if type(value) is int and value in (0, 1):
+                return bool(value)
+            if type(value) is str and value.strip().lower() in _BOOL_STRINGS:
+                return _BOOL_STRINGS[value.strip().lower()]
+            raise ValueError(f"booleano inválido: {value!r}")
+    elif column_type == 'date':
+        # Datas se repetem muito: as já validadas são memorizadas (até 4096 valores distintos)
+        known_dates = {}
+        
+        def check(value):
+            normalized = known_dates.get(value) if type(value) is str else None
+            if normalized is not None:
+                return normalized
+            if value is None or value == '':
+                return check_null()
+            if type(value) is str:
+                normalized = parse_date(value.strip())
+                if normalized:
+                    try:
+                        year, month, day = int(normalized[:4]), int(normalized[5:7]), int(normalized[8:10])
+                        # Só os dias 29 a 31 dependem do mês/ano
+                        if not (1 <= month <= 12 and 1 <= day <= 28):
+                            datetime(year, month, day)
+                    except ValueError:
+                        normalized = None
+                if normalized:
+                    normalized = value if normalized == value else normalized
+                    if len(known_dates) < 4096:
+                        known_dates[value] = normalized
+                    return normalized
+            raise ValueError(f"data inválida: {value!r}")
+    else:
+        def check(value):
+            if value is None:
+                return check_null()
+            text = value
+            if type(text) is not str:
+                if type(text) in (dict, list):
+                    raise ValueError(f"texto inválido: {value!r}")
+                text = str(text)
+            if rule.digits and not text.isdigit():
+                text = _NON_DIGITS.sub('', text)
+                if not text:
+                    raise ValueError(f"sem dígitos: {value!r}")
+            if not text:
+                return check_null() if not rule.nullable else value
+            if rule.length is not None and len(text) != rule.length:
+                raise ValueError(f"tamanho {len(text)}, esperado {rule.length}: {value!r}")
+            if rule.max_length is not None and len(text) > rule.max_length:
+                raise ValueError(f"tamanho {len(text)} acima do máximo {rule.max_length}")
+            return value if text == value else text
+    return check
+
+class RecordValidator:
+    """
+    Valida e corrige os registros pelo esquema, desviando os inválidos para um arquivo de rejeitados.
+    
+    Cada linha do arquivo de rejeitados (JSON Lines) traz a posição do registro na entrada,
+    os motivos e o registro original. Registros válidos são corrigidos no próprio dicionário.
+    """
+    def __init__(self, schema: Dict[str, ColumnRule], rejects: Optional[Any] = None,
+                 parse_date: Optional[Callable[[str], Optional[str]]] = None):
+        """
+        Args:
+            schema: Regras por coluna
+            rejects: Arquivo de texto aberto para os rejeitados (opcional; sem ele só são contados)
+            parse_date: Normalizador de datas para YYYY-MM-DD (padrão: JSONToSQLConverter._format_date_fast)
+        """
+        if parse_date is None:
+            parse_date = JSONToSQLConverter()._format_date_fast
+        self._checks = [(col, _compile_rule(rule, parse_date)) for col, rule in schema.items()]
+        self.rejects = rejects
+        self.accepted = 0
+        self.rejected = 0
+        self._position = 0
+    
+    def validate(self, record: Any) -> List[str]:
+        """
+        Valida um registro, corrigindo-o no lugar quando todas as colunas passam.
+        
+        Returns:
+            Lista de erros (vazia se o registro é válido)
+        """
+        if type(record) is not dict:
+            return ["registro não é um objeto JSON"]
+        get = record.get
+        changes = None
+        errors = None
+        for col, check in self._checks:
+            value = get(col)
+            try:
+                checked = check(value)
+            except ValueError as e:
+                if errors is None:
+                    errors = []
+                errors.append(f"{col}: {e}")
+                continue
+            if checked is not value:
+                if changes is None:
+                    changes = {}
+                changes[col] = checked
+        if errors:
+            return errors
+        if changes:
+            record.update(changes)
+        return []
+    
+    def filter(self, records: Iterable[Any], metrics: Optional[ConversionMetrics] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Entrega apenas os registros válidos (corrigidos), registrando os rejeitados.
+        
+        Com metrics, o tempo de validação de cada registro é acumulado na etapa 'validacao'
+        (no modo streaming a validação acontece sob demanda, intercalada com a leitura e a renderização).
+        """
+        validate = self.validate
+        if metrics is not None:
+            validate = metrics.timed_stage('validacao', validate)
+        for record in records:
+            self._position += 1
+            errors = validate(record)
+            if not errors:
+                self.accepted += 1
+                yield record
+                continue
+            self.rejected += 1
+            if self.rejects is not None:
+                self.rejects.write(json.dumps({'registro': self._position, 'erros': errors, 'dados': record},
+                                              ensure_ascii=False, default=str))
+                self.rejects.write('\n')
+    
+    def wrap(self, records: Iterable[Any], metrics: Optional[ConversionMetrics] = None) -> Iterable[Dict[str, Any]]:
+        """
+        Aplica a validação preservando o tipo da entrada: listas continuam listas (e com total
+        conhecido); fluxos continuam expondo total_bytes/bytes_read para a barra de progresso.
+        """
+        if isinstance(records, list):
+            return list(self.filter(records, metrics))
+        return _ValidatedRecords(records, self, metrics)
+
+class _ValidatedRecords:
+    """
+    Fluxo de registros validado sob demanda, com os atributos do fluxo original acessíveis.
+    """
+    def __init__(self, records: Iterable[Any], validator: RecordValidator,
+                 metrics: Optional[ConversionMetrics] = None):
+        self._records = records
+        self._validator = validator
+        self._metrics = metrics
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._records, name)
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self._validator.filter(self._records, self._metrics)
+
+# Esquema de validação dos campos do CNES (faixas de latitude/longitude cobrem o território brasileiro,
+# incluindo as ilhas oceânicas)
+CNES_SCHEMA = {
+    'codigo_cnes': ColumnRule('int', nullable=False, min_value=1),
+    'numero_cnpj_entidade': ColumnRule('text', digits=True, length=14),
+    'tipo_gestao': ColumnRule('text', max_length=1),
+    'codigo_tipo_unidade': ColumnRule('int'),
+    'codigo_cep_estabelecimento': ColumnRule('text', digits=True, length=8),
+    'numero_estabelecimento': ColumnRule('text'),
+    'latitude_estabelecimento_decimo_grau': ColumnRule('float', min_value=-34.0, max_value=6.0),
+    'longitude_estabelecimento_decimo_grau': ColumnRule('float', min_value=-75.0, max_value=-28.0),
+    'numero_cnpj': ColumnRule('text', digits=True, length=14),
+    'codigo_uf': ColumnRule('int', min_value=11, max_value=53),
+    'codigo_municipio': ColumnRule('int', min_value=100000, max_value=999999),
+    'estabelecimento_possui_centro_cirurgico': ColumnRule('flag'),
+    'estabelecimento_possui_centro_obstetrico': ColumnRule('flag'),
+    'estabelecimento_possui_centro_neonatal': ColumnRule('flag'),
+    'estabelecimento_possui_atendimento_hospitalar': ColumnRule('flag'),
+    'estabelecimento_possui_servico_apoio': ColumnRule('flag'),
+    'estabelecimento_possui_atendimento_ambulatorial': ColumnRule('flag'),
+    'data_atualizacao': ColumnRule('date'),
+}
+
+SCHEMAS = {'cnes': CNES_SCHEMA}
+
+@dataclass
+class DedupOptions:
+    """
+    Remoção de registros duplicados pela coluna key antes da conversão.
+    
+    Sem latest_by, fica a primeira ocorrência de cada chave (uma única passagem). Com
+    latest_by, fica a ocorrência com o maior valor desse campo (ex: data_atualizacao, com as
+    datas normalizadas antes da comparação; em empate, a última). Esse critério exige uma
+    passagem prévia pelos registros para conhecer o vencedor de cada chave: listas são
+    percorridas duas vezes e arquivos em modo streaming são lidos duas vezes.
+    
+    O índice de chaves fica em memória até max_memory_keys chaves e depois passa para um
+    SQLite temporário em spill_dir (padrão: diretório temporário do sistema).
+    """
+    key: str = 'codigo_cnes'
+    latest_by: Optional[str] = None
+    max_memory_keys: int = DEDUP_MAX_MEMORY_KEYS
+    spill_dir: Optional[str] = None
+
+def _dedup_key(record: Any, key: str, position: int) -> Optional[str]:
+    """
+    Chave de um registro para RecordDeduplicator, na forma canônica usada tanto no dicionário
+    em memória quanto no SQLite: o valor em JSON, com números inteiros como int (1 e 1.0 são
+    a mesma chave; "1" é outra). None quando o registro não tem a chave.
+    """
+    if not isinstance(record, dict):
+        raise ValueError(f"Registro {position}: não é um objeto JSON ({type(record).__name__})")
+    value = record.get(key)
+    value_type = type(value)
+    if value_type is int:
+        return str(value)
+    if value is None:
+        return None
+    if value_type is float and value.is_integer():
+        return str(int(value))
+    if value_type in (list, dict):
+        raise ValueError(f"Registro {position}: a chave {key} não pode ser uma lista ou um objeto ({value!r})")
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+class _DedupIndex:
+    """
+    Índice chave -> (ordem, posição) de RecordDeduplicator: dicionário em memória até
+    max_keys chaves, depois tabela em um SQLite temporário. As chaves chegam na forma
+    canônica de _dedup_key, iguais nos dois casos.
+    """
+    def __init__(self, max_keys: int, spill_dir: Optional[str] = None):
+        self.max_keys = max_keys
+        self.spill_dir = spill_dir
+        self._keys: Dict[str, Tuple[Any, int]] = {}
+        self._db = None
+        self._db_path = None
+    
+    @property
+    def spilled(self) -> bool:
+        return self._db is not None
+    
+    def get(self, key: str) -> Optional[Tuple[Any, int]]:
+        if self._db is None:
+            return self._keys.get(key)
+        row = self._db.execute("SELECT tipo, ordem, posicao FROM chaves WHERE chave = ?", (key,)).fetchone()
+        return None if row is None else ((row[0], row[1]), row[2])
+    
+    def put(self, key: str, order: Any, position: int):
+        if self._db is None:
+            self._keys[key] = (order, position)
+            if len(self._keys) > self.max_keys:
+                self._spill()
+            return
+        self._db.execute("INSERT OR REPLACE INTO chaves VALUES (?, ?, ?, ?)", (key, order[0], order[1], position))
+    
+    def _spill(self):
+        """
+        Transfere o índice para um SQLite temporário, sem journal nem sincronização com o disco.
+        """
+        fd, self._db_path = tempfile.mkstemp(prefix='dedup_', suffix='.sqlite', dir=self.spill_dir)
+        os.close(fd)
+        self._db = sqlite3.connect(self._db_path)
+        self._db.execute("PRAGMA journal_mode = OFF")
+        self._db.execute("PRAGMA synchronous = OFF")
+        self._db.execute("CREATE TABLE chaves (chave PRIMARY KEY, tipo, ordem, posicao) WITHOUT ROWID")
+        self._db.executemany("INSERT INTO chaves VALUES (?, ?, ?, ?)",
+                             ((key, order[0], order[1], position) for key, (order, position) in self._keys.items()))
+        self._keys = {}
+    
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+            os.remove(self._db_path)
+
+class RecordDeduplicator:
+    """
+    Descarta registros com chave repetida (ver DedupOptions), registrando os descartados.
+    
+    Cada linha do relatório de duplicados (JSON Lines) traz a posição do registro descartado,
+    a chave, a posição do registro mantido e o registro descartado. Registros sem a chave
+    nunca são descartados. Chaves numéricas iguais (1 e 1.0) são a mesma chave; registros
+    que não são objetos e chaves que são listas ou objetos levantam ValueError.
+    """
+    def __init__(self, options: DedupOptions, report: Optional[Any] = None,
+                 parse_date: Optional[Callable[[str], Optional[str]]] = None):
+        """
+        Args:
+            options: Chave, critério e limite de memória do índice
+            report: Arquivo de texto aberto para o relatório (opcional; sem ele só são contados)
+            parse_date: Normalizador de datas para YYYY-MM-DD usado em latest_by
+                        (padrão: JSONToSQLConverter._format_date_fast)
+        """
+        if parse_date is None:
+            parse_date = JSONToSQLConverter()._format_date_fast
+        self.options = options
+        self.report = report
+        self._parse_date = parse_date
+        self._index = _DedupIndex(options.max_memory_keys, options.spill_dir)
+        self.scanned = False
+        self.kept = 0
+        self.dropped = 0
+    
+    def _order(self, value: Any) -> Tuple[int, Any]:
+        """
+        Valor comparável de latest_by: nulos antes de números, números antes de texto, e
+        datas normalizadas para YYYY-MM-DD (comparáveis como texto).
+        """
+        if value is None:
+            return (0, 0)
+        if type(value) in (int, float, bool):
+            return (1, value)
+        value = str(value)
+        if _looks_like_date(value):
+            return (2, self._parse_date(value) or value)
+        return (2, value)
+    
+    def scan(self, records: Iterable[Any]):
+        """
+        Passagem prévia do critério latest_by: encontra a posição do registro mantido de cada chave.
+        """
+        key, latest_by = self.options.key, self.options.latest_by
+        index = self._index
+        order_of = self._order
+        for position, record in enumerate(records, 1):
+            record_key = _dedup_key(record, key, position)
+            if record_key is None:
+                continue
+            order = order_of(record.get(latest_by))
+            current = index.get(record_key)
+            if current is None or order >= current[0]:
+                index.put(record_key, order, position)
+        self.scanned = True
+    
+    def filter(self, records: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Entrega os registros mantidos, registrando os descartados no relatório.
+        """
+        key = self.options.key
+        index = self._index
+        latest = self.options.latest_by is not None
+        if latest and not self.scanned:
+            raise ValueError("Com latest_by, os registros precisam passar antes por scan")
+        for position, record in enumerate(records, 1):
+            record_key = _dedup_key(record, key, position)
+            if record_key is not None:
+                current = index.get(record_key)
+                if latest:
+                    kept_position = current[1]
+                elif current is None:
+                    index.put(record_key, (0, 0), position)
+                    kept_position = position
+                else:
+                    kept_position = current[1]
+                if kept_position != position:
+                    self.dropped += 1
+                    if self.report is not None:
+                        self.report.write(json.dumps({'registro': position, 'chave': record.get(key),
+                                                      'mantido': kept_position, 'dados': record},
+                                                     ensure_ascii=False, default=str))
+                        self.report.write('\n')
+                    continue
+            self.kept += 1
+            yield record
+    
+    def wrap(self, records: Iterable[Any]) -> Iterable[Dict[str, Any]]:
+        """
+        Aplica a remoção preservando o tipo da entrada (como RecordValidator.wrap). Listas são
+        percorridas por scan quando necessário; fluxos com latest_by precisam de scan prévio.
+        """
+        if isinstance(records, list):
+            if self.options.latest_by is not None and not self.scanned:
+                self.scan(records)
+            return list(self.filter(records))
+        if self.options.latest_by is not None and not self.scanned:
+            raise ValueError("Com latest_by em modo streaming, a entrada precisa ser lida antes por scan "
+                             "(convert_file faz isso; stdin não é suportado)")
+        return _DedupedRecords(records, self)
+    
+    def close(self):
+        """
+        Libera o índice (e remove o SQLite temporário, se usado).
+        """
+        self._index.close()
+
+class _DedupedRecords:
+    """
+    Fluxo de registros sem duplicados sob demanda, com os atributos do fluxo original acessíveis.
+    """
+    def __init__(self, records: Iterable[Any], deduplicator: RecordDeduplicator):
+        self._records = records
+        self._deduplicator = deduplicator
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._records, name)
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self._deduplicator.filter(self._records)
+
+class ValueFormatCache:
+    """
+    Cache LRU limitado de valor bruto → literal SQL para uma coluna.
+    
+    Apenas strings são armazenadas (1, 1.0 e True têm o mesmo hash, mas literais diferentes).
+    O cache se desativa sozinho quando a taxa de acertos fica abaixo de min_hit_rate.
+    """
+    def __init__(self, formatter: Callable[[Any], str], max_size: int = 1024, min_hit_rate: float = 0.5,
+                 check_interval: int = 1000):
+        self.formatter = formatter
+        self.max_size = max_size
+        self.min_hit_rate = min_hit_rate
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.enabled = True
+        self._next_check = check_interval
+        self._data = OrderedDict()
+    
+    def format(self, value: Any) -> str:
+        """
+        Formata o valor, reaproveitando o literal já calculado quando possível.
+        
+        Args:
+            value: O valor a ser formatado
+            
+        Returns:
+            String com o valor formatado para SQL
+        """
+        if type(value) is not str:
+            return self.formatter(value)
+        
+        data = self._data
+        literal = data.get(value)
+        if literal is not None:
+            self.hits += 1
+            data.move_to_end(value)
+            return literal
+        
+        self.misses += 1
+        literal = self.formatter(value)
+        data[value] = literal
+        if len(data) > self.max_size:
+            data.popitem(last=False)
+        
+        # Verificar a taxa de acertos periodicamente (apenas nas falhas, que já são o caminho lento)
+        lookups = self.hits + self.misses
+        if lookups >= self._next_check:
+            self._next_check = lookups + self.check_interval
+            if self.hit_rate < self.min_hit_rate:
+                self.enabled = False
+                data.clear()
+        return literal
+    
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna os contadores do cache.
+        
+        Returns:
+            Dicionário com acertos, falhas, taxa de acertos, tamanho e estado
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hit_rate, 4),
+            'size': len(self._data),
+            'enabled': self.enabled,
+        }
+
+class ConnectionPool:
+    """
+    Pool simples de conexões DB-API, criadas sob demanda até o limite informado.
+    
+    Para SQLite com mais de um escritor, a fábrica deve usar check_same_thread=False,
+    pois a mesma conexão pode ser usada por threads diferentes (uma de cada vez).
+    """
+    def __init__(self, connect: Callable[[], Any], size: int = 1):
+        self.connect = connect
+        self.size = size
+        self._created = 0
+        self._lock = threading.Lock()
+        self._idle = queue.Queue()
+        self._connections = []
+    
+    def acquire(self) -> Any:
+        """
+        Obtém uma conexão livre, criando uma nova se o limite ainda não foi atingido.
+        
+        Returns:
+            Conexão DB-API
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                connection = self.connect()
+                self._connections.append(connection)
+                return connection
+        return self._idle.get()
+    
+    def release(self, connection: Any):
+        """
+        Devolve uma conexão ao pool.
+        
+        Args:
+            connection: Conexão obtida com acquire()
+        """
+        self._idle.put(connection)
+    
+    def close_all(self):
+        """
+        Fecha todas as conexões criadas pelo pool.
+        """
+        for connection in self._connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        self._connections = []
+        self._created = 0
+        self._idle = queue.Queue()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close_all()
+
+class JSONToSQLConverter:
+    def __init__(self, table_name: str = "unidade_saude", column_types: Optional[Union[Dict[str, str], str]] = None,
+                 value_cache_size: int = 0, cache_min_hit_rate: float = 0.5,
+                 dialect: Union[str, SQLDialect] = 'standard', upsert: bool = False,
+                 upsert_key: str = 'codigo_cnes', collect_metrics: bool = False, engine: str = 'rows',
+                 schema: Optional[Union[Dict[str, ColumnRule], str]] = None,
+                 fields: Optional[List[str]] = None, batch_sizing: Optional[BatchSizing] = None,
+                 strict_dates: bool = False):
+        """
+        Args:
+            table_name: Nome da tabela de destino
+            column_types: Tipos das colunas para formatadores especializados ({coluna: tipo}, ver
+                COLUMN_TYPES), 'infer' para inferir do primeiro lote, ou None para o formatador genérico
+            value_cache_size: Tamanho máximo do cache de literais por coluna (0 = desativado)
+            cache_min_hit_rate: Taxa mínima de acertos para manter o cache de uma coluna ativo
+            dialect: Dialeto/motor de saída (nome em DIALECTS ou instância de SQLDialect)
+            upsert: Se deve gerar UPSERT/MERGE (atualiza registros já existentes pela chave)
+            upsert_key: Coluna chave do UPSERT (padrão: codigo_cnes)
+            collect_metrics: Se deve coletar métricas de desempenho em self.metrics (ConversionMetrics)
+            engine: Motor de formatação dos lotes (ver ENGINES); a saída é idêntica em todos
+            schema: Esquema de validação ({coluna: ColumnRule} ou nome em SCHEMAS, como 'cnes');
+                    registros inválidos são desviados para o arquivo de rejeitados (ver convert_file)
+            fields: Colunas da tabela, na ordem do INSERT (padrão: campos do CNES em required_fields)
+            batch_sizing: Tamanho dos lotes por limite de bytes/valores por comando e ajuste pela
+                          vazão (opcional; sem ele, os lotes têm batch_size registros)
+            strict_dates: Se apenas as colunas do tipo 'date' devem ser normalizadas como datas
+                          (sem ele, qualquer string com cara de data vira data, como em 'auto')
+        """
+        self.table_name = table_name
+        self.dialect = get_dialect(dialect)
+        self.upsert = upsert
+        self.upsert_key = upsert_key
+        if upsert and not self.dialect.supports_upsert:
+            raise ValueError(f"O dialeto {self.dialect.name} não suporta UPSERT; "
+                             "use postgresql, mysql, sqlite ou sqlserver")
+        self.column_types = column_types
+        self.value_cache_size = value_cache_size
+        self.cache_min_hit_rate = cache_min_hit_rate
+        self.metrics = ConversionMetrics() if collect_metrics else None
+        if engine not in ENGINES:
+            raise ValueError(f"Motor desconhecido: {engine}. Use um de: {', '.join(ENGINES)}")
+        self.engine = engine
+        if isinstance(schema, str):
+            if schema not in SCHEMAS:
+                raise ValueError(f"Esquema desconhecido: {schema}. Use um de: {', '.join(SCHEMAS)}")
+            schema = SCHEMAS[schema]
+        self.schema = schema
+        if batch_sizing is not None and any(limit is not None and limit <= 0 for limit in (
+                batch_sizing.max_bytes, batch_sizing.max_params)):
+            raise ValueError("Os limites de bytes e de valores por comando devem ser positivos")
+        self.batch_sizing = batch_sizing
+        self.strict_dates = strict_dates
+        # Destino do progresso em JSON Lines e intervalo entre amostras (ver ProgressReporter;
+        # None: barra em um terminal e nada fora dele; JSON Lines só com um destino, como --progress-json)
+        self.progress_output = None
+        self.progress_interval = None
+        # Formatadores compilados por coluna e conversores de parâmetros DB-API (gerados sob demanda)
+        self._row_formatters = None
+        self._param_converters = None
+        self._value_caches = {}
+        # Formato detectado e contagem de fallbacks das colunas de data
+        self._date_stats = {}
+        # Campos específicos que devem ser incluídos no SQL
+        self.required_fields = [
+            "codigo_cnes",
+            "numero_cnpj_entidade",
+            "nome_razao_social",
+            "nome_fantasia",
+            "natureza_organizacao_entidade",
+            "tipo_gestao",
+            "descricao_nivel_hierarquia",
+            "descricao_esfera_administrativa",
+            "codigo_tipo_unidade",
+            "codigo_cep_estabelecimento",
+            "endereco_estabelecimento",
+            "numero_estabelecimento",
+            "bairro_estabelecimento",
+            "numero_telefone_estabelecimento",
+            "latitude_estabelecimento_decimo_grau",
+            "longitude_estabelecimento_decimo_grau",
+            "endereco_email_estabelecimento",
+            "numero_cnpj",
+            "codigo_identificador_turno_atendimento",
+            "descricao_turno_atendimento",
+            "estabelecimento_faz_atendimento_ambulatorial_sus",
+            "codigo_estabelecimento_saude",
+            "codigo_uf",
+            "codigo_municipio",
+            "descricao_natureza_juridica_estabelecimento",
+            "codigo_motivo_desabilitacao_estabelecimento",
+            "estabelecimento_possui_centro_cirurgico",
+            "estabelecimento_possui_centro_obstetrico",
+            "estabelecimento_possui_centro_neonatal",
+            "estabelecimento_possui_atendimento_hospitalar",
+            "estabelecimento_possui_servico_apoio",
+            "estabelecimento_possui_atendimento_ambulatorial",
+            "codigo_atividade_ensino_unidade",
+            "codigo_natureza_organizacao_unidade",
+            "codigo_nivel_hierarquia_unidade",
+            "codigo_esfera_administrativa_unidade",
+            "data_atualizacao"
+        ]
+        if fields is not None:
+            self.required_fields = list(fields)
+        
+    def format_sql_value(self, value: Any) -> str:
+        """
+        Formata um valor Python para sua representação SQL adequada (versão otimizada),
+        seguindo as regras de literais do dialeto configurado.
+        
+        Args:
+            value: O valor a ser formatado
+            
+        Returns:
+            String com o valor formatado para SQL
+        """
+        if value is None:
+            return self.dialect.null_literal
+        
+        value_type = type(value)
+        
+        # Tratar strings (otimizado)
+        if value_type is str:
+            # Verificação rápida para datas (só dígitos, como CEP, nunca é data)
+            if (len(value) in (10, 8) and not self.strict_dates and not value.isdigit()
+                    and value.replace('-', '').replace('/', '').isdigit()):
+                formatted_date = self._format_date_fast(value)
+                if formatted_date:
+                    return self.dialect.date_literal(formatted_date)
+            
+            # Escapar conforme as regras do dialeto
+            return self.dialect.quote_text(value)
+        
+        # Tratar números
+        if value_type in (int, float):
+            return str(value)
+        
+        # Tratar booleanos
+        if value_type is bool:
+            return self.dialect.true_literal if value else self.dialect.false_literal
+        
+        # Para outros tipos, converter para string
+        return self.dialect.quote_text(str(value))
+    
+    def infer_column_types(self, records: Iterable[Dict[str, Any]], sample_size: int = TYPE_INFERENCE_SAMPLE_SIZE) -> Dict[str, str]:
+        """
+        Infere o tipo de cada coluna a partir de uma amostra de registros.
+        
+        Colunas com tipos mistos (ou sem valores não nulos na amostra) ficam como 'auto',
+        usando o formatador genérico.
+        
+        Args:
+            records: Registros de amostra
+            sample_size: Quantidade máxima de registros analisados
+            
+        Returns:
+            Dicionário {coluna: tipo}
+        """
+        seen = {col: set() for col in self.required_fields}
+        flags = {col: True for col in self.required_fields}
+        dates = {col: True for col in self.required_fields}
+        
+        for record in islice(records, sample_size):
+            for col in self.required_fields:
+                value = record.get(col)
+                if value is None:
+                    continue
+                value_type = type(value)
+                seen[col].add(value_type)
+                if value_type is int and value not in (0, 1):
+                    flags[col] = False
+                elif value_type is str and not (_looks_like_date(value) and self._format_date_fast(value)):
+                    dates[col] = False
+        
+        column_types = {}
+        for col, types in seen.items():
+            if types == {int}:
+                column_types[col] = 'flag' if flags[col] else 'int'
+            elif types and types <= {int, float}:
+                column_types[col] = 'float'
+            elif types == {bool}:
+                column_types[col] = 'bool'
+            elif types == {str}:
+                column_types[col] = 'date' if dates[col] else 'text'
+            else:
+                column_types[col] = 'auto'
+        return column_types
+    
+    def set_column_types(self, column_types: Optional[Union[Dict[str, str], str]]):
+        """
+        Define os tipos das colunas e descarta os formatadores já compilados.
+        
+        Args:
+            column_types: {coluna: tipo}, 'infer' ou None (ver __init__)
+        """
+        self.column_types = column_types
+        self._row_formatters = None
+        self._param_converters = None
+        self._value_caches = {}
+        self._date_stats = {}
+    
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Retorna os contadores do cache de literais de cada coluna.
+        
+        Com workers > 1 os caches ficam nos processos do pool e não aparecem aqui.
+        
+        Returns:
+            Dicionário {coluna: contadores}
+        """
+        return {col: cache.stats() for col, cache in self._value_caches.items()}
+    
+    def date_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Retorna, para cada coluna do tipo 'date', o formato detectado no primeiro lote e quantos
+        valores fora desse formato caíram na detecção genérica (fallbacks).
+        
+        Com workers > 1 as contagens ficam nos processos do pool e não aparecem aqui.
+        
+        Returns:
+            Dicionário {coluna: {'formato': nome em DATE_FORMATS, 'fallbacks': quantidade}}
+        """
+        return {col: dict(stats) for col, stats in self._date_stats.items()}
+    
+    def _get_row_formatters(self, sample: List[Dict[str, Any]]) -> List[Tuple[str, Callable[[Any], str]]]:
+        """
+        Retorna os formatadores compilados por coluna, compilando-os na primeira chamada.
+        
+        Args:
+            sample: Registros usados para inferência quando column_types é 'infer'
+            
+        Returns:
+            Lista de tuplas (coluna, formatador) na ordem de required_fields
+        """
+        if self._row_formatters is None:
+            if self.upsert and self.upsert_key not in self.required_fields:
+                raise ValueError(f"A chave do UPSERT ({self.upsert_key}) precisa estar em required_fields")
+            if self.column_types == 'infer':
+                self.column_types = self.infer_column_types(sample)
+            column_types = self.column_types or {}
+            self._row_formatters = []
+            self._value_caches = {}
+            self._date_stats = {}
+            if self.metrics is not None:
+                self.metrics.date_columns = self._date_stats
+            for col in self.required_fields:
+                column_type = column_types.get(col, 'auto')
+                if column_type == 'date':
+                    # Formato detectado uma vez por coluna, a partir da amostra
+                    date_format = detect_date_format([record.get(col) for record in sample]) or 'iso'
+                    stats = self._date_stats[col] = {'formato': date_format, 'fallbacks': 0}
+                    formatter = self._compile_column_formatter(column_type, date_format, stats)
+                else:
+                    formatter = self._compile_column_formatter(column_type)
+                # Números e booleanos já são baratos de formatar: cache só para texto e datas
+                if self.value_cache_size > 0 and column_type in ('text', 'date', 'auto'):
+                    cache = ValueFormatCache(formatter, self.value_cache_size, self.cache_min_hit_rate)
+                    self._value_caches[col] = cache
+                    formatter = cache.format
+                if self.metrics is not None:
+                    formatter = self.metrics.timed_formatter(col, formatter)
+                self._row_formatters.append((col, formatter))
+        return self._row_formatters
+    
+    def _drop_disabled_caches(self):
+        """
+        Substitui os caches desativados (baixa taxa de acertos) pelo formatador original da coluna.
+        """
+        formatters = []
+        for col, formatter in self._row_formatters:
+            cache = self._value_caches.get(col)
+            if cache is not None and not cache.enabled:
+                formatter = cache.formatter
+                if self.metrics is not None:
+                    formatter = self.metrics.timed_formatter(col, formatter)
+            formatters.append((col, formatter))
+        self._row_formatters = formatters
+    
+    def _compile_column_formatter(self, column_type: str, date_format: str = 'iso',
+                                  date_stats: Optional[Dict[str, Any]] = None) -> Callable[[Any], str]:
+        """
+        Cria um formatador especializado para um tipo de coluna.
+        
+        Todo formatador trata apenas o caso esperado do tipo e delega qualquer outro valor
+        (None, tipo divergente, formato inesperado) para format_sql_value, garantindo a
+        mesma saída do caminho genérico. Com strict_dates, colunas 'text' nunca viram data.
+        
+        Args:
+            column_type: Um dos tipos de COLUMN_TYPES
+            date_format: Formato das colunas 'date' (nome em DATE_FORMATS)
+            date_stats: Contadores da coluna 'date' ({'fallbacks': n}), atualizados pelo formatador
+            
+        Returns:
+            Função que recebe o valor e retorna sua representação SQL
+        """
+        generic = self.format_sql_value
+        dialect = self.dialect
+        
+        if column_type == 'int':
+            def format_int(value):
+                if type(value) is int:
+                    return str(value)
+                return generic(value)
+            return format_int
+        
+        if column_type == 'float':
+            def format_number(value):
+                value_type = type(value)
+                if value_type is float or value_type is int:
+                    return str(value)
+                return generic(value)
+            return format_number
+        
+        if column_type == 'flag':
+            flag_literals = {0: '0', 1: '1'}
+            def format_flag(value):
+                # type() exato: True/False (bool) não devem virar 1/0
+                if type(value) is int:
+                    literal = flag_literals.get(value)
+                    if literal is not None:
+                        return literal
+                return generic(value)
+            return format_flag
+        
+        if column_type == 'bool':
+            true_literal = dialect.true_literal
+            false_literal = dialect.false_literal
+            def format_bool(value):
+                if value is True:
+                    return true_literal
+                if value is False:
+                    return false_literal
+                return generic(value)
+            return format_bool
+        
+        if column_type == 'text':
+            quote_text = dialect.quote_text
+            if self.strict_dates:
+                def format_text(value):
+                    if type(value) is str:
+                        return quote_text(value)
+                    return generic(value)
+                return format_text
+            def format_text(value):
+                # Strings de 8 ou 10 caracteres com separadores podem ser datas: caminho genérico.
+                # Só dígitos (CEP, telefone) nunca são convertidos em data.
+                if type(value) is str and (len(value) not in (8, 10) or value.isdigit()):
+                    return quote_text(value)
+                return generic(value)
+            return format_text
+        
+        if column_type == 'date':
+            date_literal = dialect.date_literal
+            quote_text = dialect.quote_text
+            parse = DATE_FORMATS[date_format]
+            format_date_fast = self._format_date_fast
+            if date_stats is None:
+                date_stats = {'fallbacks': 0}
+            def format_date(value):
+                if type(value) is str:
+                    # Rotina de fatias fixas do formato detectado na coluna
+                    if len(value) == 10:
+                        formatted_date = parse(value)
+                        if formatted_date is not None:
+                            return date_literal(formatted_date)
+                    # Outro formato: mesma detecção do caminho genérico (também com strict_dates)
+                    date_stats['fallbacks'] += 1
+                    if _looks_like_date(value):
+                        formatted_date = format_date_fast(value)
+                        if formatted_date:
+                            return date_literal(formatted_date)
+                    return quote_text(value)
+                return generic(value)
+            return format_date
+        
+        if column_type == 'auto':
+            return generic
+        
+        raise ValueError(f"Tipo de coluna desconhecido: {column_type} (use um de {', '.join(COLUMN_TYPES)})")
+    
+    def __getstate__(self):
+        # Formatadores compilados (closures) não são serializáveis: recompilar no processo de destino
+        state = self.__dict__.copy()
+        state['_row_formatters'] = None
+        state['_param_converters'] = None
+        state['_value_caches'] = {}
+        # Métricas e progresso ficam apenas no processo principal
+        state['metrics'] = None
+        state['progress_output'] = None
+        return state
+    
+    def _format_date_fast(self, date_string: str) -> Optional[str]:
+        """
+        Versão otimizada do formatador de data para casos comuns.
+        
+        Args:
+            date_string: String contendo a data
+            
+        Returns:
+            Data formatada como YYYY-MM-DD ou None se não conseguir converter
+        """
+        try:
+            # Caso mais comum: YYYY-MM-DD (já no formato correto)
+            if len(date_string) == 10 and date_string[4] == '-' and date_string[7] == '-':
+                return date_string
+            
+            # Caso DD/MM/YYYY
+            if len(date_string) == 10 and date_string[2] == '/' and date_string[5] == '/':
+                day, month, year = date_string.split('/')
+                return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+            
+            # Caso YYYY/MM/DD
+            if len(date_string) == 10 and date_string[4] == '/' and date_string[7] == '/':
+                year, month, day = date_string.split('/')
+                return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+            
+            # Para outros casos, usar o método original (mais lento mas funciona)
+            return self._format_date(date_string)
+        except:
+            return None
+    
+    def _format_date(self, date_string: str) -> Optional[str]:
+        """
+        Converte uma string de data para o formato YYYY-MM-DD.
+        
+        Args:
+            date_string: String contendo a data
+            
+        Returns:
+            Data formatada como YYYY-MM-DD ou None se não conseguir converter
+        """
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.date_fallbacks += 1
+        # Mesmos formatos e regras do strptime, com as expressões já compiladas em vez de
+        # uma exceção por formato que não corresponde
+        for pattern, (year_group, month_group, day_group) in _DATE_PATTERNS:
+            match = pattern.match(date_string)
+            if match is None or match.end() != len(date_string):
+                continue
+            try:
+                date_obj = datetime(int(match.group(year_group)), int(match.group(month_group)),
+                                    int(match.group(day_group)))
+            except ValueError:
+                # Data inexistente (ex: 30 de fevereiro): tentar o próximo formato
+                continue
+            return date_obj.strftime('%Y-%m-%d')
+        
+        if metrics is not None:
+            metrics.date_fallback_failures += 1
+        return None
+    
+    def generate_bulk_insert_statement(self, json_data: List[Dict[str, Any]], show_progress: bool = True) -> str:
+        """
+        Gera um único comando SQL INSERT com múltiplos VALUES usando apenas os campos definidos (versão otimizada).
+        Com outros dialetos, gera os comandos equivalentes do lote (COPY, TSV, transação, etc.).
+        
+        Args:
+            json_data: Lista de dicionários representando os registros
+            show_progress: Se deve exibir barra de progresso
+            
+        Returns:
+            String com o comando SQL INSERT único com múltiplos VALUES
+        """
+        if not json_data:
+            return self.dialect.comment("Nenhum dado para converter")
+        
+        # Processar registros em lotes para melhor performance
+        total_records = len(json_data)
+        
+        # Criar barra de progresso se solicitado e houver muitos registros
+        progress = None
+        if show_progress and total_records > 100:
+            progress = self._progress("Convertendo registros", total_records=total_records)
+        
+        try:
+            # Montar as linhas em uma lista e juntar uma única vez no final
+            formatters = self._get_row_formatters(json_data)
+            if self.engine == 'columnar':
+                with self._stage('formatacao'):
+                    rows = self._format_rows_columnar(json_data, formatters)
+                if progress:
+                    progress.advance(total_records)
+            else:
+                rows = self._format_rows(json_data, formatters, progress)
+            
+            # Finalizar progresso
+            if progress:
+                progress.finish()
+        finally:
+            if progress:
+                progress.close()
+        
+        if self._value_caches:
+            self._drop_disabled_caches()
+        
+        if self.metrics is not None:
+            self.metrics.record_batch(total_records)
+        with self._stage('montagem'):
+            return self.dialect.render_batch(self.table_name, self.required_fields, rows,
+                                        self.upsert_key if self.upsert else None)
+    
+    def _format_rows(self, json_data: List[Dict[str, Any]], formatters: List[Tuple[str, Callable[[Any], str]]],
+                     progress: Optional[ProgressReporter] = None) -> List[str]:
+        """
+        Formata as linhas do lote registro a registro (motor 'rows').
+        """
+        dialect = self.dialect
+        row_prefix = dialect.row_prefix
+        cell_separator = dialect.cell_separator
+        row_suffix = dialect.row_suffix
+        rows = []
+        with self._stage('formatacao'):
+            for record in json_data:
+                # Construir VALUES com o formatador compilado de cada coluna
+                get = record.get
+                rows.append(row_prefix
+                            + cell_separator.join([format_value(get(col)) for col, format_value in formatters])
+                            + row_suffix)
+                
+                # Apenas o contador: a exibição é feita pela thread do ProgressReporter
+                if progress:
+                    progress.records += 1
+        return rows
+    
+    def _format_rows_columnar(self, json_data: List[Dict[str, Any]],
+                              formatters: List[Tuple[str, Callable[[Any], str]]]) -> List[str]:
+        """
+        Formata as linhas do lote coluna a coluna (motor 'columnar').
+        
+        Cada coluna é extraída para uma lista e cada valor distinto é formatado uma única vez;
+        as linhas são montadas ao final a partir das colunas já formatadas. A deduplicação só
+        é usada quando valores iguais na comparação do Python têm o mesmo literal: colunas com
+        float (0.0 e -0.0) ou com mais de um tipo numérico (1, 1.0 e True) são formatadas valor a valor.
+        """
+        dialect = self.dialect
+        getters = [record.get for record in json_data]
+        half = len(getters) // 2
+        columns = []
+        for col, format_value in formatters:
+            values = [get(col) for get in getters]
+            value_types = set(map(type, values))
+            numeric_types = value_types & {int, float, bool}
+            distinct = None
+            if float not in numeric_types and len(numeric_types) <= 1 and not value_types & {list, dict}:
+                distinct = dict.fromkeys(values)
+            if distinct is not None and len(distinct) <= half:
+                formatted = {value: format_value(value) for value in distinct}
+                columns.append(list(map(formatted.__getitem__, values)))
+            else:
+                columns.append(list(map(format_value, values)))
+        
+        row_prefix = dialect.row_prefix
+        row_suffix = dialect.row_suffix
+        join = dialect.cell_separator.join
+        return [row_prefix + join(cells) + row_suffix for cells in zip(*columns)]
+    
+    def _progress(self, description: str, json_data: Any = None,
+                  total_records: Optional[int] = None) -> ProgressReporter:
+        """
+        Cria o indicador de progresso: pelo total de registros quando conhecido, ou pelos bytes
+        lidos da entrada em modo streaming (sem nenhum dos dois, só contadores e vazão).
+        """
+        total_bytes = bytes_source = None
+        if total_records is None and json_data is not None:
+            if hasattr(json_data, '__len__'):
+                total_records = len(json_data)
+            elif getattr(json_data, 'total_bytes', None):
+                total_bytes = json_data.total_bytes
+                bytes_source = lambda: json_data.bytes_read
+        return ProgressReporter(description, total_records, total_bytes, bytes_source,
+                                self.progress_output, self.progress_interval)
+    
+    def _stage(self, name: str):
+        """
+        Contexto que mede uma etapa quando as métricas estão ativas (nulo caso contrário).
+        """
+        if self.metrics is None:
+            return contextlib.nullcontext()
+        return self.metrics.stage(name)
+
+    def convert_json_to_sql(self, json_data: Iterable[Dict[str, Any]], batch_size: int = 1000, show_progress: bool = True,
+                            workers: int = 1) -> str:
+        """
+        Converte uma lista de dicionários em comandos SQL INSERT otimizados.
+        Para grandes volumes, divide em lotes menores para melhor compatibilidade.
+        
+        Também aceita iteráveis sem tamanho conhecido (ex: JSONRecordStream); nesse caso
+        os registros são consumidos lote a lote e o total é informado ao final do script.
+        Para receber os comandos sob demanda, sem montar o script, use iter_statements.
+        
+        Args:
+            json_data: Lista (ou iterável) de dicionários representando os registros
+            batch_size: Tamanho do lote (padrão: 1000 registros por INSERT)
+            show_progress: Se deve exibir barra de progresso
+            workers: Número de processos para renderizar os lotes em paralelo (padrão: 1)
+            
+        Returns:
+            String com os comandos SQL INSERT
+        """
+        return "".join(self._iter_sql_chunks(json_data, batch_size, show_progress, workers=workers))
+    
+    def iter_statements(self, json_data: Iterable[Dict[str, Any]], batch_size: int = 1000,
+                        workers: int = 1) -> Iterator[str]:
+        """
+        Gera sob demanda um comando por lote (o INSERT com múltiplos VALUES, ou o equivalente
+        do dialeto), sem cabeçalho nem comentários de lote, para execução direta em um banco.
+        
+        Aceita qualquer iterável de dicionários (lista, gerador, JSONRecordStream, linhas de um
+        cursor convertidas em dicionários) e só consome a entrada conforme os comandos são
+        pedidos: no máximo um lote fica em memória (2 * workers com renderização paralela).
+        Com batch_sizing, os lotes seguem os limites de bytes e de valores por comando.
+        
+        Args:
+            json_data: Iterável de dicionários representando os registros
+            batch_size: Tamanho do lote (padrão: 1000)
+            workers: Número de processos de renderização (padrão: 1)
+            
+        Returns:
+            Iterador de comandos SQL, um por lote
+        """
+        sizer, batches = self._batches(json_data, batch_size)
+        first_batch = next(batches, None)
+        if first_batch is None:
+            return
+        # Compilar os formatadores (e inferir os tipos, se solicitado) antes de distribuir os lotes
+        self._get_row_formatters(first_batch)
+        for _, statement in self._render_batches(chain((first_batch,), batches), workers, sizer):
+            yield statement
+    
+    def iter_rows(self, json_data: Iterable[Dict[str, Any]]) -> Iterator[Tuple[Any, ...]]:
+        """
+        Gera sob demanda uma tupla de parâmetros DB-API por registro, na ordem de required_fields
+        (mesmas conversões de load_to_database), para uso com executemany ou COPY do próprio driver.
+        
+        Cada coluna segue a mesma decisão dos literais SQL (column_types, formato de data da
+        coluna e strict_dates). Nenhum registro é retido além da amostra inicial usada para
+        inferir os tipos e detectar o formato das datas, quando os conversores ainda não existem.
+        
+        Args:
+            json_data: Iterável de dicionários representando os registros
+            
+        Returns:
+            Iterador de tuplas de parâmetros
+        """
+        if self._param_converters is None:
+            iterator = iter(json_data)
+            sample = list(islice(iterator, TYPE_INFERENCE_SAMPLE_SIZE))
+            if not sample:
+                return
+            self._get_param_converters(sample)
+            json_data = chain(sample, iterator)
+        converters = list(zip(self.required_fields, self._param_converters))
+        for record in json_data:
+            get = record.get
+            yield tuple([convert(get(col)) for col, convert in converters])
+    
+    def _get_param_converters(self, sample: List[Dict[str, Any]]) -> List[Callable[[Any], Any]]:
+        """
+        Retorna os conversores de parâmetros DB-API por coluna, compilando-os na primeira chamada
+        a partir dos mesmos tipos e formatos de data dos formatadores SQL (ver _get_row_formatters).
+        
+        Args:
+            sample: Registros usados para inferência quando os formatadores ainda não foram compilados
+            
+        Returns:
+            Lista de conversores na ordem de required_fields
+        """
+        if self._param_converters is None:
+            self._get_row_formatters(sample)
+            column_types = self.column_types or {}
+            self._param_converters = [
+                self._compile_param_converter(column_types.get(col, 'auto'),
+                                              self._date_stats.get(col, {}).get('formato', 'iso'))
+                for col in self.required_fields
+            ]
+        return self._param_converters
+    
+    def _compile_param_converter(self, column_type: str, date_format: str = 'iso') -> Callable[[Any], Any]:
+        """
+        Cria o conversor de parâmetros de uma coluna, equivalente ao formatador SQL do mesmo tipo.
+        
+        Só o tratamento de strings difere entre os tipos: colunas 'date' sempre normalizam datas,
+        colunas 'text' com strict_dates nunca o fazem e as demais seguem _to_db_value.
+        
+        Args:
+            column_type: Um dos tipos de COLUMN_TYPES
+            date_format: Formato das colunas 'date' (nome em DATE_FORMATS)
+            
+        Returns:
+            Função que recebe o valor e retorna o parâmetro para o driver
+        """
+        generic = self._to_db_value
+        
+        if column_type == 'date':
+            parse = DATE_FORMATS[date_format]
+            format_date_fast = self._format_date_fast
+            def convert_date(value):
+                if type(value) is str:
+                    if len(value) == 10:
+                        formatted_date = parse(value)
+                        if formatted_date is not None:
+                            return formatted_date
+                    if _looks_like_date(value):
+                        return format_date_fast(value) or value
+                    return value
+                return generic(value)
+            return convert_date
+        
+        if column_type == 'text' and self.strict_dates:
+            def convert_text(value):
+                if type(value) is str:
+                    return value
+                return generic(value)
+            return convert_text
+        
+        return generic
+    
+    def _batches(self, json_data: Iterable[Dict[str, Any]],
+                 batch_size: int) -> Tuple[Optional[BatchSizer], Iterator[List[Dict[str, Any]]]]:
+        """
+        Divide os registros em lotes de batch_size ou, com batch_sizing, pelo BatchSizer.
+        """
+        if self.batch_sizing is None:
+            return None, _iter_batches(json_data, batch_size)
+        sizer = BatchSizer(self.batch_sizing, batch_size, len(self.required_fields))
+        return sizer, sizer.batches_of(json_data)
+    
+    def _iter_sql_chunks(self, json_data: Iterable[Dict[str, Any]], batch_size: int = 1000, show_progress: bool = True,
+                         summary: Optional['ConversionSummary'] = None, workers: int = 1,
+                         resume_records: int = 0, resume_batches: int = 0,
+                         cache: Optional['ConversionCache'] = None) -> Iterator[str]:
+        """
+        Gera o script SQL em partes (cabeçalho e um bloco por lote), sem nunca montar o script completo.
+        
+        Para listas, a saída é idêntica à de convert_json_to_sql; para iteráveis sem tamanho
+        conhecido, o total de registros e de lotes é informado ao final do script. Com
+        batch_sizing, o tamanho de cada lote é escolhido durante a execução e o número de
+        lotes também é informado ao final.
+        
+        O resumo é atualizado antes de cada lote ser entregue, de modo que, ao gravar um lote,
+        summary já inclui seus registros (usado pelos checkpoints).
+        
+        Args:
+            json_data: Lista (ou iterável) de dicionários representando os registros
+            batch_size: Tamanho do lote
+            show_progress: Se deve exibir barra de progresso
+            summary: Resumo a ser atualizado com a contagem de registros e lotes (opcional)
+            workers: Número de processos de renderização
+            resume_records: Registros já convertidos em uma execução anterior (retomada)
+            resume_batches: Lotes já gravados em uma execução anterior; na retomada o cabeçalho
+                não é repetido e a numeração dos lotes continua
+            cache: Cache dos comandos renderizados de cada lote (opcional)
+            
+        Returns:
+            Iterador de partes do script SQL
+        """
+        total_records = len(json_data) if hasattr(json_data, '__len__') else None
+        resuming = resume_batches > 0
+        
+        sizer, batches = self._batches(json_data, batch_size)
+        first_batch = next(batches, None)
+        if first_batch is None:
+            if not resuming:
+                yield self.dialect.comment("Nenhum dado para converter")
+            elif total_records is None:
+                yield self._streaming_trailer(resume_records, resume_batches)
+            return
+        
+        # Compilar os formatadores (e inferir os tipos, se solicitado) antes de distribuir os lotes
+        self._get_row_formatters(first_batch)
+        
+        second_batch = next(batches, None)
+        if second_batch is None and not resuming:
+            # Para arquivos pequenos (até um lote), usar método single
+            script = self.convert_json_to_bulk_sql(first_batch, show_progress)
+            script_bytes = len(script.encode('utf-8')) if sizer is not None else 0
+            if sizer is None or not sizer.too_large(script_bytes) or len(first_batch) == 1:
+                if summary:
+                    summary.records += len(first_batch)
+                    summary.batches += 1
+                if sizer is not None:
+                    sizer.observe(len(first_batch), script_bytes)
+                    if summary:
+                        summary.batch_sizes = sizer.report()
+                yield script
+                return
+            # Acima do limite de bytes: seguir pelo modo lotes, que divide o lote
+        
+        # Para arquivos grandes, dividir em lotes
+        dialect = self.dialect
+        if sizer is not None:
+            if not resuming:
+                yield self._script_header([
+                    f"{dialect.script_title} (modo lotes)",
+                    f"Tabela: {self.table_name}",
+                ] + ([f"Total de registros: {total_records}"] if total_records is not None else []) + [
+                    f"Tamanho do lote: variável ({self.batch_sizing.describe()})",
+                ])
+        elif total_records is not None:
+            num_batches = (total_records + batch_size - 1) // batch_size
+            if not resuming:
+                yield self._script_header([
+                    f"{dialect.script_title} (modo lotes)",
+                    f"Tabela: {self.table_name}",
+                    f"Total de registros: {total_records}",
+                    f"Tamanho do lote: {batch_size}",
+                    f"Número de lotes: {num_batches}",
+                ])
+        else:
+            if not resuming:
+                yield self._script_header([
+                    f"{dialect.script_title} (modo lotes, streaming)",
+                    f"Tabela: {self.table_name}",
+                    f"Tamanho do lote: {batch_size}",
+                ])
+        
+        records_done = resume_records
+        batch_num = resume_batches
+        pending_batches = (first_batch,) if second_batch is None else (first_batch, second_batch)
+        progress = self._progress("Processando lotes", json_data) if show_progress else None
+        if progress:
+            progress.records = resume_records
+        try:
+            for batch_len, statement in self._render_batches(chain(pending_batches, batches), workers, sizer, cache):
+                batch_num += 1
+                records_done += batch_len
+                
+                if summary:
+                    summary.records += batch_len
+                    summary.batches += 1
+                    if sizer is not None:
+                        summary.batch_sizes = sizer.report()
+                
+                yield dialect.comment(f"Lote {batch_num}") + statement + dialect.batch_separator
+                
+                if progress:
+                    progress.advance(batch_len)
+            
+            # Finalizar progresso
+            if progress:
+                progress.finish()
+        finally:
+            if progress:
+                progress.close()
+        
+        if total_records is None or sizer is not None:
+            yield self._streaming_trailer(records_done, batch_num)
+    
+    def _streaming_trailer(self, records: int, batches: int) -> str:
+        """
+        Rodapé do script em modo streaming, com os totais conhecidos apenas ao final.
+        """
+        return self.dialect.comment(f"Total de registros: {records}") + self.dialect.comment(f"Número de lotes: {batches}")
+    
+    def _render_batches(self, batches: Iterable[List[Dict[str, Any]]], workers: int = 1,
+                        sizer: Optional[BatchSizer] = None,
+                        cache: Optional['ConversionCache'] = None) -> Iterator[Tuple[int, str]]:
+        """
+        Renderiza cada lote em um comando INSERT, preservando a ordem original dos lotes.
+        
+        Com workers > 1, os lotes são distribuídos para um pool de processos. No máximo
+        2 * workers lotes ficam em andamento ao mesmo tempo, limitando o uso de memória.
+        
+        Com sizer, cada comando é medido (bytes e tempo desde o lote anterior, incluindo a
+        leitura e a gravação) para dimensionar os próximos lotes, e um comando acima do
+        limite de bytes é substituído pelos comandos das metades do lote.
+        
+        Com cache, lotes com os mesmos registros de uma execução anterior não são renderizados
+        de novo.
+        
+        Args:
+            batches: Iterável de lotes de registros
+            workers: Número de processos de renderização (1 = no processo atual)
+            sizer: Dimensionamento dos lotes (opcional)
+            cache: Cache dos comandos renderizados (opcional)
+            
+        Returns:
+            Iterador de tuplas (quantidade de registros do lote, comando INSERT)
+        """
+        if sizer is None:
+            for batch, statement in self._render_in_order(batches, workers, cache):
+                yield len(batch), statement
+            return
+        
+        clock = time.perf_counter
+        last = clock()
+        for batch, statement in self._render_in_order(batches, workers, cache):
+            now = clock()
+            elapsed, last = now - last, now
+            yield from self._fit_statement(sizer, batch, statement, elapsed)
+    
+    def _render_in_order(self, batches: Iterable[List[Dict[str, Any]]], workers: int = 1,
+                         cache: Optional['ConversionCache'] = None) -> Iterator[Tuple[List[Dict[str, Any]], str]]:
+        """
+        Renderiza os lotes no processo atual ou no pool, entregando pares (lote, comando) em ordem.
+        Lotes encontrados no cache não são renderizados; os demais são guardados nele.
+        """
+        # Os formatadores já foram compilados (e os tipos inferidos) a partir do primeiro lote
+        prefix = cache.key('lote', self._cache_settings()) if cache is not None else None
+        if workers <= 1:
+            for batch in batches:
+                key = statement = None
+                if cache is not None:
+                    key = cache.batch_key(prefix, batch)
+                    statement = cache.get_batch(key)
+                if statement is None:
+                    # Não mostrar progresso individual para cada lote (evita spam)
+                    statement = self.generate_bulk_insert_statement(batch, show_progress=False)
+                    if cache is not None:
+                        cache.put_batch(key, statement)
+                yield batch, statement
+            return
+        
+        max_in_flight = workers * 2
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker, initargs=(self,)) as executor:
+            pending = deque()
+            for batch in batches:
+                key = statement = None
+                if cache is not None:
+                    key = cache.batch_key(prefix, batch)
+                    statement = cache.get_batch(key)
+                future = executor.submit(_render_batch_in_worker, batch) if statement is None else None
+                pending.append((batch, future, statement, key, cache))
+                if len(pending) >= max_in_flight:
+                    yield self._collect_rendered(*pending.popleft())
+            while pending:
+                yield self._collect_rendered(*pending.popleft())
+    
+    def _collect_rendered(self, batch: List[Dict[str, Any]], future, statement: Optional[str] = None,
+                          key: Optional[str] = None,
+                          cache: Optional['ConversionCache'] = None) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Aguarda um lote renderizado em outro processo, registrando a espera nas métricas
+        (lotes vindos do cache chegam prontos, sem future).
+        """
+        if future is None:
+            return batch, statement
+        with self._stage('paralela'):
+            statement = future.result()
+        if self.metrics is not None:
+            self.metrics.record_batch(len(batch))
+        if cache is not None:
+            cache.put_batch(key, statement)
+        return batch, statement
+    
+    def _cache_settings(self) -> Dict[str, Any]:
+        """
+        Configurações que afetam o texto de cada lote, usadas nas chaves do ConversionCache.
+        """
+        return {
+            'table': self.table_name,
+            'dialect': [self.dialect.name, type(self.dialect).__name__],
+            'fields': self.required_fields,
+            'column_types': self.column_types,
+            'upsert_key': self.upsert_key if self.upsert else None,
+            'strict_dates': self.strict_dates,
+        }
+    
+    def _fit_statement(self, sizer: BatchSizer, batch: List[Dict[str, Any]], statement: str,
+                       elapsed: Optional[float] = None) -> Iterator[Tuple[int, str]]:
+        """
+        Registra o comando de um lote no sizer, dividindo o lote ao meio (recursivamente)
+        enquanto o comando passar do limite de bytes.
+        """
+        statement_bytes = len(statement.encode('utf-8'))
+        if sizer.too_large(statement_bytes):
+            if len(batch) > 1:
+                sizer.splits += 1
+                half = len(batch) // 2
+                for part in (batch[:half], batch[half:]):
+                    yield from self._fit_statement(
+                        sizer, part, self.generate_bulk_insert_statement(part, show_progress=False))
+                return
+            # Em stderr: com iter_statements ou saída em stdout, a saída padrão pode ser o próprio SQL
+            print(f"⚠️  Um único registro gerou um comando de {statement_bytes} bytes, acima do limite "
+                  f"de {sizer.sizing.max_bytes}", file=sys.stderr)
+        sizer.observe(len(batch), statement_bytes, elapsed)
+        yield len(batch), statement
+    
+    def write_sql(self, json_data: Iterable[Dict[str, Any]], output: BinaryIO, batch_size: int = 1000,
+                  show_progress: bool = True, workers: int = 1) -> 'ConversionSummary':
+        """
+        Converte os registros e grava o SQL diretamente em um arquivo binário, lote a lote.
+        
+        Cada lote é renderizado, codificado em UTF-8 e gravado imediatamente, de modo que
+        o script completo nunca existe em memória.
+        
+        Args:
+            json_data: Lista (ou iterável) de dicionários representando os registros
+            output: Arquivo aberto em modo binário ('wb')
+            batch_size: Tamanho do lote
+            show_progress: Se deve exibir barra de progresso
+            workers: Número de processos de renderização
+            
+        Returns:
+            ConversionSummary com contagem de registros, lotes, linhas e bytes gravados
+        """
+        summary = ConversionSummary()
+        self._write_chunks(self._iter_sql_chunks(json_data, batch_size, show_progress, summary, workers), output, summary)
+        return summary
+    
+    def _write_chunks(self, chunks: Iterable[str], output: BinaryIO, summary: 'ConversionSummary',
+                      checkpoint: Optional['ConversionCheckpoint'] = None):
+        """
+        Grava as partes do script no arquivo binário assim que são geradas.
+        
+        Args:
+            chunks: Partes do script SQL
+            output: Arquivo aberto em modo binário
+            summary: Resumo a ser atualizado com bytes e linhas gravados
+            checkpoint: Checkpoint registrado a cada lote concluído (opcional)
+        """
+        metrics = self.metrics
+        for chunk in chunks:
+            if metrics is None:
+                data = chunk.encode('utf-8')
+                output.write(data)
+            else:
+                with metrics.stage('gravacao'):
+                    data = chunk.encode('utf-8')
+                    output.write(data)
+                metrics.bytes_emitted += len(data)
+            summary.bytes_written += len(data)
+            summary.lines += chunk.count('\n')
+            if checkpoint is not None and summary.batches != checkpoint.batches:
+                checkpoint.commit(output, summary)
+        # A última linha do script não termina com quebra de linha
+        summary.lines += 1
+    
+    def write_delta_sql(self, json_data: Iterable[Dict[str, Any]], output: BinaryIO, state: 'DeltaState',
+                        batch_size: int = 1000, emit_deletes: bool = False, show_progress: bool = True) -> 'ConversionSummary':
+        """
+        Grava apenas as diferenças em relação ao estado da execução anterior: INSERT para
+        registros novos, UPDATE para alterados e, opcionalmente, DELETE para os que sumiram.
+        
+        O estado é atualizado em memória; cabe a quem chama gravá-lo (state.save) depois
+        que o arquivo de saída estiver completo.
+        
+        Args:
+            json_data: Lista (ou iterável) de dicionários representando os registros
+            output: Arquivo aberto em modo binário ('wb')
+            state: Estado da execução anterior (ver DeltaState)
+            batch_size: Tamanho do lote
+            emit_deletes: Se deve gerar DELETE para registros ausentes nesta execução
+            show_progress: Se deve exibir barra de progresso
+            
+        Returns:
+            ConversionSummary com as contagens de novos, alterados, removidos e inalterados
+        """
+        summary = ConversionSummary()
+        self._write_chunks(self._iter_delta_chunks(json_data, state, batch_size, show_progress, summary, emit_deletes),
+                           output, summary)
+        return summary
+    
+    def _record_digest(self, record: Dict[str, Any]) -> str:
+        """
+        Calcula o hash do conteúdo de um registro (apenas os campos de required_fields).
+        
+        Args:
+            record: Registro
+            
+        Returns:
+            Hash hexadecimal curto (16 caracteres)
+        """
+        values = repr(tuple([record.get(col) for col in self.required_fields]))
+        return hashlib.blake2b(values.encode('utf-8'), digest_size=8).hexdigest()
+    
+    def _render_updates(self, records: List[Dict[str, Any]], key: str) -> str:
+        """
+        Gera um UPDATE por registro, identificando cada um pela coluna chave.
+        
+        Args:
+            records: Registros alterados
+            key: Coluna chave
+            
+        Returns:
+            Comandos UPDATE (em transação, se o dialeto usar transações explícitas)
+        """
+        formatters = self._get_row_formatters(records)
+        statements = []
+        for record in records:
+            get = record.get
+            key_literal = None
+            assignments = []
+            for col, format_value in formatters:
+                literal = format_value(get(col))
+                if col == key:
+                    key_literal = literal
+                else:
+                    assignments.append(f"{col} = {literal}")
+            statements.append(self.dialect.render_update(self.table_name, assignments, key, key_literal))
+        return self.dialect.wrap_transaction("\n".join(statements))
+    
+    def _iter_delta_chunks(self, json_data: Iterable[Dict[str, Any]], state: 'DeltaState', batch_size: int,
+                           show_progress: bool, summary: 'ConversionSummary', emit_deletes: bool = False) -> Iterator[str]:
+        """
+        Gera o script do modo delta em partes, classificando cada registro pelo estado anterior.
+        
+        Args:
+            json_data: Lista (ou iterável) de dicionários representando os registros
+            state: Estado da execução anterior (atualizado ao final da geração)
+            batch_size: Tamanho do lote
+            show_progress: Se deve exibir barra de progresso
+            summary: Resumo a ser atualizado com as contagens
+            emit_deletes: Se deve gerar DELETE para registros ausentes nesta execução
+            
+        Returns:
+            Iterador de partes do script SQL
+        """
+        dialect = self.dialect
+        key = state.key
+        if not dialect.supports_dml:
+            raise ValueError(f"O modo delta requer um dialeto com UPDATE/DELETE (o dialeto {dialect.name} não suporta)")
+        if key not in self.required_fields:
+            raise ValueError(f"A chave do modo delta ({key}) precisa estar em required_fields")
+        if self.batch_sizing is not None:
+            raise ValueError("O modo delta usa lotes de tamanho fixo (batch_size), sem batch_sizing")
+        
+        yield self._script_header([
+            f"{dialect.script_title} (modo delta)",
+            f"Tabela: {self.table_name}",
+            f"Chave: {key}",
+        ])
+        
+        previous = state.records
+        seen = {}
+        batch_num = 0
+        progress = self._progress("Comparando registros", json_data) if show_progress else None
+        try:
+            for batch in _iter_batches(json_data, batch_size):
+                batch_num += 1
+                new_records = []
+                changed_records = []
+                for record in batch:
+                    record_key = record.get(key)
+                    digest = self._record_digest(record)
+                    if record_key is None:
+                        # Sem chave não há como acompanhar o registro entre execuções
+                        new_records.append(record)
+                        continue
+                    
+                    old_entry = seen.get(record_key)
+                    if old_entry is None:
+                        old_entry = previous.get(record_key)
+                    seen[record_key] = (digest, record.get('data_atualizacao'))
+                    
+                    if old_entry is None:
+                        new_records.append(record)
+                    elif old_entry[0] != digest:
+                        changed_records.append(record)
+                    else:
+                        summary.unchanged += 1
+                
+                if new_records:
+                    yield (dialect.comment(f"Lote {batch_num}: {len(new_records)} novos")
+                           + self.generate_bulk_insert_statement(new_records, show_progress=False)
+                           + dialect.batch_separator)
+                if changed_records:
+                    # Com UPSERT habilitado, os alterados saem como INSERT ... ON CONFLICT/MERGE
+                    if self.upsert:
+                        changed_sql = self.generate_bulk_insert_statement(changed_records, show_progress=False)
+                    else:
+                        changed_sql = self._render_updates(changed_records, key)
+                    yield (dialect.comment(f"Lote {batch_num}: {len(changed_records)} alterados")
+                           + changed_sql
+                           + dialect.batch_separator)
+                
+                summary.records += len(batch)
+                summary.batches += 1
+                summary.inserted += len(new_records)
+                summary.updated += len(changed_records)
+                if progress:
+                    progress.advance(len(batch))
+            
+            if progress:
+                progress.finish()
+        finally:
+            if progress:
+                progress.close()
+        
+        if emit_deletes:
+            vanished = [record_key for record_key in previous if record_key not in seen]
+            if vanished:
+                format_key = dict(self._get_row_formatters([]))[key]
+                for i in range(0, len(vanished), batch_size):
+                    key_literals = [format_key(record_key) for record_key in vanished[i:i + batch_size]]
+                    yield (dialect.comment(f"Removidos: {len(key_literals)}")
+                           + dialect.wrap_transaction(dialect.render_delete(self.table_name, key, key_literals))
+                           + dialect.batch_separator)
+            summary.deleted = len(vanished)
+            state.records = seen
+        else:
+            # Sem DELETE os registros ausentes continuam no banco: mantê-los no estado
+            previous.update(seen)
+        
+        yield (dialect.comment(f"Novos: {summary.inserted}, alterados: {summary.updated}, "
+                               f"removidos: {summary.deleted}, inalterados: {summary.unchanged}"))
+    
+    
+    def _to_db_value(self, value: Any) -> Any:
+        """
+        Converte um valor do JSON para parâmetro DB-API, com as mesmas regras de format_sql_value
+        (datas normalizadas para YYYY-MM-DD, exceto com strict_dates; tipos desconhecidos
+        convertidos para string).
+        
+        Args:
+            value: O valor do registro
+            
+        Returns:
+            Valor pronto para ser passado ao driver
+        """
+        if value is None:
+            return None
+        
+        value_type = type(value)
+        if value_type is str:
+            if not self.strict_dates and _looks_like_date(value):
+                formatted_date = self._format_date_fast(value)
+                if formatted_date:
+                    return formatted_date
+            return value
+        if value_type in (int, float, bool):
+            return value
+        return str(value)
+    
+    def _batch_params(self, batch: List[Dict[str, Any]]) -> List[Tuple[Any, ...]]:
+        """
+        Converte um lote de registros em tuplas de parâmetros na ordem de required_fields.
+        
+        Args:
+            batch: Lote de registros
+            
+        Returns:
+            Lista de tuplas de parâmetros
+        """
+        return list(self.iter_rows(batch))
+    
+    def _load_batch(self, pool: ConnectionPool, batch: List[Dict[str, Any]], insert_sql: str, use_copy: bool) -> int:
+        """
+        Grava um lote no banco em uma transação própria, usando COPY quando o driver suporta.
+        
+        Args:
+            pool: Pool de conexões
+            batch: Lote de registros
+            insert_sql: Comando INSERT parametrizado
+            use_copy: Se deve tentar o caminho COPY FROM STDIN
+            
+        Returns:
+            Quantidade de registros gravados
+        """
+        rows = self._batch_params(batch)
+        connection = pool.acquire()
+        try:
+            cursor = connection.cursor()
+            try:
+                columns_str = ", ".join(self.required_fields)
+                copy_sql = f"COPY {self.table_name} ({columns_str}) FROM STDIN"
+                if use_copy and hasattr(cursor, 'copy_expert'):
+                    # psycopg2: enviar o lote no formato texto do COPY
+                    buffer = StringIO()
+                    for row in rows:
+                        buffer.write("\t".join([_escape_copy_text(value) for value in row]))
+                        buffer.write("\n")
+                    buffer.seek(0)
+                    cursor.copy_expert(copy_sql, buffer)
+                elif use_copy and callable(getattr(cursor, 'copy', None)):
+                    # psycopg 3
+                    with cursor.copy(copy_sql) as copy:
+                        for row in rows:
+                            copy.write_row(row)
+                else:
+                    cursor.executemany(insert_sql, rows)
+            finally:
+                cursor.close()
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            pool.release(connection)
+        return len(rows)
+    
+    def load_to_database(self, json_data: Iterable[Dict[str, Any]], connect: Callable[[], Any], batch_size: int = 1000,
+                         workers: int = 1, paramstyle: Optional[str] = None, use_copy: bool = True,
+                         show_progress: bool = True) -> 'ConversionSummary':
+        """
+        Grava os registros diretamente em um banco de dados via DB-API, sem gerar texto SQL.
+        
+        Cada lote é gravado em uma transação própria com executemany parametrizado (ou
+        COPY FROM STDIN em drivers PostgreSQL que suportam). Com workers > 1, os lotes são
+        gravados em paralelo por um pool de conexões. A tabela de destino já deve existir.
+        
+        Com batch_sizing, valem o limite de valores por lote (max_params) e o ajuste pela vazão
+        de carga medida (adaptive); o limite de bytes se aplica apenas aos scripts gerados.
+        
+        Args:
+            json_data: Lista (ou iterável) de dicionários representando os registros
+            connect: Função sem argumentos que abre uma nova conexão (ex: lambda: sqlite3.connect("saude.db"))
+            batch_size: Tamanho do lote (padrão: 1000)
+            workers: Número de conexões/escritores simultâneos (padrão: 1)
+            paramstyle: paramstyle DB-API do driver (padrão: detectado a partir da conexão)
+            use_copy: Se deve usar COPY quando o driver suportar
+            show_progress: Se deve exibir barra de progresso
+            
+        Returns:
+            ConversionSummary com a contagem de registros e lotes gravados
+        """
+        summary = ConversionSummary()
+        sizer, batches = self._batches(json_data, batch_size)
+        first_batch = next(batches, None)
+        if first_batch is not None:
+            # Compilar os conversores (e inferir os tipos) pelo primeiro lote, como nos scripts SQL,
+            # antes de distribuir os lotes entre as conexões
+            self._get_param_converters(first_batch)
+            batches = chain((first_batch,), batches)
+        progress = self._progress("Gravando no banco", json_data) if show_progress else None
+        
+        try:
+            with ConnectionPool(connect, max(1, workers)) as pool:
+                # Abrir a primeira conexão já aqui para detectar o paramstyle do driver
+                connection = pool.acquire()
+                pool.release(connection)
+                placeholder = _PARAM_PLACEHOLDERS[paramstyle or _driver_paramstyle(connection)]
+                
+                columns_str = ", ".join(self.required_fields)
+                placeholders_str = ", ".join([placeholder(i, col) for i, col in enumerate(self.required_fields)])
+                insert_sql = f"INSERT INTO {self.table_name} ({columns_str}) VALUES ({placeholders_str})"
+                if self.upsert:
+                    # COPY não trata conflitos: UPSERT sempre via executemany
+                    insert_sql += " " + self.dialect.upsert_clause(self.required_fields, self.upsert_key)
+                    use_copy = False
+                
+                def load(batch: List[Dict[str, Any]]) -> Tuple[int, float]:
+                    started = time.perf_counter()
+                    loaded = self._load_batch(pool, batch, insert_sql, use_copy)
+                    return loaded, time.perf_counter() - started
+                
+                def record_done(loaded: int, elapsed: float):
+                    summary.records += loaded
+                    summary.batches += 1
+                    if sizer is not None:
+                        sizer.observe(loaded, seconds=elapsed)
+                    if progress:
+                        progress.advance(loaded)
+                
+                if workers <= 1:
+                    for batch in batches:
+                        record_done(*load(batch))
+                else:
+                    max_in_flight = workers * 2
+                    with ThreadPoolExecutor(max_workers=workers) as executor:
+                        pending = deque()
+                        for batch in batches:
+                            pending.append(executor.submit(load, batch))
+                            if len(pending) >= max_in_flight:
+                                record_done(*pending.popleft().result())
+                        while pending:
+                            record_done(*pending.popleft().result())
+            
+            if progress:
+                progress.finish()
+        finally:
+            if progress:
+                progress.close()
+        
+        if sizer is not None:
+            summary.batch_sizes = sizer.report()
+        return summary
+    
+    def convert_json_to_bulk_sql(self, json_data: List[Dict[str, Any]], show_progress: bool = True) -> str:
+        """
+        Converte uma lista de dicionários em um único comando SQL INSERT com múltiplos VALUES (versão otimizada).
+        
+        Args:
+            json_data: Lista de dicionários representando os registros
+            show_progress: Se deve exibir barra de progresso
+            
+        Returns:
+            String com o comando SQL INSERT único
+        """
+        if not json_data:
+            return self.dialect.comment("Nenhum dado para converter")
+        
+        # Adicionar comentário inicial e gerar INSERT único com múltiplos VALUES
+        header = self._script_header([
+            self.dialect.script_title,
+            f"Tabela: {self.table_name}",
+            f"Total de registros: {len(json_data)}",
+        ])
+        return header + self.generate_bulk_insert_statement(json_data, show_progress)
+    
+    def write_shards(self, json_data: Iterable[Dict[str, Any]], output_file: str, sharding: ShardingOptions,
+                     batch_size: int = 1000, show_progress: bool = True, workers: int = 1,
+                     compression: Optional[str] = None,
+                     write_buffer_size: int = DEFAULT_WRITE_BUFFER_SIZE) -> 'ConversionSummary':
         """
-        Formata um valor Python para sua representação SQL adequada (versão otimizada).
+        Converte os registros gravando a saída em várias partes independentes e um manifesto.
+        
+        Cada parte (carga.part0001.sql, ...) é um script completo, com cabeçalho, lotes numerados
+        a partir de 1 e totais ao final, podendo ser carregada em uma sessão própria. O manifesto
+        (carga.manifest.json) lista as partes com registros, lotes, bytes e SHA-256 do arquivo.
         
         Args:
-            value: O valor a ser formatado
+            json_data: Lista (ou iterável) de dicionários representando os registros
+            output_file: Caminho base da saída (as partes e o manifesto são derivados dele)
+            sharding: Critério de divisão
+            batch_size: Tamanho do lote
+            show_progress: Se deve exibir barra de progresso
+            workers: Número de processos de renderização
+            compression: Compressão das partes ('gzip', 'xz', 'bz2', 'zstd' ou None)
+            write_buffer_size: Tamanho do buffer de escrita de cada parte, em bytes
             
         Returns:
-            String com o valor formatado para SQL
+            ConversionSummary com os totais, as partes (shard_files) e o manifesto (manifest_file)
         """
-        if value is None:
-            return "NULL"
+        if self.batch_sizing is not None:
+            raise ValueError("A divisão em partes usa lotes de tamanho fixo (batch_size), sem batch_sizing")
+        if sharding.by not in SHARD_MODES:
+            raise ValueError(f"Critério de divisão desconhecido: {sharding.by}. Use um de: {', '.join(SHARD_MODES)}")
+        if sharding.by == 'hash':
+            if sharding.count <= 0:
+                raise ValueError("A quantidade de partes deve ser positiva")
+            if sharding.key not in self.required_fields:
+                raise ValueError(f"A chave de divisão ({sharding.key}) precisa estar em required_fields")
+        elif sharding.size <= 0:
+            raise ValueError("O tamanho das partes deve ser positivo")
+        check_compression(compression)
+        if compression and self.dialect.load_script(self.table_name, self.required_fields, output_file):
+            raise ValueError(f"O dialeto {self.dialect.name} não suporta saída comprimida")
         
-        value_type = type(value)
+        if sharding.by == 'rows':
+            routed = _route_by_rows(json_data, batch_size, sharding.size)
+        elif sharding.by == 'hash':
+            routed = _route_by_hash(json_data, batch_size, sharding.count, sharding.key)
+        else:
+            # Por tamanho, a parte de cada lote só é conhecida na gravação
+            routed = ((None, batch) for batch in _iter_batches(json_data, batch_size))
         
-        # Tratar strings (otimizado)
-        if value_type is str:
-            # Verificação rápida para datas
-            if len(value) in (10, 8) and value.replace('-', '').replace('/', '').isdigit():
-                formatted_date = self._format_date_fast(value)
-                if formatted_date:
-                    return f"'{formatted_date}'"
-            
-            # Escapar aspas simples (otimizado)
-            if "'" in value:
-                escaped = value.replace("'", "''")
-                return f"'{escaped}'"
-            return f"'{value}'"
         
-        # Tratar números
-        if value_type in (int, float):
-            return str(value)
+        # As partes de destino acompanham os lotes enviados para renderização, na mesma ordem
+        targets = deque()
         
-        # Tratar booleanos
-        if value_type is bool:
-            return "TRUE" if value else "FALSE"
+        def batches():
+            for target, batch in routed:
+                targets.append(target)
+                yield batch
         
-        # Para outros tipos, converter para string
-        str_value = str(value)
-        if "'" in str_value:
-            escaped = str_value.replace("'", "''")
-            return f"'{escaped}'"
-        return f"'{str_value}'"
+        pending = batches()
+        first_batch = next(pending, None)
+        if first_batch is not None:
+            # Compilar os formatadores (e inferir os tipos) antes de distribuir os lotes
+            self._get_row_formatters(first_batch)
+        
+        dialect = self.dialect
+        writers: Dict[int, _ShardWriter] = {}
+        finished: List[_ShardWriter] = []
+        
+        def open_shard(index: int) -> _ShardWriter:
+            writer = _ShardWriter(shard_path(output_file, index), compression, write_buffer_size)
+            writer.write(self._script_header([
+                f"{dialect.script_title} (parte {index + 1})",
+                f"Tabela: {self.table_name}",
+                f"Tamanho do lote: {batch_size}",
+            ]))
+            writers[index] = writer
+            return writer
+        
+        def close_shard(index: int):
+            writer = writers.pop(index)
+            writer.write(self._streaming_trailer(writer.records, writer.batches))
+            writer.close()
+            finished.append(writer)
+        
+        if sharding.by == 'hash':
+            for index in range(sharding.count):
+                open_shard(index)
+        
+        current = 0
+        progress = self._progress("Gravando partes", json_data) if show_progress else None
+        try:
+            rendered = self._render_batches(chain((first_batch,), pending) if first_batch is not None else (), workers)
+            for batch_len, statement in rendered:
+                target = targets.popleft()
+                if target is None:
+                    target = current
+                elif target != current and sharding.by == 'rows':
+                    close_shard(current)
+                current = target
+                writer = writers.get(target) or open_shard(target)
+                writer.records += batch_len
+                writer.batches += 1
+                with self._stage('gravacao'):
+                    writer.write(dialect.comment(f"Lote {writer.batches}") + statement + dialect.batch_separator)
+                if sharding.by == 'bytes' and writer.bytes_written >= sharding.size:
+                    close_shard(target)
+                    current += 1
+                
+                if progress:
+                    progress.advance(batch_len)
+            
+            if not writers and not finished:
+                # Entrada vazia: uma parte única, com o aviso padrão
+                open_shard(0).write(dialect.comment("Nenhum dado para converter"))
+            for index in sorted(writers):
+                close_shard(index)
+            if progress:
+                progress.finish()
+        finally:
+            for writer in writers.values():
+                writer.close()
+            if progress:
+                progress.close()
+        
+        finished.sort(key=lambda writer: writer.path)
+        summary = ConversionSummary(output_compression=compression, shard_files=[w.path for w in finished])
+        entries = []
+        for writer in finished:
+            summary.records += writer.records
+            summary.batches += writer.batches
+            summary.lines += writer.lines
+            summary.bytes_written += writer.bytes_written
+            entry = {
+                'file': os.path.basename(writer.path),
+                'records': writer.records,
+                'batches': writer.batches,
+                'bytes': os.path.getsize(writer.path),
+                'sha256': _sha256_file(writer.path),
+            }
+            load_script = dialect.load_script(self.table_name, self.required_fields, os.path.abspath(writer.path))
+            if load_script:
+                script_file = os.path.splitext(writer.path)[0] + '.load.sql'
+                with open(script_file, 'w', encoding='utf-8') as f:
+                    f.write(load_script)
+                entry['load_script'] = os.path.basename(script_file)
+            entries.append(entry)
+        if self.metrics is not None:
+            self.metrics.bytes_emitted += summary.bytes_written
+        
+        summary.manifest_file = os.path.splitext(strip_compression_extension(output_file))[0] + '.manifest.json'
+        with open(summary.manifest_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': 1,
+                'table': self.table_name,
+                'dialect': dialect.name,
+                'sharding': ({'by': 'hash', 'count': sharding.count, 'key': sharding.key} if sharding.by == 'hash'
+                             else {'by': sharding.by, 'size': sharding.size}),
+                'compression': compression,
+                'records': summary.records,
+                'shards': entries,
+            }, f, ensure_ascii=False, indent=2)
+        return summary
     
-    def _format_date_fast(self, date_string: str) -> Optional[str]:
+    def _open_checkpoint(self, input_file: str, output_file: str, batch_size: int, streaming: bool,
+                         resume: bool) -> 'ConversionCheckpoint':
         """
-        Versão otimizada do formatador de data para casos comuns.
+        Cria o checkpoint da conversão ou, com resume, carrega o existente e valida se ele
+        corresponde à mesma entrada e às mesmas configurações.
+        """
+        input_stat = os.stat(input_file)
+        settings = {
+            'input': os.path.abspath(input_file),
+            'input_size': input_stat.st_size,
+            'input_mtime_ns': input_stat.st_mtime_ns,
+            'table': self.table_name,
+            'dialect': self.dialect.name,
+            'fields': self.required_fields,
+            'batch_size': batch_size,
+            'streaming': streaming,
+            'upsert_key': self.upsert_key if self.upsert else None,
+        }
+        if self.batch_sizing is not None:
+            settings['batch_sizing'] = dict(vars(self.batch_sizing))
+        if self.strict_dates:
+            settings['strict_dates'] = True
+        path = ConversionCheckpoint.path_for(output_file)
+        if resume:
+            previous = ConversionCheckpoint.load(path)
+            if previous is None:
+                print("⚠️  Nenhum checkpoint encontrado: iniciando do começo")
+            elif previous.settings != settings:
+                raise ValueError(f"O checkpoint {path} é de outra entrada ou de outras configurações")
+            elif not os.path.exists(output_file) or os.path.getsize(output_file) < previous.output_bytes:
+                raise ValueError(f"O arquivo de saída {output_file} é menor que o registrado no checkpoint")
+            else:
+                return previous
+        # Um checkpoint antigo não corresponde mais à saída que será recriada
+        fresh = ConversionCheckpoint(path, settings)
+        fresh.remove()
+        return fresh
+    
+    def _script_header(self, lines: List[str]) -> str:
+        """
+        Monta o cabeçalho do script (comentários seguidos de linha em branco), se o dialeto aceitar.
         
         Args:
-            date_string: String contendo a data
+            lines: Linhas do cabeçalho, sem o prefixo de comentário
             
         Returns:
-            Data formatada como YYYY-MM-DD ou None se não conseguir converter
+            Cabeçalho pronto (string vazia para formatos sem comentários)
         """
-        try:
-            # Caso mais comum: YYYY-MM-DD (já no formato correto)
-            if len(date_string) == 10 and date_string[4] == '-' and date_string[7] == '-':
-                return date_string
-            
-            # Caso DD/MM/YYYY
-            if len(date_string) == 10 and date_string[2] == '/' and date_string[5] == '/':
-                day, month, year = date_string.split('/')
-                return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-            
-            # Caso YYYY/MM/DD
-            if len(date_string) == 10 and date_string[4] == '/' and date_string[7] == '/':
-                year, month, day = date_string.split('/')
-                return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-            
-            # Para outros casos, usar o método original (mais lento mas funciona)
-            return self._format_date(date_string)
-        except:
-            return None
-    
-    def _format_date(self, date_string: str) -> Optional[str]:
+        if not self.dialect.supports_comments:
+            return ""
+        return "".join([self.dialect.comment(line) for line in lines]) + "\n"
+
+    def _read_records(self, input_stream: BinaryIO, streaming: bool, json_lines: bool,
+                      total_bytes: Optional[int] = None, skip_records: int = 0,
+                      validator: Optional[RecordValidator] = None,
+                      deduplicator: Optional['RecordDeduplicator'] = None) -> Tuple[Iterable[Dict[str, Any]], Optional[str]]:
         """
-        Converte uma string de data para o formato YYYY-MM-DD.
+        Prepara a leitura dos registros de um fluxo binário (comprimido ou não).
         
         Args:
-            date_string: String contendo a data
+            input_stream: Fluxo binário com o JSON (array ou JSON Lines)
+            streaming: Se deve ler incrementalmente (JSONRecordStream) em vez de carregar tudo
+            json_lines: Se a entrada está em JSON Lines (modo não streaming)
+            total_bytes: Tamanho da entrada, usado na barra de progresso do modo streaming
+            skip_records: Registros iniciais a pular (retomada)
+            validator: Validação aplicada aos registros (opcional; os rejeitados são omitidos)
+            deduplicator: Remoção de duplicados, aplicada depois da validação (opcional)
             
         Returns:
-            Data formatada como YYYY-MM-DD ou None se não conseguir converter
+            Tupla (registros, compressão detectada na entrada ou None)
         """
-        try:
-            # Tentar diferentes formatos de entrada
-            formats = [
-                '%Y-%m-%d',  # YYYY-MM-DD
-                '%d/%m/%Y',  # DD/MM/YYYY
-                '%Y/%m/%d',  # YYYY/MM/DD
-                '%d-%m-%Y',  # DD-MM-YYYY
-            ]
+        raw_input = input_stream
+        input_stream, input_compression = open_input_stream(raw_input)
+        if input_compression:
+            print(f"🔄 Entrada comprimida ({input_compression}), descompactando em fluxo...")
+        
+        if streaming:
+            print("🔄 Lendo arquivo JSON em modo streaming...")
+            json_data = JSONRecordStream(input_stream, total_bytes=total_bytes,
+                                         position_source=raw_input if input_compression and total_bytes else None,
+                                         skip_records=skip_records)
+            if self.metrics is not None:
+                json_data = self.metrics.timed_records(json_data)
+        else:
+            print("🔄 Carregando arquivo JSON...")
             
-            for fmt in formats:
-                try:
-                    date_obj = datetime.strptime(date_string, fmt)
-                    return date_obj.strftime('%Y-%m-%d')
-                except ValueError:
-                    continue
+            with self._stage('leitura'):
+                if json_lines:
+                    json_data = list(JSONRecordStream(input_stream))
+                else:
+                    json_data = json.load(input_stream)
             
-            return None
-        except Exception:
-            return None
+            print(f"✅ Arquivo carregado: {len(json_data)} registros")
+            if skip_records:
+                json_data = json_data[skip_records:]
+        
+        if validator is not None:
+            json_data = validator.wrap(json_data, self.metrics)
+            if not streaming:
+                print(f"✅ Validação: {validator.accepted} válidos, {validator.rejected} rejeitados")
+        if deduplicator is not None:
+            json_data = deduplicator.wrap(json_data)
+            if not streaming:
+                print(f"✅ Duplicados: {deduplicator.kept} mantidos, {deduplicator.dropped} descartados")
+        return json_data, input_compression
     
-    def generate_bulk_insert_statement(self, json_data: List[Dict[str, Any]], show_progress: bool = True) -> str:
+    def convert_stream(self, input_stream: BinaryIO, output_stream: Optional[BinaryIO] = None,
+                       batch_size: int = 1000, show_progress: bool = True, streaming: bool = False,
+                       json_lines: bool = False, total_bytes: Optional[int] = None, workers: int = 1,
+                       delta_state: Optional['DeltaState'] = None, delta_deletes: bool = False,
+                       output_compression: Optional[str] = None,
+                       checkpoint: Optional['ConversionCheckpoint'] = None,
+                       validator: Optional[RecordValidator] = None, pipeline: bool = False,
+                       cache: Optional['ConversionCache'] = None,
+                       deduplicator: Optional[RecordDeduplicator] = None) -> 'ConversionSummary':
         """
-        Gera um único comando SQL INSERT com múltiplos VALUES usando apenas os campos definidos (versão otimizada).
+        Converte registros JSON lidos de um fluxo binário, gravando o SQL lote a lote no fluxo de saída.
+        
+        Base de convert_file e da linha de comando (stdin/stdout). Entradas comprimidas são
+        detectadas pelos bytes mágicos e descomprimidas em fluxo; a saída é comprimida com
+        output_compression. As exceções não são traduzidas e o estado delta, se informado,
+        é atualizado em memória mas não é salvo.
         
         Args:
-            json_data: Lista de dicionários representando os registros
+            input_stream: Fluxo binário com o JSON (array ou JSON Lines)
+            output_stream: Fluxo binário de saída (opcional; sem ele o SQL fica em summary.sql)
+            batch_size: Tamanho do lote
             show_progress: Se deve exibir barra de progresso
+            streaming: Se deve ler os registros incrementalmente, sem carregar a entrada inteira
+            json_lines: Se a entrada está em JSON Lines (ignorado no modo streaming, que detecta o formato)
+            total_bytes: Tamanho da entrada, usado na barra de progresso do modo streaming
+            workers: Número de processos para renderizar os lotes em paralelo
+            delta_state: Estado do modo delta (opcional)
+            delta_deletes: Se o modo delta deve gerar DELETE para registros ausentes
+            output_compression: Compressão da saída ('gzip', 'xz', 'bz2', 'zstd' ou None)
+            checkpoint: Checkpoint atualizado a cada lote (requer saída sem compressão, posicionada
+                        no fim do último lote registrado); os registros já convertidos são pulados
+            validator: Validação dos registros (opcional; sem checkpoint nem DELETE do modo delta)
+            pipeline: Se deve ler, renderizar e gravar ao mesmo tempo, em threads ligadas por filas
+                      limitadas (leitura/descompressão e gravação/compressão fora da thread principal)
+            cache: Cache dos comandos renderizados de cada lote (opcional; fora do modo delta)
+            deduplicator: Remoção de registros com chave repetida (opcional; sem checkpoint). Com
+                          latest_by em modo streaming, scan já deve ter sido feito (ver convert_file)
             
         Returns:
-            String com o comando SQL INSERT único com múltiplos VALUES
+            ConversionSummary com contagem de registros, lotes, linhas e bytes gravados
         """
-        if not json_data:
-            return "-- Nenhum dado para converter\n"
-        
-        # Usar StringIO para melhor performance em grandes volumes
-        output = StringIO()
-        
-        # Construir a parte dos campos
-        columns_str = ",\n  ".join(self.required_fields)
+        if validator is not None and (checkpoint is not None or delta_deletes):
+            # Rejeitados desalinhariam a retomada e seriam tratados como removidos no modo delta
+            raise ValueError("A validação não funciona com checkpoints nem com DELETE do modo delta")
+        if deduplicator is not None and checkpoint is not None:
+            raise ValueError("A remoção de duplicados não funciona com checkpoints")
+        skip_records = checkpoint.records if checkpoint is not None else 0
+        json_data, input_compression = self._read_records(input_stream, streaming, json_lines, total_bytes,
+                                                          skip_records, validator, deduplicator)
+        if pipeline and not isinstance(json_data, list):
+            json_data = _PrefetchedRecords(json_data)
         
-        # Escrever cabeçalho do INSERT
-        output.write(f"INSERT INTO {self.table_name} (\n  {columns_str}\n)\nVALUES\n")
+        if show_progress and (streaming or len(json_data) > 100):
+            print("🔄 Convertendo para SQL (com barra de progresso)...")
+        else:
+            print("🔄 Convertendo para SQL...")
         
-        # Processar registros em lotes para melhor performance
-        total_records = len(json_data)
+        summary = ConversionSummary(input_compression=input_compression, output_compression=output_compression)
+        if checkpoint is not None:
+            if output_compression or delta_state is not None or output_stream is None:
+                raise ValueError("Checkpoints exigem saída em arquivo, sem compressão e fora do modo delta")
+            if checkpoint.batches:
+                print(f"🔄 Retomando após o lote {checkpoint.batches} ({checkpoint.records} registros)...")
+            summary.records, summary.batches = checkpoint.records, checkpoint.batches
+            summary.lines, summary.bytes_written = checkpoint.lines, checkpoint.output_bytes
         
-        # Criar barra de progresso se solicitado e houver muitos registros
-        progress_bar = None
-        if show_progress and total_records > 100:
-            progress_bar = ProgressBar(total_records, "Convertendo registros")
+        if delta_state is not None:
+            chunks = self._iter_delta_chunks(json_data, delta_state, batch_size, show_progress, summary,
+                                             delta_deletes)
+        else:
+            # Na retomada, summary já traz os registros e lotes gravados anteriormente
+            chunks = self._iter_sql_chunks(json_data, batch_size, show_progress, summary, workers,
+                                           summary.records, summary.batches, cache)
         
-        for i, record in enumerate(json_data):
-            # Construir VALUES de forma otimizada
-            values = []
-            for col in self.required_fields:
-                values.append(self.format_sql_value(record.get(col)))
-            
-            values_str = ", ".join(values)
-            
-            if i == total_records - 1:  # Último registro
-                output.write(f"({values_str});")
-            else:
-                output.write(f"({values_str}),\n")
-            
-            # Atualizar progresso
-            if progress_bar:
-                progress_bar.update()
+        batch_hits = cache.batch_hits if cache is not None else 0
+        self._emit_chunks(chunks, output_stream, summary, output_compression, checkpoint, pipeline)
+        if cache is not None:
+            summary.cached_batches = cache.batch_hits - batch_hits
+            print(f"♻️  Cache: {summary.cached_batches} de {summary.batches} lotes reaproveitados")
         
-        # Finalizar progresso
-        if progress_bar:
-            progress_bar.finish()
+        if streaming:
+            print(f"✅ Registros lidos: {summary.records}")
+        if summary.batch_sizes:
+            sizes = summary.batch_sizes
+            print(f"📐 Lotes de {sizes['min']} a {sizes['max']} registros (média {sizes['media']}); "
+                  f"para fixar em execuções futuras: --batch-size {sizes['sugerido']}")
+        if validator is not None:
+            summary.rejected = validator.rejected
+            if validator.rejected:
+                print(f"⚠️  {validator.rejected} registros rejeitados pela validação")
+        if deduplicator is not None:
+            summary.duplicates = deduplicator.dropped
+            if deduplicator.dropped:
+                print(f"⚠️  {deduplicator.dropped} registros duplicados descartados "
+                      f"(chave {deduplicator.options.key})")
         
-        return output.getvalue()
+        return summary
 
-    def convert_json_to_sql(self, json_data: List[Dict[str, Any]], batch_size: int = 1000, show_progress: bool = True) -> str:
+    def _emit_chunks(self, chunks: Iterable[str], output_stream: Optional[BinaryIO], summary: 'ConversionSummary',
+                     output_compression: Optional[str] = None, checkpoint: Optional['ConversionCheckpoint'] = None,
+                     pipeline: bool = False):
         """
-        Converte uma lista de dicionários em comandos SQL INSERT otimizados.
-        Para grandes volumes, divide em lotes menores para melhor compatibilidade.
+        Grava as partes do script no fluxo de saída (comprimido, se pedido) ou, sem fluxo,
+        guarda o script em summary.sql. Com pipeline, a gravação roda em uma thread própria.
+        """
+        if output_stream is None:
+            summary.sql = "".join(chunks)
+            summary.lines = summary.sql.count('\n') + 1
+            return
+        # O compressor é fechado (finalizando o fluxo comprimido) sem fechar output_stream
+        compressed = wrap_compressed(output_stream, output_compression, 'wb')
+        if pipeline:
+            writer = _BackgroundWriter(compressed)
+            try:
+                self._write_chunks(chunks, writer, summary, checkpoint)
+            finally:
+                # Em caso de erro, encerra já o estágio de leitura em vez de esperar a coleta de lixo
+                if hasattr(chunks, 'close'):
+                    chunks.close()
+                writer.close()
+        else:
+            self._write_chunks(chunks, compressed, summary, checkpoint)
+        if compressed is not output_stream:
+            compressed.close()
+
+    def convert_file(self, input_file: str, output_file: str = None, batch_size: int = 1000, show_progress: bool = True,
+                     streaming: bool = False, write_buffer_size: int = DEFAULT_WRITE_BUFFER_SIZE,
+                     workers: int = 1, delta_state_file: Optional[str] = None, delta_key: str = 'codigo_cnes',
+                     delta_deletes: bool = False, compression: Optional[str] = 'auto',
+                     checkpoint: bool = False, resume: bool = False,
+                     sharding: Optional[ShardingOptions] = None,
+                     rejects_file: Optional[str] = None, pipeline: bool = False,
+                     cache: Optional['ConversionCache'] = None, dedup: Optional[DedupOptions] = None,
+                     duplicates_file: Optional[str] = None) -> 'ConversionSummary':
+        """
+        Lê um arquivo JSON e converte para SQL, gravando o resultado lote a lote no arquivo de saída.
+        
+        Arquivos .jsonl/.ndjson são lidos como JSON Lines (um objeto por linha). Entradas
+        comprimidas (gzip, xz, bz2, zstd) são detectadas pelos bytes mágicos e lidas em fluxo.
+        Com delta_state_file, apenas as diferenças em relação à execução anterior são geradas
+        e o estado é atualizado ao final.
+        
+        Com checkpoint, o progresso é registrado em <saida>.ckpt.json a cada lote; com resume,
+        uma conversão interrompida continua do último lote registrado (mesma entrada e mesmas
+        configurações). O checkpoint é removido quando a conversão termina.
+        
+        Com sharding, a saída é dividida em partes independentes com um manifesto (ver write_shards).
+        
+        Com um esquema de validação (schema no construtor), registros inválidos são corrigidos
+        quando possível ou gravados em rejects_file (padrão: <saida>.rejects.jsonl) com os
+        motivos, e a conversão continua com os demais.
+        
+        Com cache, uma reexecução com a mesma entrada e as mesmas configurações copia a saída
+        guardada, e uma entrada parcialmente alterada só renderiza os lotes que mudaram (ver
+        ConversionCache). Requer arquivo de saída, sem checkpoints, modo delta, divisão em
+        partes nem validação.
+        
+        Com dedup, registros com chave repetida são descartados antes da conversão e gravados
+        em duplicates_file (padrão: <saida>.duplicates.jsonl). Com latest_by em modo streaming,
+        a entrada é lida duas vezes (ver DedupOptions).
         
         Args:
-            json_data: Lista de dicionários representando os registros
-            batch_size: Tamanho do lote (padrão: 1000 registros por INSERT)
+            input_file: Caminho do arquivo JSON de entrada
+            output_file: Caminho do arquivo SQL de saída (opcional; sem ele o SQL fica em summary.sql)
+            batch_size: Tamanho do lote para grandes arquivos (padrão: 1000)
             show_progress: Se deve exibir barra de progresso
+            streaming: Se deve ler os registros incrementalmente, sem carregar o arquivo inteiro
+            write_buffer_size: Tamanho do buffer de escrita do arquivo de saída, em bytes
+            workers: Número de processos para renderizar os lotes em paralelo (padrão: 1)
+            delta_state_file: Arquivo de estado do modo delta (opcional; criado na primeira execução)
+            delta_key: Coluna chave do modo delta (padrão: codigo_cnes)
+            delta_deletes: Se o modo delta deve gerar DELETE para registros ausentes
+            compression: Compressão da saída: 'auto' (pela extensão: .gz, .xz, .bz2, .zst),
+                         None, 'gzip', 'xz', 'bz2' ou 'zstd'
+            checkpoint: Se deve registrar checkpoints a cada lote (sem compressão nem modo delta)
+            resume: Se deve retomar a partir do checkpoint existente (implica checkpoint)
+            sharding: Divisão da saída em partes (opcional; sem checkpoint nem modo delta)
+            rejects_file: Arquivo JSON Lines dos registros rejeitados pela validação
+            pipeline: Se deve ler, renderizar e gravar ao mesmo tempo (ver convert_stream)
+            cache: Cache de conversões em disco (opcional)
+            dedup: Remoção de registros duplicados (opcional; sem checkpoints)
+            duplicates_file: Arquivo JSON Lines dos registros duplicados descartados
             
         Returns:
-            String com os comandos SQL INSERT
+            ConversionSummary com contagem de registros, lotes, linhas e bytes gravados
         """
-        if not json_data:
-            return "-- Nenhum dado para converter\n"
+        validator = None
+        deduplicator = None
+        try:
+            if compression == 'auto':
+                compression = detect_compression(output_file) if output_file else None
+            check_compression(compression)
             
-        total_records = len(json_data)
+            if self.schema is not None:
+                if checkpoint or resume or delta_deletes:
+                    raise ValueError("A validação não funciona com checkpoints nem com DELETE do modo delta")
+                if rejects_file is None and output_file:
+                    rejects_file = os.path.splitext(strip_compression_extension(output_file))[0] + '.rejects.jsonl'
+                rejects = open(rejects_file, 'w', encoding='utf-8') if rejects_file else None
+                validator = RecordValidator(self.schema, rejects, self._format_date_fast)
+            
+            # Formatos como o TSV do LOAD DATA precisam de um script de carga separado,
+            # que o banco não consegue executar sobre um arquivo comprimido
+            load_script = None
+            if output_file:
+                load_script = self.dialect.load_script(self.table_name, self.required_fields,
+                                                       os.path.abspath(output_file))
+                if load_script and compression:
+                    raise ValueError(f"O dialeto {self.dialect.name} não suporta saída comprimida")
+            
+            delta_state = DeltaState.load(delta_state_file, delta_key) if delta_state_file else None
+            
+            is_json_lines = strip_compression_extension(input_file).lower().endswith(JSON_LINES_EXTENSIONS)
+            
+            if cache is not None and (not output_file or checkpoint or resume or delta_state is not None
+                                      or sharding is not None or validator is not None):
+                raise ValueError("O cache exige arquivo de saída e não funciona com checkpoints, "
+                                 "modo delta, divisão em partes ou validação")
+            
+            if dedup is not None:
+                if checkpoint or resume or cache is not None:
+                    raise ValueError("A remoção de duplicados não funciona com checkpoints nem com cache")
+                if duplicates_file is None and output_file:
+                    duplicates_file = (os.path.splitext(strip_compression_extension(output_file))[0]
+                                       + '.duplicates.jsonl')
+                duplicates = open(duplicates_file, 'w', encoding='utf-8') if duplicates_file else None
+                deduplicator = RecordDeduplicator(dedup, duplicates, self._format_date_fast)
+                if streaming and dedup.latest_by is not None:
+                    self._scan_duplicates(deduplicator, input_file, is_json_lines)
+            
+            if sharding is not None:
+                if not output_file or delta_state is not None or checkpoint or resume:
+                    raise ValueError("A divisão em partes exige arquivo de saída e não funciona com "
+                                     "checkpoints ou modo delta")
+                with open(input_file, 'rb') as f:
+                    json_data, input_compression = self._read_records(f, streaming, is_json_lines,
+                                                                      os.path.getsize(input_file),
+                                                                      validator=validator,
+                                                                      deduplicator=deduplicator)
+                    if pipeline and not isinstance(json_data, list):
+                        json_data = _PrefetchedRecords(json_data)
+                    print("🔄 Convertendo para SQL em partes...")
+                    summary = self.write_shards(json_data, output_file, sharding, batch_size, show_progress, workers,
+                                                compression, write_buffer_size)
+                summary.input_compression = input_compression
+                if validator is not None:
+                    summary.rejected, summary.rejects_file = validator.rejected, rejects_file
+                if deduplicator is not None:
+                    summary.duplicates, summary.duplicates_file = deduplicator.dropped, duplicates_file
+                print(f"✅ {len(summary.shard_files)} partes salvas; manifesto em: {summary.manifest_file}")
+                return summary
+            
+            progress_checkpoint = None
+            if checkpoint or resume:
+                if not output_file or compression or delta_state is not None:
+                    raise ValueError("Checkpoints exigem saída em arquivo, sem compressão e fora do modo delta")
+                progress_checkpoint = self._open_checkpoint(input_file, output_file, batch_size, streaming, resume)
+            
+            cache_key = None
+            if cache is not None:
+                cache_key = cache.key('saida', _sha256_file(input_file), self._cache_settings(), batch_size,
+                                      streaming, is_json_lines, compression,
+                                      vars(self.batch_sizing) if self.batch_sizing else None)
+                cached = cache.get_output(cache_key)
+                if cached is not None:
+                    # Reexecução idêntica: a saída guardada é copiada, sem ler a entrada
+                    cached_file, meta = cached
+                    shutil.copyfile(cached_file, output_file)
+                    summary = ConversionSummary(**meta, output_file=output_file, from_cache=True)
+                    print(f"♻️  Saída idêntica encontrada no cache; copiada para: {output_file}")
+                    if load_script:
+                        summary.load_script_file = os.path.splitext(output_file)[0] + '.load.sql'
+                        with open(summary.load_script_file, 'w', encoding='utf-8') as script_file:
+                            script_file.write(load_script)
+                        print(f"✅ Script de carga salvo em: {summary.load_script_file}")
+                    cache.evict()
+                    return summary
+            
+            with open(input_file, 'rb') as f:
+                stream_options = dict(batch_size=batch_size, show_progress=show_progress, streaming=streaming,
+                                      json_lines=is_json_lines, total_bytes=os.path.getsize(input_file),
+                                      workers=workers, delta_state=delta_state, delta_deletes=delta_deletes,
+                                      output_compression=compression, checkpoint=progress_checkpoint,
+                                      validator=validator, pipeline=pipeline, cache=cache,
+                                      deduplicator=deduplicator)
+                
+                if output_file:
+                    # Cada lote é gravado assim que renderizado, com buffer de escrita grande;
+                    # na retomada, a saída é truncada no fim do último lote registrado
+                    if progress_checkpoint is not None and progress_checkpoint.batches:
+                        out = open(output_file, 'r+b', buffering=write_buffer_size)
+                        out.truncate(progress_checkpoint.output_bytes)
+                        out.seek(progress_checkpoint.output_bytes)
+                    else:
+                        out = open(output_file, 'wb', buffering=write_buffer_size)
+                    with out:
+                        summary = self.convert_stream(f, out, **stream_options)
+                    if progress_checkpoint is not None:
+                        progress_checkpoint.remove()
+                    summary.output_file = output_file
+                    print(f"✅ Arquivo SQL salvo em: {output_file}")
+                    if cache is not None:
+                        cache.put_output(cache_key, output_file, {
+                            'records': summary.records, 'batches': summary.batches, 'lines': summary.lines,
+                            'bytes_written': summary.bytes_written, 'input_compression': summary.input_compression,
+                            'output_compression': summary.output_compression, 'batch_sizes': summary.batch_sizes,
+                        })
+                        cache.evict()
+                    
+                    if load_script:
+                        summary.load_script_file = os.path.splitext(output_file)[0] + '.load.sql'
+                        with open(summary.load_script_file, 'w', encoding='utf-8') as script_file:
+                            script_file.write(load_script)
+                        print(f"✅ Script de carga salvo em: {summary.load_script_file}")
+                else:
+                    summary = self.convert_stream(f, None, **stream_options)
+            
+            if validator is not None:
+                summary.rejects_file = rejects_file
+                if summary.rejected and rejects_file:
+                    print(f"⚠️  Registros rejeitados salvos em: {rejects_file}")
+            if deduplicator is not None:
+                summary.duplicates_file = duplicates_file
+                if summary.duplicates and duplicates_file:
+                    print(f"⚠️  Registros duplicados salvos em: {duplicates_file}")
+            
+            # O estado só é atualizado depois que a saída foi gerada por completo
+            if delta_state is not None:
+                delta_state.save(delta_state_file)
+                print(f"✅ Delta: {summary.inserted} novos, {summary.updated} alterados, "
+                      f"{summary.deleted} removidos, {summary.unchanged} inalterados")
+            
+            return summary
+            
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Arquivo não encontrado: {input_file}")
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Erro ao decodificar JSON: {e}")
+        except Exception as e:
+            raise Exception(f"Erro inesperado: {e}")
+        finally:
+            if validator is not None and validator.rejects is not None:
+                validator.rejects.close()
+            if deduplicator is not None:
+                deduplicator.close()
+                if deduplicator.report is not None:
+                    deduplicator.report.close()
+    
+    def _scan_duplicates(self, deduplicator: RecordDeduplicator, input_file: str, json_lines: bool):
+        """
+        Primeira leitura do arquivo em modo streaming com latest_by: só encontra o registro
+        mantido de cada chave. Os rejeitados pela validação são ignorados aqui (e registrados
+        na segunda leitura), para que as posições das duas leituras coincidam.
+        """
+        options = deduplicator.options
+        print(f"🔍 Procurando o registro mais recente de cada {options.key} por {options.latest_by}...")
+        validator = RecordValidator(self.schema, None, self._format_date_fast) if self.schema else None
+        with open(input_file, 'rb') as f:
+            records, _ = self._read_records(f, True, json_lines, os.path.getsize(input_file), validator=validator)
+            deduplicator.scan(records)
+    
+    async def convert_file_async(self, input_file: str, output_file: Optional[str] = None,
+                                 **options) -> 'ConversionSummary':
+        """
+        Versão aguardável de convert_file, para serviços que rodam em um loop asyncio.
         
-        # Para arquivos pequenos (menos de 1000 registros), usar método single
-        if total_records <= batch_size:
-            return self.convert_json_to_bulk_sql(json_data, show_progress)
+        A conversão roda em uma thread do executor padrão do loop, sem bloqueá-lo, e usa o
+        pipeline por padrão. Aceita as mesmas opções de convert_file.
+        """
+        options.setdefault('pipeline', True)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.convert_file, input_file, output_file,
+                                                                  **options))
+    
+    async def convert_records_async(self, records: Any, output_stream: Optional[BinaryIO] = None,
+                                    batch_size: int = 1000, workers: int = 1,
+                                    output_compression: Optional[str] = None) -> 'ConversionSummary':
+        """
+        Converte registros vindos de um iterável assíncrono (ex.: páginas de uma API), aguardável.
         
-        # Para arquivos grandes, dividir em lotes
-        output = StringIO()
+        O loop só coleta os registros e os entrega por uma fila limitada à conversão, que roda
+        em uma thread do executor com gravação em outra thread; quando a fila enche, a coleta
+        espera (sem bloquear o loop). A saída segue o formato streaming (totais ao final).
         
-        # Adicionar comentário inicial
-        output.write("-- Comandos SQL INSERT gerados automaticamente (modo lotes)\n")
-        output.write(f"-- Tabela: {self.table_name}\n")
-        output.write(f"-- Total de registros: {total_records}\n")
-        output.write(f"-- Tamanho do lote: {batch_size}\n")
-        output.write(f"-- Número de lotes: {(total_records + batch_size - 1) // batch_size}\n")
-        output.write("\n")
+        Args:
+            records: Iterável assíncrono (async for) ou comum de dicionários
+            output_stream: Fluxo binário de saída (opcional; sem ele o SQL fica em summary.sql)
+            batch_size: Tamanho do lote
+            workers: Número de processos de renderização
+            output_compression: Compressão da saída ('gzip', 'xz', 'bz2', 'zstd' ou None)
+            
+        Returns:
+            ConversionSummary com contagem de registros, lotes, linhas e bytes gravados
+        """
+        check_compression(output_compression)
+        loop = asyncio.get_running_loop()
+        blocks = queue.Queue(PIPELINE_QUEUE_SIZE)
         
-        # Calcular número de lotes
-        num_batches = (total_records + batch_size - 1) // batch_size
+        def queued_records():
+            while True:
+                block = blocks.get()
+                if block is None:
+                    return
+                yield from block
         
-        # Criar barra de progresso para lotes se solicitado
-        batch_progress = None
-        if show_progress:
-            batch_progress = ProgressBar(num_batches, "Processando lotes")
+        def convert():
+            summary = ConversionSummary(output_compression=output_compression)
+            # Um gerador comum tem tamanho desconhecido: saída no formato streaming
+            chunks = self._iter_sql_chunks(queued_records(), batch_size, False, summary, workers)
+            self._emit_chunks(chunks, output_stream, summary, output_compression, pipeline=True)
+            return summary
         
-        # Processar em lotes
-        for i in range(0, total_records, batch_size):
-            batch = json_data[i:i + batch_size]
-            batch_num = (i // batch_size) + 1
-            
-            output.write(f"-- Lote {batch_num}\n")
-            # Não mostrar progresso individual para cada lote (evita spam)
-            output.write(self.generate_bulk_insert_statement(batch, show_progress=False))
-            output.write("\n\n")
-            
-            # Atualizar progresso do lote
-            if batch_progress:
-                batch_progress.update()
+        conversion = loop.run_in_executor(None, convert)
         
-        # Finalizar progresso
-        if batch_progress:
-            batch_progress.finish()
+        async def put(block):
+            while True:
+                try:
+                    blocks.put_nowait(block)
+                    return
+                except queue.Full:
+                    if conversion.done():
+                        # A conversão falhou: o erro é levantado ao aguardá-la
+                        return
+                    await asyncio.sleep(0.005)
         
-        return output.getvalue()
+        try:
+            block = []
+            if hasattr(records, '__aiter__'):
+                async for record in records:
+                    block.append(record)
+                    if len(block) >= PIPELINE_READ_BLOCK:
+                        await put(block)
+                        block = []
+            else:
+                for record in records:
+                    block.append(record)
+                    if len(block) >= PIPELINE_READ_BLOCK:
+                        await put(block)
+                        block = []
+            if block:
+                await put(block)
+        finally:
+            # Encerrar a conversão também quando a coleta falha ou é cancelada
+            await put(None)
+        return await conversion
+
+class MultiTableConverter:
+    """
+    Converte uma única leitura da entrada em várias tabelas, conforme um mapeamento (ver load_mapping).
     
-    def convert_json_to_bulk_sql(self, json_data: List[Dict[str, Any]], show_progress: bool = True) -> str:
+    Cada registro de origem é projetado em todas as tabelas na mesma passada; cada tabela
+    tem seu próprio conversor (colunas, tipos e chave de UPSERT) e seu próprio arquivo de saída.
+    """
+    def __init__(self, tables: List[TableMapping], dialect: Union[str, SQLDialect] = 'standard',
+                 upsert: bool = False, engine: str = 'rows', value_cache_size: int = 0,
+                 schema: Optional[Union[Dict[str, ColumnRule], str]] = None,
+                 column_types: Optional[Union[Dict[str, str], str]] = None, strict_dates: bool = False,
+                 collect_metrics: bool = False):
         """
-        Converte uma lista de dicionários em um único comando SQL INSERT com múltiplos VALUES (versão otimizada).
+        Args:
+            tables: Tabelas de destino (ver load_mapping)
+            dialect: Dialeto/motor de saída (nome em DIALECTS ou instância de SQLDialect)
+            upsert: Se deve gerar UPSERT/MERGE (pela upsert_key de cada tabela)
+            engine: Motor de formatação dos lotes (ver ENGINES)
+            value_cache_size: Tamanho máximo do cache de literais por coluna (0 = desativado)
+            schema: Esquema de validação aplicado aos registros de origem, antes da projeção
+            column_types: Tipos das tabelas sem column_types no mapeamento ({coluna: tipo} ou 'infer')
+            strict_dates: Se apenas as colunas do tipo 'date' devem ser normalizadas como datas
+            collect_metrics: Se deve coletar métricas da leitura e de cada tabela (ver metrics_to_dict)
+        """
+        self.tables = tables
+        self.converters = [JSONToSQLConverter(table.name, column_types=table.column_types or column_types,
+                                              value_cache_size=value_cache_size, dialect=dialect, upsert=upsert,
+                                              upsert_key=table.upsert_key, engine=engine, fields=table.columns,
+                                              strict_dates=strict_dates, collect_metrics=collect_metrics)
+                           for table in tables]
+        # Leitura e validação da entrada, compartilhadas por todas as tabelas
+        self.reader = JSONToSQLConverter(dialect=dialect, schema=schema, collect_metrics=collect_metrics)
+        self.dialect = self.reader.dialect
+    
+    def metrics_to_dict(self) -> Optional[Dict[str, Any]]:
+        """
+        Métricas da leitura da entrada e de cada tabela (None sem collect_metrics).
+        """
+        if self.reader.metrics is None:
+            return None
+        return {
+            'entrada': self.reader.metrics.to_dict(),
+            'tabelas': {table.name: converter.metrics.to_dict()
+                        for table, converter in zip(self.tables, self.converters)},
+        }
+    
+    def output_paths(self, output_dir: str, compression: Optional[str] = None) -> List[str]:
+        """
+        Caminhos de saída de cada tabela: <output_dir>/<tabela><extensão do dialeto>, ou o
+        "output" declarado no mapeamento (comprimido conforme a própria extensão).
+        """
+        extension = self.dialect.file_extension
+        if compression:
+            extension += {name: ext for ext, name in COMPRESSION_EXTENSIONS.items()}[compression]
+        paths = [os.path.join(output_dir, table.output or table.name + extension) for table in self.tables]
+        if len(set(paths)) != len(paths):
+            raise ValueError("Duas tabelas do mapeamento gravariam no mesmo arquivo")
+        return paths
+    
+    def convert_records(self, json_data: Iterable[Dict[str, Any]], output_dir: str, batch_size: int = 1000,
+                        show_progress: bool = True, compression: Optional[str] = None,
+                        write_buffer_size: int = DEFAULT_WRITE_BUFFER_SIZE) -> Dict[str, 'ConversionSummary']:
+        """
+        Projeta cada registro em todas as tabelas e grava os lotes de cada uma assim que completos.
+        
+        Cada arquivo é um script completo no formato streaming (cabeçalho, lotes numerados e
+        totais ao final).
         
         Args:
-            json_data: Lista de dicionários representando os registros
+            json_data: Lista (ou iterável) de dicionários representando os registros de origem
+            output_dir: Diretório de saída
+            batch_size: Tamanho do lote de cada tabela
             show_progress: Se deve exibir barra de progresso
+            compression: Compressão das saídas ('gzip', 'xz', 'bz2', 'zstd' ou None)
+            write_buffer_size: Tamanho do buffer de escrita de cada arquivo, em bytes
             
         Returns:
-            String com o comando SQL INSERT único
+            {tabela: ConversionSummary}
         """
-        if not json_data:
-            return "-- Nenhum dado para converter\n"
+        check_compression(compression)
+        dialect = self.dialect
+        paths = self.output_paths(output_dir, compression)
+        compressions = [compression or detect_compression(path) for path in paths]
+        for table_compression in compressions:
+            check_compression(table_compression)
+        load_scripts = [converter.dialect.load_script(table.name, table.columns, os.path.abspath(path))
+                        for table, converter, path in zip(self.tables, self.converters, paths)]
+        if any(load_script and table_compression for load_script, table_compression in zip(load_scripts, compressions)):
+            raise ValueError(f"O dialeto {dialect.name} não suporta saída comprimida")
         
-        # Usar StringIO para melhor performance
-        output = StringIO()
         
-        # Adicionar comentário inicial
-        output.write("-- Comandos SQL INSERT gerados automaticamente\n")
-        output.write(f"-- Tabela: {self.table_name}\n")
-        output.write(f"-- Total de registros: {len(json_data)}\n")
-        output.write("\n")
+        projections = [table.compile_projection() for table in self.tables]
+        buffers = [[] for _ in self.tables]
+        writers = []
         
-        # Gerar INSERT único com múltiplos VALUES
-        output.write(self.generate_bulk_insert_statement(json_data, show_progress))
+        def flush(index: int, minimum: int):
+            # Grava lotes completos (ou o resto, com minimum=1) da tabela index
+            converter = self.converters[index]
+            writer = writers[index]
+            while len(buffers[index]) >= minimum:
+                batch, buffers[index] = buffers[index][:batch_size], buffers[index][batch_size:]
+                statement = converter.generate_bulk_insert_statement(batch, show_progress=False)
+                writer.records += len(batch)
+                writer.batches += 1
+                writer.write(dialect.comment(f"Lote {writer.batches}") + statement + dialect.batch_separator)
         
-        return output.getvalue()
-
-    def convert_file(self, input_file: str, output_file: str = None, batch_size: int = 1000, show_progress: bool = True) -> str:
+        progress = self.reader._progress("Distribuindo registros", json_data) if show_progress else None
+        try:
+            for table, converter, path, table_compression in zip(self.tables, self.converters, paths, compressions):
+                writer = _ShardWriter(path, table_compression, write_buffer_size)
+                writers.append(writer)
+                writer.write(converter._script_header([
+                    f"{dialect.script_title} (modo lotes, streaming)",
+                    f"Tabela: {table.name}",
+                    f"Tamanho do lote: {batch_size}",
+                ]))
+            
+            targets = list(enumerate(projections))
+            for record in json_data:
+                for index, project in targets:
+                    rows = project(record)
+                    if rows:
+                        buffer = buffers[index]
+                        buffer.extend(rows)
+                        if len(buffer) >= batch_size:
+                            flush(index, batch_size)
+                if progress:
+                    progress.records += 1
+            
+            for index, (converter, writer) in enumerate(zip(self.converters, writers)):
+                flush(index, 1)
+                writer.write(converter._streaming_trailer(writer.records, writer.batches))
+            if progress:
+                progress.finish()
+        finally:
+            for writer in writers:
+                writer.close()
+            if progress:
+                progress.close()
+        
+        summaries = {}
+        for table, converter, writer, load_script, table_compression in zip(self.tables, self.converters, writers,
+                                                                          load_scripts, compressions):
+            if converter.metrics is not None:
+                converter.metrics.bytes_emitted += writer.bytes_written
+            summary = ConversionSummary(records=writer.records, batches=writer.batches, lines=writer.lines,
+                                        bytes_written=writer.bytes_written, output_file=writer.path,
+                                        output_compression=table_compression)
+            if load_script:
+                summary.load_script_file = os.path.splitext(writer.path)[0] + '.load.sql'
+                with open(summary.load_script_file, 'w', encoding='utf-8') as f:
+                    f.write(load_script)
+            summaries[table.name] = summary
+        return summaries
+    
+    def convert_stream(self, input_stream: BinaryIO, output_dir: str, batch_size: int = 1000,
+                       show_progress: bool = True, streaming: bool = False, json_lines: bool = False,
+                       total_bytes: Optional[int] = None, compression: Optional[str] = None,
+                       write_buffer_size: int = DEFAULT_WRITE_BUFFER_SIZE,
+                       rejects: Optional[Any] = None) -> Dict[str, 'ConversionSummary']:
         """
-        Lê um arquivo JSON e converte para SQL, salvando em arquivo ou retornando string (versão otimizada).
+        Lê os registros de um fluxo binário (comprimido ou não) e os distribui entre as tabelas.
         
         Args:
-            input_file: Caminho do arquivo JSON de entrada
-            output_file: Caminho do arquivo SQL de saída (opcional)
-            batch_size: Tamanho do lote para grandes arquivos (padrão: 1000)
+            input_stream: Fluxo binário com o JSON (array ou JSON Lines)
+            output_dir: Diretório de saída
+            batch_size: Tamanho do lote de cada tabela
             show_progress: Se deve exibir barra de progresso
+            streaming: Se deve ler os registros incrementalmente
+            json_lines: Se a entrada está em JSON Lines (modo não streaming)
+            total_bytes: Tamanho da entrada, usado na barra de progresso do modo streaming
+            compression: Compressão das saídas
+            write_buffer_size: Tamanho do buffer de escrita de cada arquivo, em bytes
+            rejects: Arquivo de texto aberto para os registros rejeitados pela validação (opcional)
             
         Returns:
-            String com os comandos SQL gerados
+            {tabela: ConversionSummary}; com validação, o total de rejeitados vai em cada resumo
         """
-        try:
-            print("🔄 Carregando arquivo JSON...")
+        check_compression(compression)
+        validator = None
+        if self.reader.schema is not None:
+            validator = RecordValidator(self.reader.schema, rejects, self.reader._format_date_fast)
+        json_data, input_compression = self.reader._read_records(input_stream, streaming, json_lines, total_bytes,
+                                                                 validator=validator)
+        print(f"🔄 Convertendo para {len(self.tables)} tabelas...")
+        summaries = self.convert_records(json_data, output_dir, batch_size, show_progress, compression,
+                                         write_buffer_size)
+        for summary in summaries.values():
+            summary.input_compression = input_compression
+            if validator is not None:
+                summary.rejected = validator.rejected
+        if validator is not None and validator.rejected:
+            print(f"⚠️  {validator.rejected} registros rejeitados pela validação")
+        return summaries
+    
+    def convert_file(self, input_file: str, output_dir: Optional[str] = None, batch_size: int = 1000,
+                     show_progress: bool = True, streaming: bool = False, compression: Optional[str] = None,
+                     write_buffer_size: int = DEFAULT_WRITE_BUFFER_SIZE,
+                     rejects_file: Optional[str] = None) -> Dict[str, 'ConversionSummary']:
+        """
+        Lê um arquivo JSON uma única vez e gera um arquivo SQL por tabela do mapeamento.
+        
+        Args:
+            input_file: Caminho do arquivo JSON de entrada (comprimido ou não)
+            output_dir: Diretório de saída (padrão: o diretório da entrada)
+            batch_size: Tamanho do lote de cada tabela
+            show_progress: Se deve exibir barra de progresso
+            streaming: Se deve ler os registros incrementalmente
+            compression: Compressão das saídas ('gzip', 'xz', 'bz2', 'zstd' ou None)
+            write_buffer_size: Tamanho do buffer de escrita de cada arquivo, em bytes
+            rejects_file: Arquivo dos rejeitados pela validação (padrão: <output_dir>/<entrada>.rejects.jsonl)
             
-            # Ler arquivo JSON com buffer otimizado
-            with open(input_file, 'r', encoding='utf-8', buffering=8192) as f:
-                json_data = json.load(f)
+        Returns:
+            {tabela: ConversionSummary}
+        """
+        if output_dir is None:
+            output_dir = os.path.dirname(os.path.abspath(input_file))
+        os.makedirs(output_dir, exist_ok=True)
+        is_json_lines = strip_compression_extension(input_file).lower().endswith(JSON_LINES_EXTENSIONS)
+        with contextlib.ExitStack() as stack:
+            rejects = None
+            if self.reader.schema is not None:
+                if rejects_file is None:
+                    base = os.path.splitext(os.path.basename(strip_compression_extension(input_file)))[0]
+                    rejects_file = os.path.join(output_dir, base + '.rejects.jsonl')
+                rejects = stack.enter_context(open(rejects_file, 'w', encoding='utf-8'))
+            f = stack.enter_context(open(input_file, 'rb'))
+            summaries = self.convert_stream(f, output_dir, batch_size, show_progress, streaming, is_json_lines,
+                                            os.path.getsize(input_file), compression, write_buffer_size, rejects)
+        for name, summary in summaries.items():
+            summary.rejects_file = rejects_file
+            print(f"✅ {name}: {summary.records} registros em {summary.output_file}")
+        return summaries
+
+def default_output_path(input_file: str, dialect_name: str = 'standard', compression: Optional[str] = None) -> str:
+    """
+    Gera o nome padrão do arquivo de saída a partir do arquivo de entrada, do dialeto e da compressão.
+    """
+    base = strip_compression_extension(input_file)
+    if base.lower().endswith('.json'):
+        base = base[:-5]
+    output_file = base + '_insert' + DIALECTS[dialect_name].file_extension
+    if compression:
+        output_file += {name: ext for ext, name in COMPRESSION_EXTENSIONS.items()}[compression]
+    return output_file
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """
+    Cria o parser de argumentos da linha de comando não interativa.
+    """
+    parser = argparse.ArgumentParser(
+        prog='sql_script_automator',
+        description='Converte arquivos JSON de unidades de saúde em scripts SQL. '
+                    'Sem argumentos, executa o assistente interativo.')
+    parser.add_argument('input', nargs='?',
+                        help="arquivo JSON ou JSON Lines de entrada ('-' para stdin)")
+    parser.add_argument('-o', '--output',
+                        help="arquivo de saída ('-' para stdout; padrão: <entrada>_insert.sql, "
+                             "ou stdout quando a entrada é stdin)")
+    parser.add_argument('-t', '--table', default='unidade_saude',
+                        help='nome da tabela de destino (padrão: unidade_saude)')
+    parser.add_argument('-b', '--batch-size', type=int, default=1000,
+                        help='registros por lote (padrão: 1000)')
+    parser.add_argument('--max-batch-bytes', type=int, metavar='BYTES',
+                        help='dimensiona os lotes para que cada comando fique abaixo deste tamanho '
+                             '(ex: o max_allowed_packet do MySQL)')
+    parser.add_argument('--max-params', type=int, metavar='N',
+                        help='máximo de valores por comando (registros x colunas)')
+    parser.add_argument('--adaptive-batch', action='store_true',
+                        help='ajusta o tamanho dos lotes pela vazão medida (começando em --batch-size)')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='processos para renderizar os lotes em paralelo (padrão: 1)')
+    parser.add_argument('-d', '--dialect', default='standard', choices=sorted(DIALECTS),
+                        help='dialeto/motor de saída (padrão: standard)')
+    parser.add_argument('--streaming', action='store_true',
+                        help='lê os registros incrementalmente (sempre ativo para stdin)')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='lê, renderiza e grava ao mesmo tempo (threads ligadas por filas limitadas)')
+    parser.add_argument('--mapping', metavar='ARQUIVO',
+                        help='mapeamento de tabelas e colunas (.json, .toml, .yaml); gera um arquivo por '
+                             'tabela no diretório de -o (padrão: o da entrada)')
+    parser.add_argument('--column-types', metavar='ARQUIVO|infer',
+                        help="tipos das colunas: 'infer' ou arquivo JSON {coluna: tipo}")
+    parser.add_argument('--strict-dates', action='store_true',
+                        help="normaliza datas apenas nas colunas do tipo 'date' (com --column-types)")
+    parser.add_argument('--engine', default='rows', choices=ENGINES,
+                        help="motor de formatação: 'rows' (padrão) ou 'columnar' (valores distintos por coluna)")
+    parser.add_argument('--schema', metavar='ESQUEMA|ARQUIVO',
+                        help="valida e corrige os registros: 'cnes' ou arquivo JSON {coluna: regra}")
+    parser.add_argument('--rejects', metavar='ARQUIVO',
+                        help='arquivo JSON Lines dos registros rejeitados (padrão: <saida>.rejects.jsonl)')
+    parser.add_argument('--dedup-key', metavar='COLUNA',
+                        help='descarta registros com valor repetido nesta coluna (fica o primeiro)')
+    parser.add_argument('--keep-latest-by', metavar='CAMPO',
+                        help='com --dedup-key, mantém o registro com o maior valor deste campo '
+                             '(ex: data_atualizacao)')
+    parser.add_argument('--duplicates', metavar='ARQUIVO',
+                        help='arquivo JSON Lines dos registros duplicados (padrão: <saida>.duplicates.jsonl)')
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help='tamanho do cache de literais por coluna (padrão: 0 = desativado)')
+    parser.add_argument('--upsert', action='store_true',
+                        help='gera UPSERT/MERGE em vez de INSERT simples')
+    parser.add_argument('--upsert-key', default='codigo_cnes',
+                        help='coluna chave do UPSERT (padrão: codigo_cnes)')
+    parser.add_argument('--delta-state', metavar='ARQUIVO',
+                        help='arquivo de estado do modo delta (gera apenas as diferenças)')
+    parser.add_argument('--delta-key', default='codigo_cnes',
+                        help='coluna chave do modo delta (padrão: codigo_cnes)')
+    parser.add_argument('--delta-deletes', action='store_true',
+                        help='no modo delta, gera DELETE para registros ausentes')
+    parser.add_argument('--compression', default='auto', choices=('auto', 'none') + COMPRESSIONS,
+                        help='compressão da saída (padrão: auto, pela extensão do arquivo de saída; '
+                             'a entrada é detectada automaticamente)')
+    parser.add_argument('--write-buffer', type=int, default=DEFAULT_WRITE_BUFFER_SIZE,
+                        help=f'buffer de escrita em bytes (padrão: {DEFAULT_WRITE_BUFFER_SIZE})')
+    parser.add_argument('--shard-by', choices=SHARD_MODES,
+                        help='divide a saída em partes por registros, bytes ou hash da chave')
+    parser.add_argument('--shard-size', type=int,
+                        help=f'registros (rows) ou bytes (bytes) por parte (padrão: {DEFAULT_SHARD_ROWS} '
+                             f'registros ou {DEFAULT_SHARD_BYTES} bytes)')
+    parser.add_argument('--shards', type=int, default=4,
+                        help='quantidade de partes na divisão por hash (padrão: 4)')
+    parser.add_argument('--shard-key', default='codigo_cnes',
+                        help='coluna usada na divisão por hash (padrão: codigo_cnes)')
+    parser.add_argument('--checkpoint', action='store_true',
+                        help='registra o progresso em <saida>.ckpt.json a cada lote')
+    parser.add_argument('--resume', action='store_true',
+                        help='retoma uma conversão interrompida a partir do checkpoint (implica --checkpoint)')
+    parser.add_argument('--cache-dir', metavar='DIRETORIO',
+                        help='cache em disco das conversões: reexecuções idênticas copiam a saída e entradas '
+                             'parcialmente alteradas só renderizam os lotes que mudaram')
+    parser.add_argument('--cache-max-bytes', type=int, default=DEFAULT_CACHE_MAX_BYTES, metavar='BYTES',
+                        help=f'tamanho máximo do cache; as entradas usadas há mais tempo são removidas '
+                             f'(padrão: {DEFAULT_CACHE_MAX_BYTES})')
+    parser.add_argument('--metrics', metavar='ARQUIVO',
+                        help='coleta métricas de desempenho e grava em JSON ao final')
+    progress = parser.add_mutually_exclusive_group()
+    progress.add_argument('--progress', dest='progress', action='store_true', default=True,
+                          help='exibe a barra de progresso (padrão)')
+    progress.add_argument('--no-progress', dest='progress', action='store_false',
+                          help='não exibe a barra de progresso')
+    parser.add_argument('--progress-json', metavar='DESTINO',
+                        help="grava o progresso em JSON Lines: arquivo, fd:N ou '-' (stderr); sem esta "
+                             "opção, fora de um terminal o progresso não é exibido")
+    parser.add_argument('--progress-interval', type=float, metavar='SEGUNDOS',
+                        help='intervalo entre amostras de progresso (padrão: 0.2 na barra, 5 em JSON Lines)')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='suprime mensagens e barra de progresso')
+    parser.add_argument('--exemplo', action='store_true',
+                        help='executa o exemplo de demonstração')
+    parser.add_argument('--version', action='version', version=f'%(prog)s {__version__}')
+    return parser
+
+def _load_column_types(value: Optional[str]) -> Optional[Union[Dict[str, str], str]]:
+    """
+    Interpreta a opção --column-types: 'infer' ou caminho de um arquivo JSON.
+    """
+    if value is None or value == 'infer':
+        return value
+    with open(value, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _batch_sizing(args: argparse.Namespace) -> Optional[BatchSizing]:
+    """
+    Monta o BatchSizing das opções --max-batch-bytes, --max-params e --adaptive-batch (None sem elas).
+    """
+    if not (args.max_batch_bytes or args.max_params or args.adaptive_batch):
+        return None
+    return BatchSizing(args.max_batch_bytes, args.max_params, args.adaptive_batch)
+
+def _load_schema(value: Optional[str]) -> Optional[Union[Dict[str, ColumnRule], str]]:
+    """
+    Interpreta a opção --schema: nome em SCHEMAS ou caminho de um arquivo JSON {coluna: regra}.
+    """
+    if value is None or value in SCHEMAS:
+        return value
+    with open(value, 'r', encoding='utf-8') as f:
+        return {col: ColumnRule.from_dict(rule) for col, rule in json.load(f).items()}
+
+def _run_mapping(args: argparse.Namespace, compression: Optional[str], show_progress: bool,
+                 progress_output: Optional[Any] = None) -> int:
+    """
+    Executa a conversão em várias tabelas (--mapping); -o indica o diretório de saída.
+    """
+    start_time = time.time()
+    converter = MultiTableConverter(load_mapping(args.mapping), dialect=args.dialect, upsert=args.upsert,
+                                    engine=args.engine, value_cache_size=args.cache_size,
+                                    schema=_load_schema(args.schema),
+                                    column_types=_load_column_types(args.column_types),
+                                    strict_dates=args.strict_dates, collect_metrics=bool(args.metrics))
+    converter.reader.progress_output = progress_output
+    converter.reader.progress_interval = args.progress_interval
+    if args.input == '-':
+        output_dir = args.output or '.'
+        os.makedirs(output_dir, exist_ok=True)
+        with contextlib.ExitStack() as stack:
+            rejects = None
+            if converter.reader.schema is not None:
+                rejects = stack.enter_context(open(args.rejects or os.path.join(output_dir, 'stdin.rejects.jsonl'),
+                                                   'w', encoding='utf-8'))
+            summaries = converter.convert_stream(sys.stdin.buffer, output_dir, args.batch_size, show_progress,
+                                                 streaming=True, compression=compression,
+                                                 write_buffer_size=args.write_buffer, rejects=rejects)
+    else:
+        summaries = converter.convert_file(args.input, args.output, args.batch_size, show_progress, args.streaming,
+                                           compression, args.write_buffer, args.rejects)
+    if args.metrics:
+        with open(args.metrics, 'w', encoding='utf-8') as f:
+            json.dump(converter.metrics_to_dict(), f, ensure_ascii=False, indent=2)
+        print(f"✅ Métricas salvas em: {args.metrics}")
+    processing_time = time.time() - start_time
+    print(f"✅ {len(summaries)} tabelas, {sum(s.records for s in summaries.values())} linhas de dados "
+          f"em {processing_time:.2f} segundos")
+    return 0
+
+def _open_progress_output(destination: Optional[str]) -> Optional[Any]:
+    """
+    Abre o destino da opção --progress-json: arquivo, descritor (fd:N) ou '-' para stderr.
+    """
+    if destination is None:
+        return None
+    if destination == '-':
+        return sys.stderr
+    if destination.startswith('fd:'):
+        return open(int(destination[3:]), 'w', encoding='utf-8', buffering=1, closefd=False)
+    return open(destination, 'w', encoding='utf-8', buffering=1)
+
+def run_cli(args: argparse.Namespace) -> int:
+    """
+    Executa a conversão a partir dos argumentos da linha de comando.
+    
+    Quando a saída é stdout, mensagens e barra de progresso vão para stderr.
+    
+    Returns:
+        Código de saída: 0 em caso de sucesso, 1 em caso de erro
+    """
+    from_stdin = args.input == '-'
+    compression = None if args.compression == 'none' else args.compression
+    output = args.output
+    if output is None:
+        output = '-' if from_stdin else default_output_path(args.input, args.dialect,
+                                                            None if compression == 'auto' else compression)
+    to_stdout = output == '-'
+    if compression == 'auto':
+        compression = None if to_stdout else detect_compression(output)
+    # Capturado antes do redirecionamento das mensagens
+    stdout_buffer = sys.stdout.buffer if to_stdout else None
+    show_progress = (args.progress and not args.quiet) or bool(args.progress_json)
+    
+    if args.quiet:
+        log_stream = open(os.devnull, 'w')
+    else:
+        log_stream = sys.stderr if to_stdout else sys.stdout
+    
+    progress_output = None
+    try:
+        progress_output = _open_progress_output(args.progress_json)
+        with contextlib.redirect_stdout(log_stream):
+            start_time = time.time()
+            if args.mapping:
+                return _run_mapping(args, None if compression == 'auto' else compression, show_progress,
+                                    progress_output)
+            converter = JSONToSQLConverter(args.table, column_types=_load_column_types(args.column_types),
+                                           value_cache_size=args.cache_size, dialect=args.dialect,
+                                           upsert=args.upsert, upsert_key=args.upsert_key,
+                                           collect_metrics=bool(args.metrics), engine=args.engine,
+                                           schema=_load_schema(args.schema), batch_sizing=_batch_sizing(args),
+                                           strict_dates=args.strict_dates)
+            converter.progress_output = progress_output
+            converter.progress_interval = args.progress_interval
             
-            print(f"✅ Arquivo carregado: {len(json_data)} registros")
+            dedup = DedupOptions(args.dedup_key, args.keep_latest_by) if args.dedup_key else None
             
-            if show_progress and len(json_data) > 100:
-                print("🔄 Convertendo para SQL (com barra de progresso)...")
+            if from_stdin or to_stdout:
+                # stdin é sempre lido em modo streaming, que detecta array ou JSON Lines
+                delta_state = DeltaState.load(args.delta_state, args.delta_key) if args.delta_state else None
+                json_lines = not from_stdin and strip_compression_extension(args.input).lower().endswith(
+                    JSON_LINES_EXTENSIONS)
+                with contextlib.ExitStack() as stack:
+                    validator = None
+                    if converter.schema is not None:
+                        rejects_file = args.rejects or (None if to_stdout else os.path.splitext(
+                            strip_compression_extension(output))[0] + '.rejects.jsonl')
+                        rejects = stack.enter_context(open(rejects_file, 'w', encoding='utf-8')) if rejects_file else None
+                        validator = RecordValidator(converter.schema, rejects, converter._format_date_fast)
+                    deduplicator = None
+                    if dedup is not None:
+                        duplicates_file = args.duplicates or (None if to_stdout else os.path.splitext(
+                            strip_compression_extension(output))[0] + '.duplicates.jsonl')
+                        duplicates = (stack.enter_context(open(duplicates_file, 'w', encoding='utf-8'))
+                                      if duplicates_file else None)
+                        deduplicator = RecordDeduplicator(dedup, duplicates, converter._format_date_fast)
+                        stack.callback(deduplicator.close)
+                        if dedup.latest_by is not None and args.streaming:
+                            converter._scan_duplicates(deduplicator, args.input, json_lines)
+                    if from_stdin:
+                        input_stream, streaming, total_bytes = sys.stdin.buffer, True, None
+                    else:
+                        input_stream = stack.enter_context(open(args.input, 'rb'))
+                        streaming, total_bytes = args.streaming, os.path.getsize(args.input)
+                    if to_stdout:
+                        output_stream = stdout_buffer
+                    else:
+                        output_stream = stack.enter_context(open(output, 'wb', buffering=args.write_buffer))
+                    summary = converter.convert_stream(
+                        input_stream, output_stream, args.batch_size, show_progress, streaming,
+                        json_lines=json_lines, total_bytes=total_bytes, workers=args.workers,
+                        delta_state=delta_state, delta_deletes=args.delta_deletes,
+                        output_compression=compression, validator=validator, pipeline=args.pipeline,
+                        deduplicator=deduplicator)
+                    output_stream.flush()
+                if delta_state is not None:
+                    delta_state.save(args.delta_state)
             else:
-                print("🔄 Convertendo para SQL...")
-            
-            # Converter para SQL
-            sql_output = self.convert_json_to_sql(json_data, batch_size, show_progress)
-            
-            # Salvar em arquivo se especificado
-            if output_file:
-                print("💾 Salvando arquivo SQL...")
-                
-                # Criar barra de progresso para escrita do arquivo (se arquivo grande)
-                if show_progress and len(sql_output) > 1024 * 1024:  # > 1MB
-                    print("📝 Escrevendo arquivo SQL...")
-                    
-                with open(output_file, 'w', encoding='utf-8', buffering=8192) as f:
-                    f.write(sql_output)
-                print(f"✅ Arquivo SQL salvo em: {output_file}")
+                summary = converter.convert_file(args.input, output, args.batch_size, show_progress,
+                                                 args.streaming, args.write_buffer, args.workers,
+                                                 args.delta_state, args.delta_key, args.delta_deletes,
+                                                 compression, args.checkpoint, args.resume,
+                                                 ShardingOptions(args.shard_by, args.shard_size, args.shards,
+                                                                 args.shard_key) if args.shard_by else None,
+                                                 args.rejects, args.pipeline,
+                                                 ConversionCache(args.cache_dir, args.cache_max_bytes)
+                                                 if args.cache_dir else None, dedup, args.duplicates)
             
-            return sql_output
+            if converter.metrics is not None:
+                converter.metrics.to_json(args.metrics)
+                print(f"✅ Métricas salvas em: {args.metrics}")
             
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Arquivo não encontrado: {input_file}")
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Erro ao decodificar JSON: {e}")
-        except Exception as e:
-            raise Exception(f"Erro inesperado: {e}")
+            processing_time = time.time() - start_time
+            print(f"✅ {summary.records} registros, {summary.lines} linhas, "
+                  f"{summary.bytes_written / (1024 * 1024):.2f} MB em {processing_time:.2f} segundos")
+        return 0
+    except KeyboardInterrupt:
+        print("❌ Conversão interrompida", file=sys.stderr)
+        return 130
+    except Exception as e:
+        print(f"❌ Erro durante a conversão: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if args.quiet:
+            log_stream.close()
+        if progress_output is not None and progress_output is not sys.stderr:
+            progress_output.close()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Ponto de entrada: linha de comando com argumentos ou assistente interativo sem eles.
+    
+    Returns:
+        Código de saída do processo
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv:
+        return interactive_main()
+    
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.exemplo:
+        run_example()
+        return 0
+    if not args.input:
+        parser.error('informe o arquivo de entrada (ou - para stdin)')
+    if args.batch_size <= 0 or args.workers <= 0:
+        parser.error('--batch-size e --workers devem ser positivos')
+    if any(limit is not None and limit <= 0 for limit in (args.max_batch_bytes, args.max_params)):
+        parser.error('--max-batch-bytes e --max-params devem ser positivos')
+    if args.cache_dir and ('-' in (args.input, args.output or '') or args.mapping or args.shard_by
+                           or args.delta_state or args.checkpoint or args.resume or args.schema):
+        parser.error('--cache-dir exige arquivos de entrada e saída e não funciona com --mapping, divisão em '
+                     'partes, modo delta, checkpoints ou validação')
+    if _batch_sizing(args) and (args.mapping or args.shard_by or args.delta_state):
+        parser.error('--max-batch-bytes/--max-params/--adaptive-batch não funcionam com --mapping, '
+                     'divisão em partes ou modo delta')
+    if (args.keep_latest_by or args.duplicates) and not args.dedup_key:
+        parser.error('--keep-latest-by e --duplicates exigem --dedup-key')
+    if args.dedup_key and (args.checkpoint or args.resume or args.mapping or args.cache_dir):
+        parser.error('--dedup-key não funciona com checkpoints, --mapping ou --cache-dir')
+    if args.keep_latest_by and args.input == '-':
+        parser.error('--keep-latest-by lê a entrada duas vezes e não funciona com stdin')
+    if (args.checkpoint or args.resume or args.shard_by) and '-' in (args.input, args.output or ''):
+        parser.error('--checkpoint/--resume/--shard-by exigem arquivos de entrada e saída (não stdin/stdout)')
+    if args.mapping and (args.output == '-' or args.checkpoint or args.resume or args.shard_by or args.delta_state
+                         or args.workers > 1 or args.pipeline):
+        parser.error('--mapping grava um arquivo por tabela em um diretório e não funciona com stdout, '
+                     'checkpoints, divisão em partes, modo delta, --workers ou --pipeline')
+    return run_cli(args)
 
-def main():
+def interactive_main() -> int:
     """
-    Função principal que executa o conversor de forma simplificada e otimizada.
+    Assistente interativo que executa o conversor de forma simplificada e otimizada.
+    
+    Returns:
+        Código de saída: 0 em caso de sucesso, 1 em caso de erro
     """
     print("="*60)
     print("    CONVERSOR JSON PARA SQL - UNIDADES DE SAÚDE")
@@ -462,7 +5461,7 @@ def main():
     
     if not json_file_path:
         print("❌ Por favor, digite um caminho válido.")
-        return
+        return 1
         
     # Verificar se o arquivo existe
     try:
@@ -470,10 +5469,10 @@ def main():
             pass  # Apenas verificar se o arquivo pode ser aberto
     except FileNotFoundError:
         print(f"❌ Arquivo não encontrado: {json_file_path}")
-        return
+        return 1
     except Exception as e:
         print(f"❌ Erro ao acessar o arquivo: {e}")
-        return
+        return 1
     
     # Gerar nome do arquivo de saída automaticamente
     if json_file_path.lower().endswith('.json'):
@@ -508,14 +5507,40 @@ def main():
     else:
         print("✅ Barra de progresso desabilitada")
     
+    workers_input = input("Número de processos para renderização (padrão: 1) [Enter para usar padrão]: ").strip()
+    workers = 1
+    if workers_input.isdigit() and int(workers_input) > 0:
+        workers = int(workers_input)
+    print(f"✅ Processos de renderização: {workers}")
+    
+    # Dialeto/motor de saída
+    print("Dialetos disponíveis:")
+    for name, dialect_class in DIALECTS.items():
+        print(f"   • {name}: {dialect_class.description}")
+    dialect_name = input("Dialeto de saída (padrão: standard) [Enter para usar padrão]: ").strip() or 'standard'
+    if dialect_name not in DIALECTS:
+        print(f"❌ Dialeto desconhecido: {dialect_name}")
+        return 1
+    print(f"✅ Dialeto: {dialect_name}")
+    extension = DIALECTS[dialect_name].file_extension
+    if output_file_path.endswith('.sql') and extension != '.sql':
+        output_file_path = output_file_path[:-4] + extension
+    
+    # Modo streaming (leitura incremental do JSON)
+    streaming_input = input("Usar modo streaming para arquivos muito grandes? (s/n) [n]: ").strip().lower()
+    streaming = streaming_input in ['s', 'sim', 'yes']
+    if streaming:
+        print("✅ Modo streaming habilitado (baixo uso de memória)")
+    
     # Executar conversão
     print("\n🚀 Processando arquivo JSON (modo otimizado)...")
     
     start_time = time.time()
     
     try:
-        converter = JSONToSQLConverter("unidade_saude")
-        sql_output = converter.convert_file(json_file_path, output_file_path, batch_size, show_progress)
+        converter = JSONToSQLConverter("unidade_saude", dialect=dialect_name)
+        summary = converter.convert_file(json_file_path, output_file_path, batch_size, show_progress, streaming,
+                                         workers=workers)
         
         end_time = time.time()
         processing_time = end_time - start_time
@@ -525,12 +5550,12 @@ def main():
         print(f"⏱️  Tempo de processamento: {processing_time:.2f} segundos")
         
         # Mostrar estatísticas
-        lines = sql_output.split('\n')
-        values_count = len([line for line in lines if line.strip().startswith('(')])
+        values_count = summary.records
         
         print(f"📊 Estatísticas:")
         print(f"   • Total de registros processados: {values_count}")
-        print(f"   • Linhas no arquivo SQL: {len(lines)}")
+        print(f"   • Linhas no arquivo SQL: {summary.lines}")
+        print(f"   • Tamanho do arquivo SQL: {summary.bytes_written / (1024 * 1024):.2f} MB")
         if processing_time > 0:
             print(f"   • Taxa de processamento: {values_count/processing_time:.0f} registros/segundo")
         
@@ -540,18 +5565,20 @@ def main():
             print("\n" + "="*60)
             print("AMOSTRA DO SQL GERADO:")
             print("="*60)
-            sample_lines = lines[:20]  # Primeiras 20 linhas
-            for line in sample_lines:
-                print(line)
-            if len(lines) > 20:
+            # Ler apenas as primeiras 20 linhas do arquivo gerado
+            with open(output_file_path, 'r', encoding='utf-8') as f:
+                for line in islice(f, 20):
+                    print(line.rstrip('\n'))
+            if summary.lines > 20:
                 print("...")
-                print(f"[mais {len(lines) - 20} linhas no arquivo completo]")
+                print(f"[mais {summary.lines - 20} linhas no arquivo completo]")
     
     except Exception as e:
         print(f"❌ Erro durante a conversão: {e}")
-        return
+        return 1
     
     print("\n🎉 Processo finalizado!")
+    return 0
 
 def run_example():
     """
@@ -620,9 +5647,4 @@ def run_example():
     print(f"... [total de {len(lines)} linhas]")
 
 if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) > 1 and sys.argv[1] == "--exemplo":
-        run_example()
-    else:
-        main()
+    sys.exit(main())
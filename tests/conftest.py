@@ -0,0 +1,7 @@
+"""
+Configuração do pytest: torna o módulo do conversor (na raiz do repositório) importável.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
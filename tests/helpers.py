@@ -0,0 +1,56 @@
+"""
+Dados sintéticos e atalhos compartilhados pelos testes.
+"""
+import contextlib
+import io
+import json
+import random
+
+from sql_script_automator import JSONToSQLConverter
+
+BATCH_SIZE = 100
+
+def make_records(count: int, seed: int = 1, duplicates: float = 0.0):
+    """
+    Registros no formato do CNES; com duplicates, uma fração dos códigos se repete com outra data.
+    """
+    rng = random.Random(seed)
+    records = []
+    for i in range(1, count + 1):
+        records.append({
+            'codigo_cnes': i,
+            'nome_fantasia': f"UNIDADE D'AVILA {i} " + 'ç' * rng.randint(0, 20),
+            'tipo_gestao': rng.choice('EMD'),
+            'codigo_uf': rng.randint(11, 53),
+            'latitude_estabelecimento_decimo_grau': round(rng.uniform(-30, 5), 6),
+            'estabelecimento_possui_centro_cirurgico': rng.randint(0, 1),
+            'data_atualizacao': f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/20{rng.randint(10, 24)}",
+        })
+        if rng.random() < duplicates:
+            copy = dict(records[-1], tipo_gestao='Z', data_atualizacao=f"2030-01-{rng.randint(1, 28):02d}")
+            records.append(copy)
+    if duplicates:
+        rng.shuffle(records)
+    return records
+
+def write_json(path, records, json_lines: bool = False) -> str:
+    with open(path, 'w', encoding='utf-8') as f:
+        if json_lines:
+            f.writelines(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        else:
+            json.dump(records, f, ensure_ascii=False)
+    return str(path)
+
+def convert(input_file, output_file, converter: JSONToSQLConverter = None, **options):
+    """
+    convert_file com lotes pequenos, sem barra de progresso e sem as mensagens no stdout.
+    """
+    options.setdefault('batch_size', BATCH_SIZE)
+    options.setdefault('show_progress', False)
+    converter = converter or JSONToSQLConverter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        return converter.convert_file(str(input_file), str(output_file) if output_file else None, **options)
+
+def read_bytes(path) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
@@ -0,0 +1,100 @@
+"""
+Lotes dimensionados por limites do servidor: bytes e valores por comando, divisão e ajuste pela vazão.
+"""
+import re
+import sqlite3
+
+import pytest
+
+from helpers import make_records, write_json
+from sql_script_automator import BatchSizer, BatchSizing, JSONToSQLConverter, main
+
+def statements(script: str):
+    """
+    Comandos de um script em modo lotes (sem os comentários de lote).
+    """
+    return [chunk.strip() for chunk in re.split(r'^-- Lote \d+\n', script, flags=re.M)[1:]]
+
+def rows(statement: str) -> int:
+    return statement.count('\n(')
+
+def convert(records, sizing: BatchSizing, batch_size: int = 1000, **options):
+    converter = JSONToSQLConverter(batch_sizing=sizing, **options)
+    return converter, converter.convert_json_to_sql(records, batch_size, show_progress=False)
+
+@pytest.mark.parametrize('max_bytes', [8_000, 30_000])
+def test_statements_stay_under_max_bytes(max_bytes):
+    records = make_records(2000)
+    _, script = convert(records, BatchSizing(max_bytes=max_bytes))
+    sizes = [len(statement.encode('utf-8')) for statement in statements(script)]
+    assert max(sizes) <= max_bytes
+    # A estimativa usa 90% do limite: os comandos ficam perto dele, não muito abaixo
+    assert sum(sizes) / len(sizes) > max_bytes * 0.6
+    assert sum(rows(statement) for statement in statements(script)) == 2000
+    assert 'Tamanho do lote: variável (até %d bytes por comando)' % max_bytes in script
+
+def test_max_params_limits_values_per_statement():
+    fields = ['codigo_cnes', 'nome_fantasia', 'codigo_uf']
+    _, script = convert(make_records(1000), BatchSizing(max_params=300), fields=fields)
+    counts = [rows(statement) for statement in statements(script)]
+    assert max(counts) * len(fields) == 300 and sum(counts) == 1000
+
+def test_single_batch_uses_the_simple_script_unless_it_is_too_large():
+    records = make_records(50)
+    converter, script = convert(records, BatchSizing(max_bytes=1_000_000))
+    assert '(modo lotes)' not in script and script.count('INSERT INTO') == 1
+
+    converter, script = convert(records, BatchSizing(max_bytes=3_000))
+    assert '(modo lotes)' in script
+    assert all(len(statement.encode('utf-8')) <= 3_000 for statement in statements(script))
+
+def test_oversized_batches_are_split_in_halves():
+    converter = JSONToSQLConverter(batch_sizing=BatchSizing(max_bytes=4_000))
+    sizer = BatchSizer(converter.batch_sizing, 100, len(converter.required_fields))
+    batch = make_records(100)
+    statement = converter.generate_bulk_insert_statement(batch, show_progress=False)
+    parts = list(converter._fit_statement(sizer, batch, statement))
+    assert sum(records for records, _ in parts) == 100 and len(parts) > 2
+    assert sizer.splits == len(parts) - 1
+    assert all(len(part.encode('utf-8')) <= 4_000 for _, part in parts)
+
+def test_single_record_above_the_limit_is_kept_with_a_warning(capsys):
+    records = [dict(record, nome_fantasia='X' * 5_000) for record in make_records(3)]
+    _, script = convert(records, BatchSizing(max_bytes=1_000))
+    assert script.count('X' * 5_000) == 3
+    assert 'acima do limite de 1000' in capsys.readouterr().err
+
+def test_limit_uses_measured_width_and_params():
+    sizer = BatchSizer(BatchSizing(max_bytes=10_000, max_params=700), 1000, 7)
+    assert sizer.size() == 100
+    sizer.observe(100, 20_000)
+    assert sizer.bytes_per_record == 200 and sizer.size() == 45
+    report = sizer.report()
+    assert (report['inicial'], report['sugerido'], report['maior_comando_bytes']) == (100, 45, 20_000)
+
+def test_adaptive_search_settles_inside_the_bounds():
+    sizing = BatchSizing(adaptive=True, min_size=10, max_size=5000)
+    sizer = BatchSizer(sizing, 100, 7)
+    # Vazão simulada com pico em 800 registros por lote
+    for _ in range(200):
+        if sizer.settled:
+            break
+        size = sizer.size()
+        sizer.observe(size, seconds=size / (1000 - abs(size - 800)))
+    assert sizer.settled and 10 <= sizer.size() <= 5000
+    assert 400 <= sizer.size() <= 1600
+
+def test_load_to_database_respects_max_params(tmp_path):
+    path = str(tmp_path / 'saude.db')
+    converter = JSONToSQLConverter(fields=['codigo_cnes', 'nome_fantasia'], batch_sizing=BatchSizing(max_params=50))
+    with sqlite3.connect(path) as database:
+        database.execute("CREATE TABLE unidade_saude (codigo_cnes, nome_fantasia)")
+    summary = converter.load_to_database(make_records(260), lambda: sqlite3.connect(path), show_progress=False)
+    assert summary.records == 260 and summary.batches == 11
+    assert summary.batch_sizes['max'] == 25
+
+def test_cli_prints_the_suggested_batch_size(tmp_path, capsys):
+    input_file = write_json(tmp_path / 'in.json', make_records(1500))
+    assert main([input_file, '-o', str(tmp_path / 'saida.sql'), '--max-batch-bytes', '20000', '--no-progress']) == 0
+    suggestion = re.search(r'para fixar em execuções futuras: --batch-size (\d+)', capsys.readouterr().out)
+    assert suggestion and 0 < int(suggestion.group(1)) < 1000
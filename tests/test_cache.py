@@ -0,0 +1,92 @@
+"""
+Cache de conversões: saídas completas, reaproveitamento de lotes e remoção das entradas menos usadas.
+"""
+import json
+import os
+
+from helpers import convert, make_records, read_bytes, write_json
+from sql_script_automator import ConversionCache
+
+def cache_files(directory):
+    return sorted(os.path.relpath(os.path.join(root, name), directory)
+                  for root, _, names in os.walk(directory) for name in names)
+
+def age(path, seconds: int):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - seconds * 1_000_000_000))
+
+def test_cache_hit_and_partial_reuse_match_uncached_output(tmp_path):
+    records = make_records(1000)
+    input_file = write_json(tmp_path / 'in.json', records)
+    cache = ConversionCache(str(tmp_path / 'cache'))
+
+    expected = tmp_path / 'esperado.sql'
+    convert(input_file, expected)
+
+    first = convert(input_file, tmp_path / 'primeira.sql', cache=cache)
+    assert not first.from_cache
+    assert read_bytes(tmp_path / 'primeira.sql') == read_bytes(expected)
+
+    hit = convert(input_file, tmp_path / 'copia.sql', cache=cache)
+    assert hit.from_cache
+    assert read_bytes(tmp_path / 'copia.sql') == read_bytes(expected)
+    assert (hit.records, hit.batches, hit.bytes_written) == (first.records, first.batches, first.bytes_written)
+
+    # Um registro alterado: só o lote dele é renderizado de novo
+    records[150]['nome_fantasia'] = 'UNIDADE ALTERADA'
+    changed_file = write_json(tmp_path / 'in2.json', records)
+    expected_changed = tmp_path / 'esperado2.sql'
+    convert(changed_file, expected_changed)
+
+    partial = convert(changed_file, tmp_path / 'parcial.sql', cache=cache)
+    assert not partial.from_cache
+    assert partial.cached_batches == partial.batches - 1
+    assert read_bytes(tmp_path / 'parcial.sql') == read_bytes(expected_changed)
+
+def test_cache_eviction_respects_max_bytes(tmp_path):
+    input_file = write_json(tmp_path / 'in.json', make_records(500))
+    cache = ConversionCache(str(tmp_path / 'cache'), max_bytes=50_000)
+    convert(input_file, tmp_path / 'saida.sql', cache=cache)
+
+    total = sum(os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(tmp_path / 'cache') for name in names)
+    assert total <= 50_000
+
+def test_eviction_removes_an_output_together_with_its_summary(tmp_path):
+    source = tmp_path / 'saida.sql'
+    source.write_bytes(b'x' * 10_000)
+    cache = ConversionCache(str(tmp_path / 'cache'), max_bytes=15_000)
+    cache.put_output('aa' * 32, str(source), {'records': 1})
+    cache.put_output('bb' * 32, str(source), {'records': 2})
+    path, _ = cache.get_output('bb' * 32)
+    # O resumo é o arquivo mais antigo, mas a entrada foi usada por último: fica inteira
+    age(path + '.json', 3600)
+    age(cache._path('saidas', 'aa' * 32), 60)
+
+    assert cache.evict() == 1
+    assert cache_files(tmp_path / 'cache') == [os.path.join('saidas', 'bb', 'bb' * 32),
+                                              os.path.join('saidas', 'bb', 'bb' * 32 + '.json')]
+    assert cache.get_output('bb' * 32)[1] == {'records': 2}
+    assert cache.get_output('aa' * 32) is None
+
+def test_eviction_cleans_up_old_orphans(tmp_path):
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    source = tmp_path / 'saida.sql'
+    source.write_bytes(b'INSERT')
+    for key in ('aa' * 32, 'bb' * 32, 'cc' * 32):
+        cache.put_output(key, str(source), {})
+    os.remove(cache._path('saidas', 'aa' * 32))
+    os.remove(cache._path('saidas', 'bb' * 32) + '.json')
+    age(cache._path('saidas', 'aa' * 32) + '.json', 3600)
+    cache.put_batch('dd' * 32, 'INSERT')
+
+    # Órfãs antigas são apagadas mesmo com espaço sobrando; as recentes podem ser uma gravação em andamento
+    assert cache.evict() == 1
+    assert cache_files(tmp_path / 'cache') == sorted([
+        os.path.join('lotes', 'dd', 'dd' * 32), os.path.join('saidas', 'bb', 'bb' * 32),
+        os.path.join('saidas', 'cc', 'cc' * 32), os.path.join('saidas', 'cc', 'cc' * 32 + '.json')])
+
+    age(cache._path('saidas', 'bb' * 32), 3600)
+    assert cache.evict() == 1
+    assert json.loads(read_bytes(cache._path('saidas', 'cc' * 32) + '.json')) == {}
+    assert cache.get_output('bb' * 32) is None and cache.get_batch('dd' * 32) == 'INSERT'
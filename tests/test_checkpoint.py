@@ -0,0 +1,71 @@
+"""
+Checkpoints: retomada após uma queda no meio da conversão, com saída idêntica byte a byte.
+"""
+import os
+
+import pytest
+
+from helpers import convert, make_records, read_bytes, write_json
+from sql_script_automator import ConversionCheckpoint
+
+class SimulatedCrash(BaseException):
+    """
+    Interrompe a conversão como uma queda do processo (não é capturada como Exception).
+    """
+
+def crash_after_commit(monkeypatch, crash_after: int):
+    """
+    Derruba a conversão depois do commit de número crash_after, com o lote seguinte gravado pela metade.
+    """
+    original_commit = ConversionCheckpoint.commit
+    commits = []
+
+    def crashing_commit(self, out, summary):
+        original_commit(self, out, summary)
+        commits.append(summary.batches)
+        if len(commits) == crash_after:
+            out.write(b'INSERT INTO unidade_saude (codigo_cnes) VALUES (1')
+            out.flush()
+            raise SimulatedCrash()
+
+    monkeypatch.setattr(ConversionCheckpoint, 'commit', crashing_commit)
+
+@pytest.mark.parametrize('streaming', [False, True])
+@pytest.mark.parametrize('json_lines', [False, True])
+@pytest.mark.parametrize('crash_after', [1, 4])
+def test_resume_after_crash_is_byte_identical(tmp_path, monkeypatch, streaming, json_lines, crash_after):
+    input_file = write_json(tmp_path / ('in.jsonl' if json_lines else 'in.json'), make_records(1000), json_lines)
+    expected = tmp_path / 'esperado.sql'
+    convert(input_file, expected, streaming=streaming)
+
+    output = tmp_path / 'saida.sql'
+    crash_after_commit(monkeypatch, crash_after)
+    with pytest.raises(SimulatedCrash):
+        convert(input_file, output, streaming=streaming, checkpoint=True)
+    monkeypatch.undo()
+
+    assert os.path.exists(ConversionCheckpoint.path_for(str(output)))
+    assert read_bytes(output) != read_bytes(expected)
+
+    summary = convert(input_file, output, streaming=streaming, resume=True)
+    assert read_bytes(output) == read_bytes(expected)
+    assert not os.path.exists(ConversionCheckpoint.path_for(str(output)))
+    assert summary.records == 1000
+    assert summary.bytes_written == os.path.getsize(output)
+
+def test_successful_run_leaves_no_checkpoint(tmp_path):
+    input_file = write_json(tmp_path / 'in.json', make_records(300))
+    output = tmp_path / 'saida.sql'
+    convert(input_file, output, checkpoint=True)
+    assert not os.path.exists(ConversionCheckpoint.path_for(str(output)))
+
+def test_resume_rejects_checkpoint_from_other_settings(tmp_path, monkeypatch):
+    input_file = write_json(tmp_path / 'in.json', make_records(500))
+    output = tmp_path / 'saida.sql'
+    crash_after_commit(monkeypatch, 2)
+    with pytest.raises(SimulatedCrash):
+        convert(input_file, output, checkpoint=True)
+    monkeypatch.undo()
+
+    with pytest.raises(Exception, match='de outra entrada ou de outras configurações'):
+        convert(input_file, output, resume=True, batch_size=50)
@@ -0,0 +1,93 @@
+"""
+Linha de comando não interativa: argumentos, combinações inválidas, stdin/stdout e códigos de saída.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from helpers import make_records, read_bytes, write_json
+from sql_script_automator import JSONToSQLConverter, main
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql_script_automator.py')
+
+@pytest.fixture
+def input_file(tmp_path):
+    return write_json(tmp_path / 'cnes.json', make_records(250))
+
+def run(*argv) -> int:
+    return main([str(arg) for arg in argv])
+
+def test_file_to_file_matches_library(tmp_path, input_file, capsys):
+    assert run(input_file, '-o', tmp_path / 'saida.sql', '-b', 100, '--no-progress') == 0
+    expected = JSONToSQLConverter().convert_json_to_sql(make_records(250), 100, show_progress=False)
+    assert read_bytes(tmp_path / 'saida.sql').decode('utf-8') == expected
+    assert '250 registros' in capsys.readouterr().out
+
+def test_default_output_path(tmp_path, input_file):
+    assert run(input_file, '-d', 'postgresql', '-q') == 0
+    assert os.path.exists(tmp_path / 'cnes_insert.sql')
+
+def test_quiet_prints_nothing(tmp_path, input_file, capsys):
+    assert run(input_file, '-o', tmp_path / 'saida.sql', '-q') == 0
+    assert capsys.readouterr().out == ''
+
+def test_stdin_to_stdout_keeps_messages_on_stderr(tmp_path):
+    records = make_records(120)
+    data = ''.join(json.dumps(record) + '\n' for record in records).encode('utf-8')
+    result = subprocess.run([sys.executable, SCRIPT, '-', '-b', '50'], input=data, capture_output=True,
+                            check=True)
+    sql = result.stdout.decode('utf-8')
+    assert sql.startswith('-- ') and sql.count('INSERT INTO unidade_saude') == 3
+    assert sql.rstrip().endswith('-- Número de lotes: 3')
+    assert '✅' not in sql and '120 registros' in result.stderr.decode('utf-8')
+
+def test_conversion_error_exits_with_1(tmp_path, capsys):
+    assert run(tmp_path / 'inexistente.json', '-o', tmp_path / 'saida.sql') == 1
+    assert 'Arquivo não encontrado' in capsys.readouterr().err
+
+    (tmp_path / 'ruim.json').write_text('[{"codigo_cnes": 1},', encoding='utf-8')
+    assert run(tmp_path / 'ruim.json', '-o', tmp_path / 'saida.sql', '-q') == 1
+
+@pytest.mark.parametrize('argv', [
+    ['-q'],
+    ['INPUT', '-b', '0'],
+    ['INPUT', '--workers', '0'],
+    ['INPUT', '--max-batch-bytes', '-1'],
+    ['INPUT', '--checkpoint', '-o', '-'],
+    ['INPUT', '--keep-latest-by', 'data_atualizacao'],
+    ['INPUT', '--dedup-key', 'codigo_cnes', '--checkpoint'],
+    ['INPUT', '--cache-dir', 'cache', '--schema', 'cnes'],
+    ['INPUT', '--max-batch-bytes', '1000', '--shard-by', 'rows'],
+    ['INPUT', '--mapping', 'tabelas.json', '-o', '-'],
+    ['INPUT', '--mapping', 'tabelas.json', '--workers', '2'],
+    ['INPUT', '--dialect', 'oracle'],
+])
+def test_invalid_combinations_exit_with_2(input_file, argv, capsys):
+    with pytest.raises(SystemExit) as exc:
+        run(*[input_file if arg == 'INPUT' else arg for arg in argv])
+    assert exc.value.code == 2
+    assert 'error' in capsys.readouterr().err
+
+def test_mapping_honors_column_types_strict_dates_and_metrics(tmp_path, input_file):
+    mapping = tmp_path / 'tabelas.json'
+    mapping.write_text(json.dumps({'tables': [
+        {'name': 'unidade', 'columns': ['codigo_cnes', 'nome_fantasia', 'data_atualizacao']},
+        {'name': 'uf', 'columns': ['codigo_cnes', 'codigo_uf']},
+    ]}), encoding='utf-8')
+    types = tmp_path / 'tipos.json'
+    types.write_text(json.dumps({'codigo_cnes': 'int', 'data_atualizacao': 'text'}), encoding='utf-8')
+
+    assert run(input_file, '--mapping', mapping, '-o', tmp_path / 'saida', '-q', '--strict-dates',
+               '--column-types', types, '--metrics', tmp_path / 'metricas.json') == 0
+    unidade = read_bytes(tmp_path / 'saida' / 'unidade.sql').decode('utf-8')
+    # data_atualizacao declarada como texto: com --strict-dates, não vira data
+    assert "'" + make_records(1)[0]['data_atualizacao'] + "'" in unidade
+
+    metrics = json.loads(read_bytes(tmp_path / 'metricas.json'))
+    assert set(metrics['tabelas']) == {'unidade', 'uf'}
+    assert metrics['tabelas']['unidade']['lotes']['registros'] == 250
+    assert metrics['tabelas']['uf']['bytes_gravados'] == os.path.getsize(tmp_path / 'saida' / 'uf.sql')
+    assert 'leitura' in metrics['entrada']['etapas']
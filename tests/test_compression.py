@@ -0,0 +1,71 @@
+"""
+Entrada e saída comprimidas: detecção pelos bytes mágicos e ida e volta em cada formato.
+"""
+import bz2
+import gzip
+import io
+import lzma
+
+import pytest
+
+from helpers import convert, make_records, read_bytes, write_json
+from sql_script_automator import (detect_compression, open_input_stream, strip_compression_extension,
+                                  wrap_compressed, zstandard)
+
+EXTENSIONS = {'gzip': '.gz', 'xz': '.xz', 'bz2': '.bz2', 'zstd': '.zst'}
+
+def compressions():
+    return [pytest.param(name, marks=pytest.mark.skipif(name == 'zstd' and zstandard is None,
+                                                        reason='zstandard não instalado'))
+            for name in EXTENSIONS]
+
+def decompress(data: bytes, compression: str) -> bytes:
+    if compression == 'zstd':
+        return zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=True).read()
+    return {'gzip': gzip.decompress, 'xz': lzma.decompress, 'bz2': bz2.decompress}[compression](data)
+
+def compress(data: bytes, compression: str) -> bytes:
+    buffer = io.BytesIO()
+    with wrap_compressed(buffer, compression, 'wb') as f:
+        f.write(data)
+    return buffer.getvalue()
+
+@pytest.mark.parametrize('compression', compressions())
+def test_wrap_compressed_round_trip(compression):
+    data = ''.join(f'linha {i} ç\n' for i in range(5000)).encode('utf-8')
+    compressed = compress(data, compression)
+    assert len(compressed) < len(data)
+    assert detect_compression(header=compressed[:8]) == compression
+    assert decompress(compressed, compression) == data
+    stream, detected = open_input_stream(io.BufferedReader(io.BytesIO(compressed)))
+    assert detected == compression and stream.read() == data
+
+@pytest.mark.parametrize('compression', compressions())
+@pytest.mark.parametrize('streaming', [False, True])
+def test_compressed_input_and_output_match_plain_conversion(tmp_path, compression, streaming):
+    extension = EXTENSIONS[compression]
+    plain_input = write_json(tmp_path / 'in.jsonl', make_records(300), json_lines=True)
+    (tmp_path / f'in.jsonl{extension}').write_bytes(compress(read_bytes(plain_input), compression))
+
+    convert(plain_input, tmp_path / 'esperado.sql', streaming=streaming)
+    summary = convert(tmp_path / f'in.jsonl{extension}', tmp_path / f'saida.sql{extension}', streaming=streaming)
+
+    assert summary.input_compression == compression
+    assert summary.output_compression == compression
+    output = read_bytes(tmp_path / f'saida.sql{extension}')
+    assert decompress(output, compression) == read_bytes(tmp_path / 'esperado.sql')
+
+def test_detection_by_extension_and_explicit_none(tmp_path):
+    assert detect_compression('saida.sql.gz') == 'gzip'
+    assert detect_compression('saida.sql') is None
+    assert strip_compression_extension('dados.jsonl.xz') == 'dados.jsonl'
+
+    input_file = write_json(tmp_path / 'in.json', make_records(50))
+    summary = convert(input_file, tmp_path / 'saida.sql.gz', compression=None)
+    assert summary.output_compression is None
+    assert read_bytes(tmp_path / 'saida.sql.gz').startswith(b'-- ')
+
+def test_unknown_compression_is_rejected(tmp_path):
+    input_file = write_json(tmp_path / 'in.json', make_records(5))
+    with pytest.raises(Exception, match='Compressão desconhecida'):
+        convert(input_file, tmp_path / 'saida.sql', compression='rar')
@@ -0,0 +1,78 @@
+"""
+Datas: detecção do formato por coluna, strict_dates e a mesma decisão nos literais SQL e nos parâmetros DB-API.
+"""
+import sqlite3
+
+import pytest
+
+from sql_script_automator import JSONToSQLConverter, detect_date_format
+
+FIELDS = ['codigo', 'data', 'texto', 'cep']
+
+RECORDS = [
+    {'codigo': 1, 'data': '31/12/2024', 'texto': '01/02/2023', 'cep': '01001000'},
+    {'codigo': 2, 'data': '2024-01-15', 'texto': 'livre', 'cep': '20040-002'},
+    {'codigo': 3, 'data': '05/06/2022', 'texto': '2021/03/04', 'cep': None},
+    {'codigo': 4, 'data': '30/02/2024', 'texto': '12-11-2020', 'cep': '2024/1/1'},
+    {'codigo': 5, 'data': None, 'texto': 7, 'cep': '12345678'},
+]
+
+CONFIGURATIONS = [
+    {},
+    {'strict_dates': True},
+    {'column_types': 'infer'},
+    {'column_types': {'data': 'date', 'texto': 'text', 'cep': 'text'}},
+    {'column_types': {'data': 'date', 'texto': 'text', 'cep': 'text'}, 'strict_dates': True},
+]
+
+def converter(**options) -> JSONToSQLConverter:
+    return JSONToSQLConverter('datas', dialect='sqlite', fields=FIELDS, **options)
+
+def table() -> sqlite3.Connection:
+    connection = sqlite3.connect(':memory:')
+    connection.execute(f"CREATE TABLE datas ({', '.join(FIELDS)})")
+    return connection
+
+def test_detect_date_format_picks_the_most_frequent():
+    assert detect_date_format(['31/12/2024', '01/01/2023', '2024-01-15', None, 5]) == 'dmy'
+    assert detect_date_format(['2024/01/15', '15-01-2024', '2023/02/01']) == 'ymd'
+    assert detect_date_format(['abc', '12345678', None]) is None
+
+def test_generic_path_normalizes_dates_but_not_digit_strings():
+    sql = converter()
+    assert sql.format_sql_value('31/12/2024') == "'2024-12-31'"
+    assert sql.format_sql_value('2024/1/1') == "'2024-01-01'"
+    assert sql.format_sql_value('20240131') == "'20240131'"
+    assert sql.format_sql_value('31-12-24') == "'31-12-24'"
+
+def test_strict_dates_only_converts_date_columns():
+    strict = converter(strict_dates=True, column_types={'data': 'date', 'texto': 'text'})
+    statement = strict.generate_bulk_insert_statement(RECORDS, show_progress=False)
+    assert "(1, '2024-12-31', '01/02/2023', '01001000')" in statement
+    assert "(3, '2022-06-05', '2021/03/04', NULL)" in statement
+    # Só o valor fora do formato da coluna (2024-01-15) cai na detecção genérica
+    assert strict.date_stats() == {'data': {'formato': 'dmy', 'fallbacks': 1}}
+
+@pytest.mark.parametrize('options', CONFIGURATIONS)
+def test_iter_rows_and_load_to_database_match_sql_literals(tmp_path, options):
+    from_script = table()
+    from_script.executescript(converter(**options).convert_json_to_sql(RECORDS, show_progress=False))
+    expected = from_script.execute("SELECT * FROM datas ORDER BY codigo").fetchall()
+
+    from_rows = table()
+    from_rows.executemany("INSERT INTO datas VALUES (?, ?, ?, ?)", converter(**options).iter_rows(iter(RECORDS)))
+    assert from_rows.execute("SELECT * FROM datas ORDER BY codigo").fetchall() == expected
+
+    path = str(tmp_path / 'datas.db')
+    with sqlite3.connect(path) as database:
+        database.execute(f"CREATE TABLE datas ({', '.join(FIELDS)})")
+    converter(**options).load_to_database(RECORDS, lambda: sqlite3.connect(path), batch_size=2, show_progress=False)
+    loaded = sqlite3.connect(path)
+    assert loaded.execute("SELECT * FROM datas ORDER BY codigo").fetchall() == expected
+    loaded.close()
+
+def test_iter_rows_on_empty_input_keeps_inference_pending():
+    sql = converter(column_types='infer')
+    assert list(sql.iter_rows([])) == []
+    assert sql.column_types == 'infer'
+    assert list(sql.iter_rows(RECORDS))[0] == (1, '2024-12-31', '2023-02-01', '01001000')
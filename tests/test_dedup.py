@@ -0,0 +1,71 @@
+"""
+Remoção de duplicados: mesma decisão com o índice em memória e no SQLite, e chaves inválidas.
+"""
+import io
+import json
+
+import pytest
+
+import sql_script_automator as automator
+from helpers import convert, make_records, read_bytes, write_json
+from sql_script_automator import DedupOptions, RecordDeduplicator
+
+def dedup(records, latest_by=None, max_memory_keys=automator.DEDUP_MAX_MEMORY_KEYS):
+    report = io.StringIO()
+    deduplicator = RecordDeduplicator(DedupOptions('codigo_cnes', latest_by, max_memory_keys), report)
+    try:
+        kept = deduplicator.wrap(records)
+        return kept, report.getvalue(), deduplicator._index.spilled
+    finally:
+        deduplicator.close()
+
+@pytest.mark.parametrize('latest_by', [None, 'data_atualizacao'])
+def test_dedup_same_result_in_memory_and_after_spill(latest_by):
+    records = make_records(2000, duplicates=0.3)
+    kept, report, spilled = dedup(records, latest_by)
+    kept_spilled, report_spilled, spilled_after = dedup(records, latest_by, 50)
+
+    assert not spilled and spilled_after
+    assert kept == kept_spilled
+    assert report == report_spilled
+    assert sorted(record['codigo_cnes'] for record in kept) == list(range(1, 2001))
+
+    first_seen = {}
+    for record in records:
+        first_seen.setdefault(record['codigo_cnes'], record)
+    if latest_by is None:
+        assert kept == [record for record in records if first_seen[record['codigo_cnes']] is record]
+    else:
+        # As cópias (tipo_gestao Z) têm data de 2030, posterior à de todas as originais
+        copied = {record['codigo_cnes'] for record in records if record['tipo_gestao'] == 'Z'}
+        assert copied
+        assert {record['codigo_cnes'] for record in kept if record['tipo_gestao'] == 'Z'} == copied
+
+@pytest.mark.parametrize('latest_by', [None, 'data_atualizacao'])
+def test_dedup_streaming_file_matches_list(tmp_path, latest_by):
+    input_file = write_json(tmp_path / 'in.jsonl', make_records(1000, duplicates=0.3), json_lines=True)
+    options = DedupOptions('codigo_cnes', latest_by, max_memory_keys=100)
+    listed = convert(input_file, tmp_path / 'lista.sql', dedup=options)
+    streamed = convert(input_file, tmp_path / 'fluxo.sql', streaming=True, dedup=options)
+
+    assert listed.duplicates == streamed.duplicates > 0
+    assert read_bytes(tmp_path / 'lista.duplicates.jsonl') == read_bytes(tmp_path / 'fluxo.duplicates.jsonl')
+    assert streamed.records == 1000
+
+@pytest.mark.parametrize('max_memory_keys', [automator.DEDUP_MAX_MEMORY_KEYS, 1])
+def test_keys_are_normalized_the_same_way_in_memory_and_in_sqlite(max_memory_keys):
+    records = [{'codigo_cnes': value, 'ordem': i} for i, value in enumerate(
+        [1, 2 ** 70, 'a', 1.0, '1', 2.5, 'a', 2 ** 70, 2.5, True, None, None, 1])]
+    kept, report, spilled = dedup(records, max_memory_keys=max_memory_keys)
+    assert spilled == (max_memory_keys == 1)
+    # 1, 1.0 e 1 são a mesma chave; "1" e True são outras; registros sem chave nunca são descartados
+    assert [record['ordem'] for record in kept] == [0, 1, 2, 4, 5, 9, 10, 11]
+    assert [json.loads(line)['registro'] for line in report.splitlines()] == [4, 7, 8, 9, 13]
+    assert json.loads(report.splitlines()[0])['chave'] == 1.0
+
+@pytest.mark.parametrize('latest_by', [None, 'data_atualizacao'])
+def test_invalid_records_and_keys_raise_value_error(latest_by):
+    with pytest.raises(ValueError, match='Registro 2: não é um objeto JSON'):
+        dedup([{'codigo_cnes': 1}, ['codigo_cnes', 1]], latest_by)
+    with pytest.raises(ValueError, match='Registro 3: a chave codigo_cnes não pode ser uma lista'):
+        dedup([{'codigo_cnes': 1}, {'codigo_cnes': 2}, {'codigo_cnes': [1, 2]}], latest_by)
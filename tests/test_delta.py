@@ -0,0 +1,95 @@
+"""
+Modo delta: apenas as diferenças em relação à execução anterior, com o estado gravado entre execuções.
+"""
+import copy
+import json
+import sqlite3
+
+import pytest
+
+from helpers import convert, make_records, read_bytes, write_json
+from sql_script_automator import DeltaState, JSONToSQLConverter
+
+def sqlite_table(converter: JSONToSQLConverter) -> sqlite3.Connection:
+    connection = sqlite3.connect(':memory:')
+    columns = ', '.join(f"{col} PRIMARY KEY" if col == 'codigo_cnes' else col for col in converter.required_fields)
+    connection.execute(f"CREATE TABLE {converter.table_name} ({columns})")
+    return connection
+
+def table_rows(connection: sqlite3.Connection):
+    return connection.execute("SELECT * FROM unidade_saude ORDER BY codigo_cnes").fetchall()
+
+def next_day(records):
+    """
+    Exportação do dia seguinte: 10 alterados, os 5 últimos removidos e 7 novos.
+    """
+    records = copy.deepcopy(records)
+    for record in records[:10]:
+        record['nome_fantasia'] += ' (REFORMADA)'
+        record['data_atualizacao'] = '2025-01-01'
+    del records[-5:]
+    records.extend(make_records(7, seed=2))
+    for i, record in enumerate(records[-7:]):
+        record['codigo_cnes'] = 10_000 + i
+    return records
+
+def run_delta(tmp_path, records, name, state_file, converter=None, **options):
+    input_file = write_json(tmp_path / f'{name}.json', records)
+    output = tmp_path / f'{name}.sql'
+    summary = convert(input_file, output, converter or JSONToSQLConverter(dialect='sqlite'),
+                      delta_state_file=str(state_file), **options)
+    return summary, read_bytes(output).decode('utf-8')
+
+def test_first_run_inserts_everything_and_rerun_is_empty(tmp_path):
+    records = make_records(300)
+    state_file = tmp_path / 'estado.json'
+    first, _ = run_delta(tmp_path, records, 'dia1', state_file)
+    assert (first.inserted, first.updated, first.deleted, first.unchanged) == (300, 0, 0, 0)
+    assert len(json.loads(read_bytes(state_file))['entries']) == 300
+
+    again, script = run_delta(tmp_path, records, 'dia1b', state_file)
+    assert (again.inserted, again.updated, again.deleted, again.unchanged) == (0, 0, 0, 300)
+    assert 'INSERT INTO' not in script and 'UPDATE unidade_saude' not in script
+
+@pytest.mark.parametrize('upsert', [False, True])
+def test_applying_the_delta_matches_a_full_load(tmp_path, upsert):
+    day1 = make_records(300)
+    day2 = next_day(day1)
+    state_file = tmp_path / 'estado.json'
+    converter = JSONToSQLConverter(dialect='sqlite', upsert=upsert)
+
+    database = sqlite_table(converter)
+    _, script = run_delta(tmp_path, day1, 'dia1', state_file, converter, delta_deletes=True)
+    database.executescript(script)
+    summary, script = run_delta(tmp_path, day2, 'dia2', state_file, converter, delta_deletes=True)
+    database.executescript(script)
+    assert (summary.inserted, summary.updated, summary.deleted, summary.unchanged) == (7, 10, 5, 285)
+    assert ('INSERT' if upsert else 'UPDATE') in script.split('alterados')[1]
+
+    expected = sqlite_table(converter)
+    expected.executescript(JSONToSQLConverter(dialect='sqlite').convert_json_to_sql(day2, show_progress=False))
+    assert table_rows(database) == table_rows(expected)
+
+def test_without_deletes_vanished_records_stay_in_the_state(tmp_path):
+    day1 = make_records(100)
+    state_file = tmp_path / 'estado.json'
+    run_delta(tmp_path, day1, 'dia1', state_file)
+    summary, script = run_delta(tmp_path, day1[:90], 'dia2', state_file)
+    assert summary.deleted == 0 and 'DELETE' not in script
+    assert len(DeltaState.load(str(state_file)).records) == 100
+
+    # Com DELETE, o estado passa a ter só os registros presentes
+    summary, script = run_delta(tmp_path, day1[:90], 'dia3', state_file, delta_deletes=True)
+    assert summary.deleted == 10 and 'DELETE FROM unidade_saude WHERE codigo_cnes IN (' in script
+    assert len(DeltaState.load(str(state_file)).records) == 90
+
+def test_state_key_must_match(tmp_path):
+    state_file = tmp_path / 'estado.json'
+    DeltaState('codigo_cnes', {1: ('hash', None)}).save(str(state_file))
+    with pytest.raises(ValueError, match='usa a chave codigo_cnes'):
+        DeltaState.load(str(state_file), 'numero_cnpj')
+
+def test_formats_without_dml_are_rejected(tmp_path):
+    with pytest.raises(Exception, match='requer um dialeto com UPDATE/DELETE'):
+        run_delta(tmp_path, make_records(10), 'dia1', tmp_path / 'estado.json',
+                  JSONToSQLConverter(dialect='postgresql_copy'))
@@ -0,0 +1,88 @@
+"""
+Dialetos de saída: literais de cada banco, limites por comando e formatos de carga (COPY, LOAD DATA).
+"""
+import sqlite3
+
+import pytest
+
+from helpers import convert, make_records, read_bytes, write_json
+from sql_script_automator import DIALECTS, JSONToSQLConverter, get_dialect
+
+FIELDS = ['codigo', 'nome', 'ativo', 'nota', 'data']
+
+RECORDS = [
+    {'codigo': 1, 'nome': "D'Ávila", 'ativo': True, 'nota': 9.5, 'data': '31/12/2024'},
+    {'codigo': 2, 'nome': 'barra \\ e\ttab\nlinha', 'ativo': False, 'nota': None, 'data': '2024-01-02'},
+    {'codigo': 3, 'nome': None, 'ativo': None, 'nota': -1, 'data': None},
+]
+
+def converter(dialect: str, **options) -> JSONToSQLConverter:
+    return JSONToSQLConverter('unidade', dialect=dialect, fields=FIELDS, **options)
+
+def test_every_dialect_is_registered_by_name():
+    for name, dialect in DIALECTS.items():
+        assert get_dialect(name).name == name
+        assert isinstance(get_dialect(dialect()), dialect)
+    with pytest.raises(ValueError, match='Dialeto desconhecido'):
+        get_dialect('oracle')
+
+def test_standard_literals():
+    statement = converter('standard').generate_bulk_insert_statement(RECORDS, show_progress=False)
+    assert "(1, 'D''Ávila', TRUE, 9.5, '2024-12-31')" in statement
+    assert "(3, NULL, NULL, -1, NULL)" in statement
+    assert statement.startswith('INSERT INTO unidade (') and statement.endswith(';')
+
+def test_sqlite_script_loads_into_sqlite():
+    script = converter('sqlite').convert_json_to_sql(RECORDS * 40, batch_size=50, show_progress=False)
+    assert script.count('BEGIN TRANSACTION;') == script.count('COMMIT;') == 3
+    connection = sqlite3.connect(':memory:')
+    connection.execute(f"CREATE TABLE unidade ({', '.join(FIELDS)})")
+    connection.executescript(script)
+    assert connection.execute("SELECT COUNT(*) FROM unidade").fetchone() == (120,)
+    assert connection.execute("SELECT * FROM unidade WHERE codigo = 2 LIMIT 1").fetchone() == (
+        2, 'barra \\ e\ttab\nlinha', 0, None, '2024-01-02')
+    assert connection.execute("SELECT nome, ativo, data FROM unidade WHERE codigo = 1 LIMIT 1").fetchone() == (
+        "D'Ávila", 1, '2024-12-31')
+
+def test_mysql_escapes_backslashes():
+    statement = converter('mysql').generate_bulk_insert_statement(RECORDS, show_progress=False)
+    assert "'barra \\\\ e\ttab\nlinha'" in statement
+    assert "'D''Ávila'" in statement
+
+def test_sqlserver_unicode_strings_and_1000_rows_per_statement():
+    records = [dict(RECORDS[0], codigo=i) for i in range(2500)]
+    script = converter('sqlserver').generate_bulk_insert_statement(records, show_progress=False)
+    assert script.count('INSERT INTO unidade') == 3
+    assert "N'D''Ávila', 1, 9.5" in script
+    for statement in script.split(';')[:-1]:
+        assert statement.count("N'D''Ávila'") <= 1000
+
+def test_postgresql_copy_text_format():
+    block = converter('postgresql_copy').generate_bulk_insert_statement(RECORDS, show_progress=False)
+    lines = block.split('\n')
+    assert lines[0] == 'COPY unidade (codigo, nome, ativo, nota, data) FROM stdin;'
+    assert lines[-1] == '\\.'
+    assert lines[1:-1] == [
+        "1\tD'Ávila\tt\t9.5\t2024-12-31",
+        "2\tbarra \\\\ e\\ttab\\nlinha\tf\t\\N\t2024-01-02",
+        "3\t\\N\t\\N\t-1\t\\N",
+    ]
+
+def test_mysql_load_data_writes_tsv_and_load_script(tmp_path):
+    input_file = write_json(tmp_path / 'in.json', make_records(250))
+    summary = convert(input_file, tmp_path / 'dados.tsv', JSONToSQLConverter(dialect='mysql_load_data'))
+
+    data = read_bytes(tmp_path / 'dados.tsv').decode('utf-8')
+    assert data.count('\n') == 250 and '--' not in data
+    script = read_bytes(summary.load_script_file).decode('utf-8')
+    assert summary.load_script_file == str(tmp_path / 'dados.load.sql')
+    assert f"LOAD DATA LOCAL INFILE '{tmp_path / 'dados.tsv'}'" in script
+    assert 'INTO TABLE unidade_saude' in script
+
+    with pytest.raises(Exception, match='não suporta saída comprimida'):
+        convert(input_file, tmp_path / 'dados.tsv.gz', JSONToSQLConverter(dialect='mysql_load_data'))
+
+@pytest.mark.parametrize('dialect', sorted(DIALECTS))
+def test_all_dialects_render_every_record(dialect):
+    script = JSONToSQLConverter(dialect=dialect).convert_json_to_sql(make_records(30), 10, show_progress=False)
+    assert all(f"UNIDADE D''AVILA {i} " in script or f"UNIDADE D'AVILA {i} " in script for i in range(1, 31))
@@ -0,0 +1,105 @@
+"""
+API de iteradores: iter_statements e iter_rows consomem a entrada sob demanda e geram o mesmo que os scripts.
+"""
+import io
+import json
+import re
+import sqlite3
+
+import pytest
+
+from helpers import make_records
+from sql_script_automator import TYPE_INFERENCE_SAMPLE_SIZE, BatchSizing, JSONRecordStream, JSONToSQLConverter
+
+class CountingRecords:
+    """
+    Gerador de registros que conta quantos já foram consumidos.
+    """
+    def __init__(self, records):
+        self.records = records
+        self.consumed = 0
+
+    def __iter__(self):
+        for record in self.records:
+            self.consumed += 1
+            yield record
+
+def script_statements(script: str):
+    return [chunk.strip() for chunk in re.split(r'^-- Lote \d+\n', script, flags=re.M)[1:]]
+
+def fetch_rows(connection: sqlite3.Connection):
+    # O SQLite converte literais REAL com arredondamento próprio: comparar os números arredondados
+    rows = connection.execute("SELECT * FROM unidade_saude ORDER BY codigo_cnes").fetchall()
+    return [tuple(round(value, 9) if type(value) is float else value for value in row) for row in rows]
+
+def table(converter: JSONToSQLConverter) -> sqlite3.Connection:
+    connection = sqlite3.connect(':memory:')
+    connection.execute(f"CREATE TABLE {converter.table_name} ({', '.join(converter.required_fields)})")
+    return connection
+
+def test_iter_statements_reads_one_batch_at_a_time():
+    source = CountingRecords(make_records(1000))
+    statements = JSONToSQLConverter().iter_statements(source, batch_size=100)
+    assert source.consumed == 0
+    next(statements)
+    assert source.consumed == 100
+    next(statements)
+    assert source.consumed == 200
+    assert len(list(statements)) == 8
+
+def test_iter_rows_holds_only_the_initial_sample():
+    records = make_records(3000)
+    source = CountingRecords(records)
+    converter = JSONToSQLConverter()
+    rows = converter.iter_rows(source)
+    next(rows)
+    assert source.consumed == TYPE_INFERENCE_SAMPLE_SIZE
+    assert sum(1 for _ in rows) == 2999
+
+    # Com os conversores prontos, cada tupla consome um registro
+    source = CountingRecords(records)
+    rows = converter.iter_rows(source)
+    next(rows)
+    assert source.consumed == 1
+
+@pytest.mark.parametrize('dialect', ['standard', 'postgresql', 'sqlserver', 'postgresql_copy'])
+def test_statements_match_convert_json_to_sql(dialect):
+    records = make_records(750)
+    script = JSONToSQLConverter(dialect=dialect).convert_json_to_sql(records, 200, show_progress=False)
+    statements = list(JSONToSQLConverter(dialect=dialect).iter_statements(iter(records), batch_size=200))
+    assert statements == script_statements(script)
+    assert list(JSONToSQLConverter().iter_statements([])) == []
+
+def test_iter_statements_and_iter_rows_load_the_same_table():
+    records = make_records(1200)
+    converter = JSONToSQLConverter(dialect='sqlite', column_types='infer')
+    from_statements = table(converter)
+    for statement in converter.iter_statements(records, batch_size=500):
+        from_statements.executescript(statement)
+
+    from_rows = table(converter)
+    placeholders = ', '.join('?' * len(converter.required_fields))
+    from_rows.executemany(f"INSERT INTO unidade_saude VALUES ({placeholders})",
+                          JSONToSQLConverter(column_types='infer').iter_rows(r for r in records))
+    assert fetch_rows(from_rows) == fetch_rows(from_statements)
+    assert len(fetch_rows(from_rows)) == 1200
+
+def test_workers_render_the_same_statements():
+    records = make_records(2000)
+    sequential = list(JSONToSQLConverter().iter_statements(records, batch_size=150))
+    parallel = list(JSONToSQLConverter().iter_statements(iter(records), batch_size=150, workers=2))
+    assert parallel == sequential and len(parallel) == 14
+
+def test_iter_statements_follows_batch_sizing():
+    converter = JSONToSQLConverter(batch_sizing=BatchSizing(max_bytes=10_000))
+    statements = list(converter.iter_statements(make_records(1000)))
+    assert len(statements) > 10
+    assert all(len(statement.encode('utf-8')) <= 10_000 for statement in statements)
+    assert sum(statement.count('\n(') for statement in statements) == 1000
+
+def test_streaming_reader_feeds_the_iterators():
+    records = make_records(400)
+    data = ''.join(json.dumps(record) + '\n' for record in records).encode('utf-8')
+    stream = JSONRecordStream(io.BytesIO(data))
+    statements = list(JSONToSQLConverter().iter_statements(stream, batch_size=100))
+    assert statements == list(JSONToSQLConverter().iter_statements(records, batch_size=100))
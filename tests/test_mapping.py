@@ -0,0 +1,112 @@
+"""
+Mapeamento de uma entrada para várias tabelas: caminhos de origem, linhas por lista e saídas por tabela.
+"""
+import gzip
+import json
+import sqlite3
+
+import pytest
+
+from helpers import read_bytes, write_json
+from sql_script_automator import MultiTableConverter, TableMapping, load_mapping, tomllib
+
+RECORDS = [
+    {'codigo_cnes': 1, 'nome': "D'Ávila", 'endereco': {'cep': '01001000', 'uf': 'SP'}, 'telefones': ['1111', '2222'],
+     'leitos': [{'tipo': 'UTI', 'quantidade': 10}, {'tipo': 'CLINICO', 'quantidade': 25}]},
+    {'codigo_cnes': 2, 'nome': 'Posto', 'endereco': None, 'telefones': [], 'leitos': []},
+    {'codigo_cnes': 3, 'nome': 'Hospital', 'endereco': {'cep': '20040002'}, 'telefones': ['3333'],
+     'leitos': [{'tipo': 'UTI', 'quantidade': 4}]},
+]
+
+MAPPING = {'tables': [
+    {'name': 'unidade', 'columns': ['codigo_cnes', 'nome']},
+    {'name': 'endereco', 'columns': {'codigo_cnes': 'codigo_cnes', 'cep': 'endereco.cep', 'uf': 'endereco.uf',
+                                     'telefone': 'telefones.0', 'ultimo_telefone': 'telefones.-1'}},
+    {'name': 'leito', 'rows': 'leitos', 'upsert_key': 'tipo',
+     'columns': {'codigo_cnes': '$.codigo_cnes', 'tipo': 'tipo', 'quantidade': {'source': 'quantidade', 'type': 'int'}}},
+]}
+
+def tables():
+    return [TableMapping.from_dict(table) for table in MAPPING['tables']]
+
+def project(table_name: str, record):
+    table = next(table for table in tables() if table.name == table_name)
+    return list(table.compile_projection()(record))
+
+def test_from_dict_columns_and_types():
+    unidade, endereco, leito = tables()
+    assert unidade.sources == {'codigo_cnes': 'codigo_cnes', 'nome': 'nome'} and unidade.column_types is None
+    assert endereco.columns == ['codigo_cnes', 'cep', 'uf', 'telefone', 'ultimo_telefone']
+    assert leito.column_types == {'quantidade': 'int'} and leito.rows == 'leitos' and leito.upsert_key == 'tipo'
+
+@pytest.mark.parametrize('table, message', [
+    ({'columns': ['a']}, "precisa de 'name' e 'columns'"),
+    ({'name': 't', 'columns': {'a': {'type': 'uuid'}}}, 'Tipo desconhecido na coluna t.a'),
+    ({'name': 't', 'columns': {'a': {'type': 'int'}}, 'column_types': 'infer'}, "não combina com tipos por coluna"),
+])
+def test_from_dict_rejects_invalid_tables(table, message):
+    with pytest.raises(ValueError, match=message):
+        TableMapping.from_dict(table)
+
+def test_same_name_columns_reuse_the_record():
+    assert project('unidade', RECORDS[0])[0] is RECORDS[0]
+
+def test_nested_paths_and_list_positions():
+    assert project('endereco', RECORDS[0]) == [
+        {'codigo_cnes': 1, 'cep': '01001000', 'uf': 'SP', 'telefone': '1111', 'ultimo_telefone': '2222'}]
+    # Caminhos ausentes ou através de null/listas vazias viram None
+    assert project('endereco', RECORDS[1]) == [
+        {'codigo_cnes': 2, 'cep': None, 'uf': None, 'telefone': None, 'ultimo_telefone': None}]
+
+def test_rows_expand_lists_with_root_columns():
+    assert project('leito', RECORDS[0]) == [{'codigo_cnes': 1, 'tipo': 'UTI', 'quantidade': 10},
+                                            {'codigo_cnes': 1, 'tipo': 'CLINICO', 'quantidade': 25}]
+    assert project('leito', RECORDS[1]) == []
+    assert project('leito', {'codigo_cnes': 4, 'leitos': 'nenhum'}) == []
+
+def test_load_mapping_validates_the_file(tmp_path):
+    path = tmp_path / 'tabelas.json'
+    path.write_text(json.dumps(MAPPING), encoding='utf-8')
+    assert [table.name for table in load_mapping(str(path))] == ['unidade', 'endereco', 'leito']
+
+    path.write_text(json.dumps({'tables': []}), encoding='utf-8')
+    with pytest.raises(ValueError, match='Nenhuma tabela declarada'):
+        load_mapping(str(path))
+    path.write_text(json.dumps({'tables': [MAPPING['tables'][0]] * 2}), encoding='utf-8')
+    with pytest.raises(ValueError, match='Tabelas repetidas'):
+        load_mapping(str(path))
+
+@pytest.mark.skipif(tomllib is None, reason='tomllib exige Python 3.11+')
+def test_load_mapping_toml(tmp_path):
+    path = tmp_path / 'tabelas.toml'
+    path.write_text('[[tables]]\nname = "unidade"\ncolumns = ["codigo_cnes", "nome"]\n', encoding='utf-8')
+    assert load_mapping(str(path))[0].columns == ['codigo_cnes', 'nome']
+
+def test_convert_file_writes_one_loadable_script_per_table(tmp_path):
+    input_file = write_json(tmp_path / 'cnes.json', RECORDS * 50)
+    converter = MultiTableConverter(tables(), dialect='sqlite')
+    summaries = converter.convert_file(input_file, str(tmp_path / 'saida'), batch_size=40, show_progress=False)
+
+    assert {name: summary.records for name, summary in summaries.items()} == {
+        'unidade': 150, 'endereco': 150, 'leito': 150}
+    database = sqlite3.connect(':memory:')
+    for table in tables():
+        database.execute(f"CREATE TABLE {table.name} ({', '.join(table.columns)})")
+        database.executescript(read_bytes(summaries[table.name].output_file).decode('utf-8'))
+    assert database.execute("SELECT tipo, SUM(quantidade) FROM leito GROUP BY tipo ORDER BY tipo").fetchall() == [
+        ('CLINICO', 1250), ('UTI', 700)]
+    assert database.execute("SELECT nome FROM unidade WHERE codigo_cnes = 1 LIMIT 1").fetchone() == ("D'Ávila",)
+
+def test_output_paths_follow_the_mapping(tmp_path):
+    mapped = tables()
+    mapped[2].output = 'leitos.sql.gz'
+    converter = MultiTableConverter(mapped)
+    assert converter.output_paths('saida', 'xz') == ['saida/unidade.sql.xz', 'saida/endereco.sql.xz',
+                                                     'saida/leitos.sql.gz']
+    summaries = converter.convert_records(RECORDS, str(tmp_path), show_progress=False)
+    assert summaries['leito'].output_compression == 'gzip' and summaries['unidade'].output_compression is None
+    assert gzip.decompress(read_bytes(tmp_path / 'leitos.sql.gz')).count(b"'UTI'") == 2
+
+    mapped[1].output = 'unidade.sql'
+    with pytest.raises(ValueError, match='mesmo arquivo'):
+        MultiTableConverter(mapped).output_paths(str(tmp_path))
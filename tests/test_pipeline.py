@@ -0,0 +1,79 @@
+"""
+Pipeline de leitura, renderização e gravação em threads, e as entradas assíncronas.
+"""
+import asyncio
+import gzip
+import io
+
+import pytest
+
+from helpers import convert, make_records, read_bytes, write_json
+from sql_script_automator import PIPELINE_READ_BLOCK, JSONToSQLConverter, _BackgroundWriter
+
+class FailingOutput(io.BytesIO):
+    def write(self, data):
+        raise OSError('disco cheio')
+
+async def paged_records(records, page_size=97):
+    """
+    Simula uma API paginada: uma página por vez, devolvendo o controle ao loop entre as páginas.
+    """
+    for start in range(0, len(records), page_size):
+        await asyncio.sleep(0)
+        for record in records[start:start + page_size]:
+            yield record
+
+@pytest.mark.parametrize('streaming', [False, True])
+@pytest.mark.parametrize('output_name', ['saida.sql', 'saida.sql.gz'])
+def test_pipeline_output_matches_sequential(tmp_path, streaming, output_name):
+    input_file = write_json(tmp_path / 'in.json', make_records(1000))
+    sequential = convert(input_file, tmp_path / ('seq_' + output_name), streaming=streaming)
+    piped = convert(input_file, tmp_path / ('pipe_' + output_name), streaming=streaming, pipeline=True)
+    # O cabeçalho gzip registra nome e horário: comparar o conteúdo descomprimido
+    decompress = gzip.decompress if output_name.endswith('.gz') else bytes
+    assert decompress(read_bytes(tmp_path / ('pipe_' + output_name))) == decompress(
+        read_bytes(tmp_path / ('seq_' + output_name)))
+    assert (piped.records, piped.batches, piped.bytes_written) == (
+        sequential.records, sequential.batches, sequential.bytes_written)
+
+def test_background_writer_reports_write_errors():
+    writer = _BackgroundWriter(FailingOutput())
+    writer.write(b'INSERT')
+    with pytest.raises(OSError, match='disco cheio'):
+        writer.flush()
+    with pytest.raises(OSError, match='disco cheio'):
+        writer.close()
+
+def test_convert_file_async_matches_convert_file(tmp_path):
+    input_file = write_json(tmp_path / 'in.jsonl', make_records(600), json_lines=True)
+    expected = convert(input_file, tmp_path / 'esperado.sql', streaming=True)
+    summary = asyncio.run(JSONToSQLConverter().convert_file_async(
+        input_file, str(tmp_path / 'saida.sql'), batch_size=100, show_progress=False, streaming=True))
+    assert read_bytes(tmp_path / 'saida.sql') == read_bytes(tmp_path / 'esperado.sql')
+    assert summary.records == expected.records == 600
+
+@pytest.mark.parametrize('count', [0, 1, PIPELINE_READ_BLOCK, 1500])
+def test_convert_records_async_matches_streaming_conversion(count):
+    records = make_records(count)
+    expected = JSONToSQLConverter().convert_json_to_sql(iter(records), 100, show_progress=False)
+    summary = asyncio.run(JSONToSQLConverter().convert_records_async(paged_records(records), batch_size=100))
+    assert summary.sql == expected
+    assert summary.records == count
+
+def test_convert_records_async_compressed_stream():
+    records = make_records(700)
+    output = io.BytesIO()
+    summary = asyncio.run(JSONToSQLConverter().convert_records_async(
+        records, output, batch_size=100, output_compression='gzip'))
+    assert gzip.decompress(output.getvalue()).decode('utf-8') == JSONToSQLConverter().convert_json_to_sql(
+        iter(records), 100, show_progress=False)
+    assert summary.batches == 7 and summary.bytes_written > len(output.getvalue())
+
+def test_convert_records_async_propagates_source_errors():
+    async def broken():
+        for record in make_records(PIPELINE_READ_BLOCK * 3):
+            yield record
+        raise ConnectionError('API fora do ar')
+
+    with pytest.raises(ConnectionError, match='API fora do ar'):
+        asyncio.run(JSONToSQLConverter().convert_records_async(broken(), io.BytesIO()))
@@ -0,0 +1,84 @@
+"""
+Divisão da saída em partes: critérios rows/bytes/hash, manifesto e carga das partes.
+"""
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import zlib
+
+import pytest
+
+from helpers import convert, make_records, read_bytes, write_json
+from sql_script_automator import (DEFAULT_SHARD_BYTES, DEFAULT_SHARD_ROWS, JSONToSQLConverter, ShardingOptions,
+                                  build_arg_parser, main)
+
+@pytest.fixture
+def input_file(tmp_path):
+    return write_json(tmp_path / 'cnes.json', make_records(1050))
+
+def load_parts(summary) -> sqlite3.Connection:
+    connection = sqlite3.connect(':memory:')
+    fields = JSONToSQLConverter().required_fields
+    connection.execute(f"CREATE TABLE unidade_saude ({', '.join(fields)})")
+    for path in summary.shard_files:
+        connection.executescript(read_bytes(path).decode('utf-8'))
+    return connection
+
+def test_size_default_depends_on_the_mode():
+    assert ShardingOptions('rows').size == DEFAULT_SHARD_ROWS
+    assert ShardingOptions('bytes').size == DEFAULT_SHARD_BYTES
+    assert ShardingOptions('bytes', 1000).size == 1000
+    assert build_arg_parser().parse_args(['in.json', '--shard-by', 'bytes']).shard_size is None
+
+def test_rows_parts_and_manifest(tmp_path, input_file):
+    summary = convert(input_file, tmp_path / 'carga.sql', JSONToSQLConverter(dialect='sqlite'),
+                      sharding=ShardingOptions('rows', 400))
+    assert [os.path.basename(path) for path in summary.shard_files] == [
+        'carga.part0001.sql', 'carga.part0002.sql', 'carga.part0003.sql']
+    assert summary.manifest_file == str(tmp_path / 'carga.manifest.json')
+
+    manifest = json.loads(read_bytes(summary.manifest_file))
+    assert manifest['sharding'] == {'by': 'rows', 'size': 400}
+    assert manifest['records'] == summary.records == 1050
+    assert [entry['records'] for entry in manifest['shards']] == [400, 400, 250]
+    for entry, path in zip(manifest['shards'], summary.shard_files):
+        assert entry['sha256'] == hashlib.sha256(read_bytes(path)).hexdigest()
+        assert entry['bytes'] == os.path.getsize(path)
+
+    database = load_parts(summary)
+    assert database.execute("SELECT COUNT(DISTINCT codigo_cnes) FROM unidade_saude").fetchone() == (1050,)
+
+def test_bytes_parts_close_after_the_limit(tmp_path, input_file):
+    summary = convert(input_file, tmp_path / 'carga.sql', sharding=ShardingOptions('bytes', 20_000))
+    sizes = [os.path.getsize(path) for path in summary.shard_files]
+    assert len(sizes) > 2
+    # Cada parte fecha no fim do lote que atingiu o limite: só a última pode ficar abaixo dele
+    assert all(size >= 20_000 for size in sizes[:-1])
+    assert sum(entry['records'] for entry in json.loads(read_bytes(summary.manifest_file))['shards']) == 1050
+
+def test_hash_parts_are_stable_by_key(tmp_path, input_file):
+    options = ShardingOptions('hash', count=3, key='codigo_cnes')
+    summary = convert(input_file, tmp_path / 'carga.sql.gz', JSONToSQLConverter(dialect='sqlite'), sharding=options)
+    assert len(summary.shard_files) == 3 and summary.manifest_file == str(tmp_path / 'carga.manifest.json')
+
+    seen = []
+    for index, path in enumerate(summary.shard_files):
+        part = sqlite3.connect(':memory:')
+        part.execute(f"CREATE TABLE unidade_saude ({', '.join(JSONToSQLConverter().required_fields)})")
+        part.executescript(gzip.decompress(read_bytes(path)).decode('utf-8'))
+        codes = [row[0] for row in part.execute("SELECT codigo_cnes FROM unidade_saude")]
+        assert codes and all(zlib.crc32(str(code).encode('utf-8')) % 3 == index for code in codes)
+        seen.extend(codes)
+    assert sorted(seen) == list(range(1, 1051))
+
+def test_hash_key_must_be_a_column(tmp_path, input_file):
+    with pytest.raises(Exception, match='precisa estar em required_fields'):
+        convert(input_file, tmp_path / 'carga.sql', sharding=ShardingOptions('hash', key='inexistente'))
+
+def test_cli_bytes_mode_uses_the_byte_default(tmp_path, input_file):
+    assert main([input_file, '-o', str(tmp_path / 'carga.sql'), '--shard-by', 'bytes', '-q']) == 0
+    manifest = json.loads(read_bytes(tmp_path / 'carga.manifest.json'))
+    assert manifest['sharding'] == {'by': 'bytes', 'size': DEFAULT_SHARD_BYTES}
+    assert len(manifest['shards']) == 1 and manifest['records'] == 1050
@@ -0,0 +1,86 @@
+"""
+Leitura incremental da entrada (JSONRecordStream) e convert_file em modo streaming.
+"""
+import io
+import json
+
+import pytest
+
+from helpers import convert, make_records, read_bytes, write_json
+from sql_script_automator import JSONRecordStream, JSONToSQLConverter
+
+MALFORMED = [
+    '[{"a": 1} {"a": 2}]',
+    '[{"a": 1},, {"a": 2}]',
+    '[, {"a": 1}]',
+    '[{"a": 1},]',
+    '[{"a": 1}] {"a": 2}',
+    '[{"a": 1}]]',
+    '[{"a": 1}',
+    '[{"a": tru}, {"a": 1}]',
+    '{"a": 1}, {"a": 2}',
+]
+
+def stream_records(text: str, chunk_size: int, **options):
+    return list(JSONRecordStream(io.BytesIO(text.encode('utf-8')), chunk_size=chunk_size, **options))
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 64, 1024 * 1024])
+def test_reads_records_split_across_chunks(chunk_size):
+    records = make_records(200) + [{'a': [1, {'b': None}], 'c': True, 'd': -1.5e3, 'e': 'x"\\u00e9'}]
+    assert stream_records(json.dumps(records, ensure_ascii=False), chunk_size) == records
+    json_lines = ''.join(json.dumps(record) + '\n' for record in records)
+    assert stream_records(json_lines, chunk_size) == records
+    assert stream_records(' [ ] \n', chunk_size) == []
+    assert stream_records('', chunk_size) == []
+
+def test_utf8_bom_and_skip_records():
+    records = make_records(10)
+    data = '\ufeff' + json.dumps(records)
+    assert stream_records(data, 16) == records
+    assert stream_records(data, 16, skip_records=4) == records[4:]
+
+@pytest.mark.parametrize('text', MALFORMED)
+@pytest.mark.parametrize('chunk_size', [1, 3, 1024])
+def test_rejects_malformed_json(text, chunk_size):
+    with pytest.raises(json.JSONDecodeError):
+        stream_records(text, chunk_size)
+
+@pytest.mark.parametrize('text', MALFORMED[:6])
+def test_streaming_and_list_modes_are_equally_strict(tmp_path, text):
+    input_file = tmp_path / 'in.json'
+    input_file.write_text(text, encoding='utf-8')
+    for streaming in (False, True):
+        with pytest.raises(Exception, match='Erro ao decodificar JSON'):
+            convert(input_file, tmp_path / 'saida.sql', streaming=streaming)
+
+def test_fails_fast_on_bad_record():
+    records = make_records(5000)
+    data = ('[{"codigo_cnes": 1, "nome": tru},' + json.dumps(records)[1:]).encode('utf-8')
+    stream = JSONRecordStream(io.BytesIO(data), chunk_size=4096)
+    with pytest.raises(json.JSONDecodeError, match='Registro 1'):
+        list(stream)
+    # O erro é informado sem ler o restante do arquivo
+    assert stream.bytes_read <= 2 * 4096 < len(data)
+
+@pytest.mark.parametrize('json_lines', [False, True])
+def test_streaming_conversion_has_same_statements_as_list(tmp_path, json_lines):
+    records = make_records(450)
+    input_file = write_json(tmp_path / ('in.jsonl' if json_lines else 'in.json'), records, json_lines)
+    listed = convert(input_file, tmp_path / 'lista.sql')
+    streamed = convert(input_file, tmp_path / 'fluxo.sql', streaming=True)
+
+    def statements(path):
+        return [line for line in read_bytes(path).decode('utf-8').splitlines() if not line.startswith('--')]
+
+    assert statements(tmp_path / 'lista.sql') == statements(tmp_path / 'fluxo.sql')
+    assert listed.records == streamed.records == 450
+    assert listed.batches == streamed.batches == 5
+    # Totais do modo streaming só são conhecidos no rodapé
+    assert read_bytes(tmp_path / 'fluxo.sql').decode('utf-8').rstrip().endswith('-- Número de lotes: 5')
+
+def test_list_input_matches_convert_json_to_sql(tmp_path):
+    records = make_records(250)
+    input_file = write_json(tmp_path / 'in.json', records)
+    convert(input_file, tmp_path / 'saida.sql')
+    expected = JSONToSQLConverter().convert_json_to_sql(records, 100, show_progress=False)
+    assert read_bytes(tmp_path / 'saida.sql').decode('utf-8') == expected
@@ -0,0 +1,71 @@
+"""
+UPSERT/MERGE: recarga idempotente pela coluna chave em cada dialeto.
+"""
+import sqlite3
+
+import pytest
+
+from helpers import make_records
+from sql_script_automator import JSONToSQLConverter
+
+FIELDS = ['codigo_cnes', 'nome_fantasia', 'codigo_uf']
+
+def upsert_statement(dialect: str) -> str:
+    converter = JSONToSQLConverter(dialect=dialect, upsert=True, fields=FIELDS)
+    return converter.generate_bulk_insert_statement(make_records(3), show_progress=False)
+
+def sqlite_database() -> sqlite3.Connection:
+    connection = sqlite3.connect(':memory:')
+    connection.execute("CREATE TABLE unidade_saude (codigo_cnes PRIMARY KEY, nome_fantasia, codigo_uf)")
+    return connection
+
+def test_sqlite_reload_is_idempotent():
+    converter = JSONToSQLConverter(dialect='sqlite', upsert=True, fields=FIELDS)
+    records = make_records(250)
+    database = sqlite_database()
+    database.executescript(converter.convert_json_to_sql(records, 100, show_progress=False))
+
+    for record in records[:20]:
+        record['nome_fantasia'] = 'ALTERADO'
+    database.executescript(converter.convert_json_to_sql(records, 100, show_progress=False))
+    assert database.execute("SELECT COUNT(*) FROM unidade_saude").fetchone() == (250,)
+    assert database.execute("SELECT COUNT(*) FROM unidade_saude WHERE nome_fantasia = 'ALTERADO'").fetchone() == (20,)
+
+def test_load_to_database_upsert(tmp_path):
+    converter = JSONToSQLConverter(dialect='sqlite', upsert=True, fields=FIELDS)
+    records = make_records(120)
+    path = str(tmp_path / 'saude.db')
+    with sqlite3.connect(path) as database:
+        database.execute("CREATE TABLE unidade_saude (codigo_cnes PRIMARY KEY, nome_fantasia, codigo_uf)")
+    records[0]['nome_fantasia'] = 'PRIMEIRA CARGA'
+    converter.load_to_database(records, lambda: sqlite3.connect(path), batch_size=50, show_progress=False)
+    records[0]['nome_fantasia'] = 'SEGUNDA CARGA'
+    summary = converter.load_to_database(records, lambda: sqlite3.connect(path), batch_size=50, show_progress=False)
+    assert summary.records == 120
+    database = sqlite3.connect(path)
+    assert database.execute("SELECT COUNT(*) FROM unidade_saude").fetchone() == (120,)
+    assert database.execute("SELECT nome_fantasia FROM unidade_saude WHERE codigo_cnes = 1").fetchone() == (
+        'SEGUNDA CARGA',)
+    database.close()
+
+def test_postgresql_on_conflict():
+    statement = upsert_statement('postgresql')
+    assert statement.endswith("ON CONFLICT (codigo_cnes) DO UPDATE SET\n"
+                              "  nome_fantasia = EXCLUDED.nome_fantasia,\n  codigo_uf = EXCLUDED.codigo_uf;")
+
+def test_mysql_on_duplicate_key():
+    statement = upsert_statement('mysql')
+    assert statement.endswith("ON DUPLICATE KEY UPDATE\n"
+                              "  nome_fantasia = VALUES(nome_fantasia),\n  codigo_uf = VALUES(codigo_uf);")
+
+def test_sqlserver_merge():
+    statement = upsert_statement('sqlserver')
+    assert statement.startswith("MERGE INTO unidade_saude AS target\nUSING (VALUES\n")
+    assert ") AS source (codigo_cnes, nome_fantasia, codigo_uf)\nON target.codigo_cnes = source.codigo_cnes" in statement
+    assert statement.endswith("WHEN NOT MATCHED THEN INSERT (codigo_cnes, nome_fantasia, codigo_uf) "
+                              "VALUES (source.codigo_cnes, source.nome_fantasia, source.codigo_uf);")
+
+@pytest.mark.parametrize('dialect', ['standard', 'postgresql_copy', 'mysql_load_data'])
+def test_dialects_without_upsert_are_rejected(dialect):
+    with pytest.raises(ValueError, match='não suporta UPSERT'):
+        JSONToSQLConverter(dialect=dialect, upsert=True)
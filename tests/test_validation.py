@@ -0,0 +1,76 @@
+"""
+Validação pelo esquema: correções de tipos, rejeitados em JSON Lines e tempo da etapa nas métricas.
+"""
+import io
+import json
+import time
+
+import pytest
+
+from helpers import convert, make_records, read_bytes, write_json
+from sql_script_automator import CNES_SCHEMA, ColumnRule, JSONToSQLConverter, RecordValidator
+
+def validator(schema=None, rejects=None) -> RecordValidator:
+    return RecordValidator(CNES_SCHEMA if schema is None else schema, rejects)
+
+def test_valid_values_are_corrected_in_place():
+    record = {'codigo_cnes': '42', 'numero_cnpj': '12.345.678/0001-90', 'codigo_uf': 35.0,
+              'latitude_estabelecimento_decimo_grau': '-23,55', 'data_atualizacao': '31/12/2024'}
+    assert validator().validate(record) == []
+    assert record == {'codigo_cnes': 42, 'numero_cnpj': '12345678000190', 'codigo_uf': 35,
+                      'latitude_estabelecimento_decimo_grau': -23.55, 'data_atualizacao': '2024-12-31'}
+
+@pytest.mark.parametrize('record, column', [
+    ({'codigo_cnes': None}, 'codigo_cnes'),
+    ({'codigo_cnes': 1, 'codigo_uf': 99}, 'codigo_uf'),
+    ({'codigo_cnes': 1, 'latitude_estabelecimento_decimo_grau': 40.0}, 'latitude_estabelecimento_decimo_grau'),
+    ({'codigo_cnes': 1, 'numero_cnpj': '123'}, 'numero_cnpj'),
+    ({'codigo_cnes': 1, 'data_atualizacao': '31/02/2024'}, 'data_atualizacao'),
+    ({'codigo_cnes': 1, 'tipo_gestao': 'XY'}, 'tipo_gestao'),
+])
+def test_invalid_values_reject_the_record_untouched(record, column):
+    original = dict(record)
+    errors = validator().validate(record)
+    assert errors and errors[0].startswith(f'{column}: ')
+    assert record == original
+
+def test_custom_rules_from_dict():
+    schema = {'ativo': ColumnRule.from_dict({'type': 'bool', 'nullable': False}),
+              'nota': ColumnRule.from_dict({'type': 'float', 'min': 0, 'max': 10})}
+    record = {'ativo': 'sim', 'nota': '9,5'}
+    assert validator(schema).validate(record) == [] and record == {'ativo': True, 'nota': 9.5}
+    assert validator(schema).validate({'ativo': None, 'nota': 11}) == [
+        'ativo: valor nulo não permitido', 'nota: 11 acima do máximo 10']
+    assert validator(schema).validate(['não', 'é', 'objeto']) == ['registro não é um objeto JSON']
+
+def test_filter_writes_rejects_with_position():
+    rejects = io.StringIO()
+    checker = validator(rejects=rejects)
+    records = [{'codigo_cnes': 1}, {'codigo_cnes': 'x'}, {'codigo_cnes': 3}]
+    assert [record['codigo_cnes'] for record in checker.filter(records)] == [1, 3]
+    assert (checker.accepted, checker.rejected) == (2, 1)
+    assert json.loads(rejects.getvalue()) == {'registro': 2, 'erros': ["codigo_cnes: inteiro inválido: 'x'"],
+                                              'dados': {'codigo_cnes': 'x'}}
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_convert_file_with_schema_and_metrics(tmp_path, monkeypatch, streaming):
+    validate = RecordValidator.validate
+
+    def slow_validate(self, record):
+        time.sleep(0.0002)
+        return validate(self, record)
+
+    monkeypatch.setattr(RecordValidator, 'validate', slow_validate)
+    records = make_records(300)
+    for record in records[::50]:
+        record['codigo_uf'] = 99
+    input_file = write_json(tmp_path / 'in.json', records)
+    converter = JSONToSQLConverter(schema='cnes', collect_metrics=True)
+    summary = convert(input_file, tmp_path / 'saida.sql', converter, streaming=streaming)
+
+    assert summary.records == 294 and summary.rejected == 6
+    rejected = [json.loads(line) for line in read_bytes(tmp_path / 'saida.rejects.jsonl').splitlines()]
+    assert [line['registro'] for line in rejected] == list(range(1, 301, 50))
+    # A validação é medida durante o consumo dos registros, também no modo streaming
+    wall_time, _ = converter.metrics.stages['validacao']
+    assert wall_time >= 300 * 0.0002